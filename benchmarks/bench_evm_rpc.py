@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import time
+
+from eth_abi import encode
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+from btp2_monitor.eth_rpc import BMCWithEthereumRPC
+from btp2_monitor.evm_rpc import BMCWithEVMRPC
+
+from .harness import Result, format_results
+
+BMC = '0x000000000000000000000000000000000000000b'
+LINK = 'btp://0x1.icon/cx0000000000000000000000000000000000000001'
+CONFIG = { 'network': '0x2.eth2', 'bmc': BMC, 'endpoint': 'http://localhost:8545' }
+
+RESULTS = {
+    'get_status': encode(['(uint256,uint256,(uint256,bytes),uint256)'], [(3, 5, (100, b'\x01'*64), 120)]),
+    'get_links': encode(['string[]'], [[LINK]*4]),
+    'get_routes': encode(['(string,string)[]'], [[('0x4.icon', LINK)]*4]),
+    'get_fee': encode(['uint256'], [10**18]),
+}
+
+
+class CannedProvider(BaseProvider):
+    def __init__(self):
+        super().__init__()
+        self.result = b''
+
+    def make_request(self, method, params) -> dict:
+        if method == 'eth_chainId':
+            return { 'jsonrpc': '2.0', 'id': 1, 'result': '0x1' }
+        return { 'jsonrpc': '2.0', 'id': 1, 'result': '0x'+self.result.hex() }
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+
+class CannedResponse:
+    def __init__(self, body: bytes):
+        self.__body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self) -> dict:
+        # decode the body as requests does, to keep JSON parsing in the measurement
+        return json.loads(self.__body)
+
+
+class CannedSession:
+    def __init__(self):
+        self.result = b''
+
+    def post(self, url: str, json: dict, timeout: float) -> CannedResponse:
+        body = '{"jsonrpc":"2.0","id":1,"result":"0x'+self.result.hex()+'"}'
+        return CannedResponse(body.encode())
+
+
+def build_web3_bmc() -> tuple[BMCWithEthereumRPC,CannedProvider]:
+    provider = CannedProvider()
+    bmc = BMCWithEthereumRPC(CONFIG)
+    # swap the HTTP provider of the contracts with the canned one
+    w3: Web3 = bmc._BMCWithEthereumRPC__periphery.w3
+    w3.provider = provider
+    return bmc, provider
+
+
+def bench_calls(count: int) -> list[Result]:
+    web3_bmc, provider = build_web3_bmc()
+    session = CannedSession()
+    evm_bmc = BMCWithEVMRPC(CONFIG, session)
+
+    calls = {
+        'get_status': lambda bmc: bmc.get_status(LINK),
+        'get_links': lambda bmc: bmc.get_links(),
+        'get_routes': lambda bmc: bmc.get_routes(),
+        'get_fee': lambda bmc: bmc.get_fee('0x1.icon', False),
+    }
+    results = []
+    for name, call in calls.items():
+        provider.result = RESULTS[name]
+        session.result = RESULTS[name]
+        for label, bmc in [('web3', web3_bmc), ('evm', evm_bmc)]:
+            start = time.process_time()
+            for _ in range(count):
+                call(bmc)
+            elapsed = time.process_time() - start
+            results.append({ 'name': f'{name}/{label}', 'count': count, 'seconds': elapsed, 'memory': None })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare CPU time per BMC call of web3 and raw JSON-RPC clients')
+    parser.add_argument('--count', type=int, default=2000)
+    args = parser.parse_args()
+    print(format_results(bench_calls(args.count)))
+
+
+if __name__ == '__main__':
+    main()
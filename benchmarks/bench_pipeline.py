@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import tempfile
+import time
+
+from btp2_monitor.monitor import Links
+from btp2_monitor.storage import Storage
+
+from . import fake_bmc
+from .fake_bmc import FakeTopology
+from .harness import Result, format_results, measure_latency, measure_time, write_results
+
+
+def bench_query_status(topology: FakeTopology) -> list[Result]:
+    links = Links(topology.configs(), Storage())
+    return [measure_time('links/query_status', lambda: links.query_status(True), topology.link_count)]
+
+
+def bench_apply_status(topology: FakeTopology, cycles: int) -> list[Result]:
+    links = Links(topology.configs(), Storage())
+    now = datetime.now()
+    links.apply_status(links.query_status(True), now)
+    statuses = []
+    for _ in range(cycles):
+        topology.advance(2, 1)
+        statuses.append(links.query_status(True))
+
+    def apply():
+        for i, status in enumerate(statuses):
+            links.apply_status(status, now+timedelta(seconds=i+1))
+    return [measure_time('links/apply_status', apply, topology.link_count*cycles, repeat=1)]
+
+
+def bench_handle_update(depth: int) -> list[Result]:
+    topology = FakeTopology('handle_update', 2, 1)
+    links = Links(topology.configs(), Storage())
+    src, dst = topology.addrs
+    now = datetime.now()
+    links.apply_status(links.query_status(True), now)
+
+    # pile up pending messages, one tx record for each cycle
+    for i in range(depth):
+        topology.advance(1, 0)
+        links.apply_status(links.query_status(True), now+timedelta(seconds=i+1))
+    link = links.get_link(src, dst)
+    assert len(link.tx_history) >= depth
+
+    statuses = []
+    for _ in range(depth):
+        topology.advance(0, 1)
+        statuses.append(links.query_status(True))
+
+    def deliver():
+        for i, status in enumerate(statuses):
+            link.handle_update(status.get_link_update(src, dst), now+timedelta(seconds=depth+i+1))
+    return [measure_time(f'link/handle_update depth={depth}', deliver, depth, repeat=1)]
+
+
+def bench_get_logs(count: int) -> list[Result]:
+    storage = Storage()
+    topology = FakeTopology('logs', 20, 2)
+    keys = list(topology.sent.keys())
+    base = datetime.now().timestamp() - count
+
+    def fill():
+        for i in range(count):
+            src, dst = keys[i % len(keys)]
+            ts = datetime.fromtimestamp(base+i)
+            if i % 3 == 0:
+                storage.write_log(ts, src, dst, 'rx', { 'seq': i, 'count': 1, 'delta': 10.0 })
+            else:
+                storage.write_log(ts, src, dst, 'tx', { 'seq': i, 'count': 1 })
+    storage.do_batch(fill)
+
+    src, dst = keys[0]
+    repeat = 100
+    calls = {
+        'storage/get_logs latest': lambda: storage.get_logs(),
+        'storage/get_logs link': lambda: storage.get_logs(src=src, dst=dst),
+        'storage/get_logs event': lambda: storage.get_logs(events=['rx']),
+        'storage/get_logs after': lambda: storage.get_logs(after=count//2),
+        'storage/get_logs range': lambda: storage.get_logs(since=base+count//2, until=base+count//2+3600),
+    }
+    results = [measure_latency(name, call, repeat) for name, call in calls.items()]
+    results.append(measure_latency('storage/get_log_stats hourly',
+        lambda: storage.get_log_stats(since=base, until=base+count, bucket=3600), 10))
+    return results
+
+
+def bench_api(topology: FakeTopology, requests: int) -> list[Result]:
+    with tempfile.TemporaryDirectory() as tmp:
+        networks = os.path.join(tmp, 'networks.json')
+        with open(networks, 'wt') as fd:
+            json.dump(topology.configs(), fd)
+        os.environ['NETWORKS_JSON'] = networks
+        os.environ['DOCUMENT_ROOT'] = tmp
+
+        from fastapi.testclient import TestClient
+        from btp2_monitor import webui
+        try:
+            while webui.be.get_snapshot()['stale']:
+                time.sleep(0.01)
+            client = TestClient(webui.app)
+            link = client.get('/links').json()[0]
+            paths = {
+                'api/links': '/links',
+                'api/link': f'/links/{link["src"]}/{link["dst"]}',
+                'api/events': '/events',
+                'api/metrics': '/metrics',
+            }
+            return [measure_latency(name, lambda: client.get(path).raise_for_status(), requests) for name, path in paths.items()]
+        finally:
+            webui.be.term()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the polling and state-update pipeline with fake BMCs')
+    parser.add_argument('--networks', type=int, default=50)
+    parser.add_argument('--degree', type=int, default=2, help='links to the neighbors in each direction')
+    parser.add_argument('--latency', type=float, default=0.0, help='latency of each BMC call in seconds')
+    parser.add_argument('--cycles', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=1000, help='pending tx records for handle_update')
+    parser.add_argument('--logs', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--output', type=str, help='write results as JSON')
+    args = parser.parse_args()
+
+    fake_bmc.register()
+    topology = FakeTopology('pipeline', args.networks, args.degree, args.latency)
+    results = []
+    results += bench_query_status(topology)
+    results += bench_apply_status(topology, args.cycles)
+    results += bench_handle_update(args.depth)
+    results += bench_get_logs(args.logs)
+    results += bench_api(topology, args.requests)
+    print(format_results(results))
+    if args.output is not None:
+        write_results(args.output, results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import argparse
+import subprocess
+import sys
+
+
+def import_times(module: str) -> dict[str,int]:
+    # cumulative import time in microseconds for each module imported
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check import time of the CLI against the budget')
+    parser.add_argument('--module', default='btp2_monitor.main')
+    parser.add_argument('--budget', type=float, default=150.0, help='budget in milliseconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.repeat):
+        times = import_times(args.module)
+        if best is None or times[args.module] < best[args.module]:
+            best = times
+
+    total = best[args.module] / 1000
+    print(f'| {"Module":<50s} | {"Cumulative":>10s} |')
+    for name, value in sorted(best.items(), key=lambda x: -x[1])[:args.top]:
+        print(f'| {name:<50s} | {value/1000:8.1f}ms |')
+    for name in ['web3', 'iconsdk', 'textual', 'numpy', 'fastapi', 'requests']:
+        if name in best:
+            print(f'WARNING: {name} is imported on startup')
+    print(f'{args.module}: {total:.1f}ms (budget: {args.budget:.1f}ms)')
+    if total > args.budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
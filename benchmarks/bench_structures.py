@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import argparse
+from datetime import datetime, timedelta
+
+from btp2_monitor.monitor import Links, NetworkStatus
+from btp2_monitor.storage import Storage, TXRecord
+from btp2_monitor.types import LinkStatus, VerifierStatus
+
+from .harness import Result, format_results, measure_memory, measure_time
+
+
+# tuple based structures replaced by the slotted ones, kept as the baseline
+class TupleTXRecord(tuple):
+    @property
+    def sn(self) -> int:
+        return self[0]
+
+    @property
+    def tx_seq(self) -> int:
+        return self[1]
+
+    @property
+    def tx_ts(self) -> datetime:
+        return datetime.fromtimestamp(self[2])
+
+
+class TupleVerifierStatus(tuple):
+    @property
+    def height(self) -> int:
+        return self[0]
+
+
+class TupleLinkStatus(tuple):
+    @property
+    def verifier(self) -> TupleVerifierStatus:
+        return TupleVerifierStatus(self[2])
+
+
+def bench_records(links: int, depth: int) -> list[Result]:
+    count = links*depth
+    base = datetime.now().timestamp() - depth
+    tuples, r1 = measure_memory('txrecord/tuple memory',
+        lambda: [[TupleTXRecord((i*depth+j, j, base+j)) for j in range(depth)] for i in range(links)], count)
+    slots, r2 = measure_memory('txrecord/slots memory',
+        lambda: [[TXRecord(i*depth+j, j, base+j) for j in range(depth)] for i in range(links)], count)
+
+    now = datetime.now()
+    now_ts = now.timestamp()
+
+    def scan_tuples():
+        for history in tuples:
+            for record in history:
+                (now - record.tx_ts).total_seconds()
+
+    def scan_slots():
+        for history in slots:
+            for record in history:
+                now_ts - record.ts
+
+    return [
+        r1, r2,
+        measure_time('txrecord/tuple delay scan', scan_tuples, count),
+        measure_time('txrecord/slots delay scan', scan_slots, count),
+    ]
+
+
+def bench_status(links: int) -> list[Result]:
+    tuples = [TupleLinkStatus((i, i, (i, None), i)) for i in range(links)]
+    slots = [LinkStatus(i, i, VerifierStatus(i, None), i) for i in range(links)]
+
+    def read_tuples():
+        for status in tuples:
+            status.verifier.height
+
+    def read_slots():
+        for status in slots:
+            status.verifier.height
+
+    return [
+        measure_time('linkstatus/tuple verifier', read_tuples, links),
+        measure_time('linkstatus/slots verifier', read_slots, links),
+    ]
+
+
+def build_status(networks: int, per_network: int, seq: int) -> NetworkStatus:
+    status = NetworkStatus()
+    for i in range(networks):
+        src = f'btp://0x{i:x}.icon/cx{i:x}'
+        statuses = []
+        for j in range(per_network):
+            k = (i+j+1) % networks
+            dst = f'btp://0x{k:x}.icon/cx{k:x}'
+            statuses.append((dst, LinkStatus(seq, seq, VerifierStatus(seq, None), seq)))
+        status.set_link_statuses(src, statuses)
+    return status
+
+
+def bench_links(links: int) -> list[Result]:
+    per_network = 10
+    networks = max(links // per_network, per_network+1)
+    count = networks*per_network
+    storage = Storage()
+    monitor = Links([], storage)
+    now = datetime.now()
+    monitor.apply_status(build_status(networks, per_network, 0), now)
+
+    def load() -> Links:
+        loaded = Links([], storage)
+        loaded.load_links()
+        return loaded
+    _, memory = measure_memory('links/memory', load, count)
+
+    cycle = [0]
+    def apply():
+        cycle[0] += 1
+        monitor.apply_status(build_status(networks, per_network, cycle[0]), now+timedelta(seconds=cycle[0]))
+
+    return [memory, measure_time('links/apply_status', apply, count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark memory and speed of link structures')
+    parser.add_argument('--links', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=100, help='pending tx records per link')
+    args = parser.parse_args()
+
+    results = []
+    results += bench_records(args.links, args.depth)
+    results += bench_status(args.links)
+    results += bench_links(args.links)
+    print(format_results(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from btp2_monitor.topology import TopologyIndex
+
+from .harness import Result, format_results, measure_time
+
+
+def build_keys(links: int) -> list[tuple[str,str]]:
+    networks = max(int(links ** 0.5), 2)
+    keys = []
+    for i in range(networks):
+        for j in range(networks):
+            if i != j and len(keys) < links:
+                keys.append((f'btp://0x{i:x}.icon/cx{i:x}', f'btp://0x{j:x}.icon/cx{j:x}'))
+    return keys
+
+
+# list based bookkeeping replaced by TopologyIndex, kept as the baseline
+def list_connected(keys: list[tuple[str,str]]) -> list[tuple[str,str]]:
+    connected = []
+    for key in keys:
+        rkey = (key[1], key[0])
+        if rkey in keys and rkey not in connected:
+            connected.append(key)
+    return connected
+
+
+def list_unique(keys: list[tuple[str,str]]) -> list[tuple[str,str]]:
+    unique = []
+    for key in keys:
+        if key in unique or (key[1], key[0]) in unique:
+            continue
+        unique.append(key)
+    return unique
+
+
+def bench_topology(links: int) -> list[Result]:
+    keys = build_keys(links)
+    count = len(keys)
+    return [
+        measure_time('connected/list', lambda: list_connected(keys), count, repeat=1),
+        measure_time('connected/index', lambda: TopologyIndex(keys).connected(), count),
+        measure_time('unique/list', lambda: list_unique(keys), count, repeat=1),
+        measure_time('unique/index', lambda: TopologyIndex().unique(keys), count),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark link bookkeeping of the topology')
+    parser.add_argument('--links', type=int, default=5000)
+    args = parser.parse_args()
+    print(format_results(bench_topology(args.links)))
+
+
+if __name__ == '__main__':
+    main()
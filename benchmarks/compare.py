@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+from .harness import Result, load_results
+
+
+def value_of(r: Result) -> float:
+    if 'p50' in r:
+        return r['p50']
+    if r['seconds'] is not None:
+        return r['seconds']/r['count']
+    return r['memory']/r['count']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two result files of the benchmarks')
+    parser.add_argument('base', type=str)
+    parser.add_argument('target', type=str)
+    parser.add_argument('--threshold', type=float, default=0.2, help='ratio of the change reported as regression')
+    args = parser.parse_args()
+
+    base = { r['name']: r for r in load_results(args.base)['results'] }
+    target = load_results(args.target)['results']
+    regressions = 0
+    print(f'| {"Benchmark":<40s} | {"Change":>8s} |')
+    for r in target:
+        if r['name'] not in base:
+            continue
+        before, after = value_of(base[r['name']]), value_of(r)
+        change = (after - before) / before if before > 0 else 0.0
+        mark = ''
+        if change > args.threshold:
+            mark = ' !'
+            regressions += 1
+        print(f'| {r["name"]:<40s} | {change*100:>+7.1f}% |{mark}')
+    if regressions > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import time
+from typing import Tuple
+
+from btp2_monitor import monitor
+from btp2_monitor.types import BMC, LinkStatus, VerifierStatus
+
+# topologies referred by 'topology' of the network configurations
+TOPOLOGIES: dict[str,'FakeTopology'] = {}
+
+
+class FakeTopology:
+    def __init__(self, name: str, networks: int, degree: int, latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.height = 1
+        self.addrs = [f'btp://0x{i:x}.fake/0x{i:x}' for i in range(networks)]
+        self.links: dict[str,list[str]] = {}
+        self.sent: dict[tuple[str,str],int] = {}
+        self.received: dict[tuple[str,str],int] = {}
+        for i, src in enumerate(self.addrs):
+            peers = []
+            for j in range(1, degree+1):
+                peers.append(self.addrs[(i+j) % networks])
+                peers.append(self.addrs[(i-j) % networks])
+            self.links[src] = list(dict.fromkeys(filter(lambda x: x != src, peers)))
+            for dst in self.links[src]:
+                self.sent[(src, dst)] = 0
+                self.received[(src, dst)] = 0
+        TOPOLOGIES[name] = self
+
+    @property
+    def link_count(self) -> int:
+        return len(self.sent)
+
+    def configs(self) -> list[dict]:
+        return [{
+            'type': 'fake',
+            'network': f'0x{i:x}.fake',
+            'name': f'FAKE{i}',
+            'bmc': f'0x{i:x}',
+            'endpoint': 'http://localhost',
+            'topology': self.name,
+        } for i in range(len(self.addrs))]
+
+    def advance(self, sent: int = 1, delivered: int = 1):
+        self.height += 1
+        for key in self.sent.keys():
+            self.sent[key] += sent
+            self.received[key] = min(self.received[key]+delivered, self.sent[key])
+
+
+class FakeBMC(BMC):
+    def __init__(self, config: dict) -> None:
+        self.__topology = TOPOLOGIES[config['topology']]
+        self.__address = f'btp://{config["network"]}/{config["bmc"]}'
+
+    @property
+    def address(self) -> str:
+        return self.__address
+
+    def __wait(self):
+        if self.__topology.latency > 0:
+            time.sleep(self.__topology.latency)
+
+    def get_status(self, link: str) -> LinkStatus:
+        self.__wait()
+        t = self.__topology
+        return LinkStatus(
+            t.received[(link, self.__address)],
+            t.sent[(self.__address, link)],
+            VerifierStatus(t.height, None),
+            t.height,
+        )
+
+    def get_links(self) -> Tuple[str]:
+        self.__wait()
+        return tuple(self.__topology.links[self.__address])
+
+    def get_routes(self) -> dict[str,str]:
+        self.__wait()
+        return {}
+
+    def get_fee(self, dst: str, rollback: bool) -> int:
+        self.__wait()
+        return 10**18 if rollback else 10**17
+
+
+def register():
+    monitor.BMC_FACTORY['fake'] = FakeBMC
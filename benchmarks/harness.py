@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+from datetime import datetime
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from typing import Callable, List, NotRequired, Optional, TypedDict, TypeVar
+
+T = TypeVar('T')
+
+
+class Result(TypedDict):
+    name: str
+    count: int
+    seconds: Optional[float]
+    memory: Optional[int]
+    p50: NotRequired[float]
+    p99: NotRequired[float]
+
+
+def measure_time(name: str, call: Callable[[], any], count: int, repeat: int = 3) -> Result:
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return { 'name': name, 'count': count, 'seconds': best, 'memory': None }
+
+
+def measure_memory(name: str, build: Callable[[], T], count: int) -> tuple[T,Result]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return value, { 'name': name, 'count': count, 'seconds': None, 'memory': current }
+
+
+def measure_latency(name: str, call: Callable[[], any], count: int) -> Result:
+    latencies = []
+    gc.collect()
+    for _ in range(count):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        'name': name,
+        'count': count,
+        'seconds': sum(latencies),
+        'memory': None,
+        'p50': latencies[count//2],
+        'p99': latencies[min(count-1, count*99//100)],
+    }
+
+
+def write_results(path: str, results: List[Result], params: dict):
+    with open(path, 'wt') as fd:
+        json.dump({
+            'version': os.environ.get('MONITOR_VERSION', 'unknown'),
+            'python': platform.python_version(),
+            'ts': datetime.now().isoformat(),
+            'params': params,
+            'results': results,
+        }, fd, indent=2)
+
+
+def load_results(path: str) -> dict:
+    with open(path, 'rb') as fd:
+        return json.load(fd)
+
+
+def format_results(results: List[Result]) -> str:
+    lines = [f'| {"Benchmark":<40s} | {"Count":>9s} | {"Total":>10s} | {"Per item":>12s} |']
+    for r in results:
+        if r['seconds'] is not None:
+            total = f'{r["seconds"]*1000:.1f}ms'
+            per_item = f'{r["seconds"]/r["count"]*1e9:.0f}ns'
+        else:
+            total = f'{r["memory"]/(1<<20):.1f}MiB'
+            per_item = f'{r["memory"]/r["count"]:.0f}B'
+        if 'p50' in r:
+            per_item = f'{r["p50"]*1e6:.0f}/{r["p99"]*1e6:.0f}us'
+        lines.append(f'| {r["name"]:<40s} | {r["count"]:>9d} | {total:>10s} | {per_item:>12s} |')
+    return "\n".join(lines)
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+
+from datetime import datetime
+import json
+import os
+from threading import Lock, Timer
+import traceback
+from typing import List, Optional
+
+from fastapi import HTTPException
+from readerwriterlock import rwlock
+
+from .cache import LogCache
+from .lease import Lease
+from .monitor import Link, LinkEvent, Links, NetworkChanges
+from .notify import NOTIFY_TIMEOUT, build_notifier
+from .snapshot import SnapshotReader, write_snapshot
+from .stats import QuantileSummary, ThroughputSummary
+from .storage import LinkHistory, LinkUptime, Log, LogStat, Storage
+from .webui_types import FeeTableJSON, NetworkID, LinkID, LinkInfo
+
+NETWORKS_JSON = os.environ.get('NETWORKS_JSON', 'networks.json')
+STORAGE_URL = os.environ.get('STORAGE_URL', ':memory:')
+STORAGE_CHECKPOINT = os.environ.get('STORAGE_CHECKPOINT')
+STORAGE_CHECKPOINT_INTERVAL = float(os.environ.get('STORAGE_CHECKPOINT_INTERVAL', '300.0'))
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH')
+STATUS_RECORDING = os.environ.get('STATUS_RECORDING')
+SHARD_URLS = os.environ.get('SHARD_URLS')
+REFRESH_INTERVAL = float(os.environ.get('REFRESH_INTERVAL', '30.0'))
+TOPOLOGY_REVALIDATE = float(os.environ.get('TOPOLOGY_REVALIDATE', '3600.0'))
+MONITOR_VERSION = os.environ.get('MONITOR_VERSION', 'unknown')
+LEASE_TTL = float(os.environ.get('LEASE_TTL', str(REFRESH_INTERVAL/2)))
+
+MODE_STANDALONE = 'standalone'
+MODE_POLLER = 'poller'
+MODE_API = 'api'
+MODE_HA = 'ha'
+
+
+def load_networks(path: str = NETWORKS_JSON) -> list[dict]:
+    with open(path, 'rb') as fd:
+        return json.load(fd)
+
+
+def link_key(src: str, dst: str) -> str:
+    return f'{src} {dst}'
+
+
+class MonitorBackend:
+    def __init__(self, mode: str = MODE_STANDALONE, storage: Optional[Storage] = None, links: Optional[Links] = None, snapshot_path: Optional[str] = SNAPSHOT_PATH):
+        if storage is None:
+            storage = Storage(STORAGE_URL, STORAGE_CHECKPOINT, STORAGE_CHECKPOINT_INTERVAL)
+        self.__recorder = None
+        if mode == MODE_API and storage.url == ':memory:':
+            # it would serve an empty storage of its own
+            raise Exception('shared file STORAGE_URL is required for API mode')
+        if links is None and mode != MODE_API:
+            on_status = None
+            if STATUS_RECORDING is not None:
+                from .recording import StatusRecorder
+                self.__recorder = StatusRecorder(STATUS_RECORDING)
+                on_status = self.__recorder.write
+            if SHARD_URLS is not None:
+                from .shard import ShardedLinks
+                links = ShardedLinks(load_networks(), SHARD_URLS.split(','), storage, TOPOLOGY_REVALIDATE, on_status=on_status)
+            else:
+                links = Links(load_networks(), storage, TOPOLOGY_REVALIDATE, on_status=on_status)
+        self.__mode = mode
+        self.__notifier = build_notifier() if mode != MODE_API else None
+        self.__storage = storage
+        self.__links = links
+        self.__log_cache = LogCache(self.__storage)
+        self.__initialized = False
+        self.__stopped = False
+        self.__relay_fee_table: dict[NetworkID,tuple[datetime,FeeTableJSON]] = {}
+        self.__lock = rwlock.RWLockFair()
+        # a poll queries the links outside of the lock, so the reload waits for it
+        self.__update_lock = Lock()
+        self.__timer = None
+        self.__snapshot = self.build_snapshot(datetime.now())
+        self.__snapshot_path = snapshot_path
+        self.__snapshot_reader = None
+        self.__lease = None
+        if mode == MODE_API:
+            if snapshot_path is None:
+                raise Exception('SNAPSHOT_PATH is required for API mode')
+            self.__snapshot_reader = SnapshotReader(snapshot_path)
+        elif mode == MODE_HA:
+            if snapshot_path is None:
+                raise Exception('SNAPSHOT_PATH is required for HA mode')
+            if storage.url == ':memory:':
+                # each instance would hold the lease of its own
+                raise Exception('shared file STORAGE_URL is required for HA mode')
+            # serve as a standby until it gets the lease
+            self.__snapshot_reader = SnapshotReader(snapshot_path)
+            self.__lease = Lease(storage, LEASE_TTL, self.__on_lease)
+            self.__lease.start()
+        else:
+            self.__links.load_links()
+            self.publish_snapshot(datetime.now())
+            self.__timer = Timer(0, self.try_update)
+            self.__timer.start()
+
+    @property
+    def storage(self) -> Storage:
+        return self.__storage
+
+    @property
+    def leader(self) -> bool:
+        if self.__mode == MODE_HA:
+            return self.__lease.leader
+        return self.__mode != MODE_API
+
+    def __on_lease(self, leader: bool):
+        now = datetime.now()
+        with self.__lock.gen_wlock():
+            if self.__stopped:
+                return
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            if not leader:
+                print(f'LOST lease owner={self.__lease.owner}')
+                self.__snapshot_reader = SnapshotReader(self.__snapshot_path)
+                return
+            # take over the states written by the previous leader
+            self.__links.reset_links()
+            self.__log_cache.sync()
+            self.__snapshot_reader = None
+            self.__initialized = False
+        self.write_log(now, '', '', 'log', f'LEADER {self.__lease.owner}')
+        self.publish_snapshot(now)
+        self.__schedule_update(0)
+
+    def __schedule_update(self, delay: float):
+        with self.__lock.gen_wlock():
+            if self.__stopped or not self.leader:
+                return
+            self.__timer = Timer(delay, self.try_update)
+            self.__timer.start()
+
+    def write_log(self, ts: datetime, src: str, dst: str, event: str, extra: any) -> Log:
+        row_id = self.__log_cache.write_log(ts, src, dst, event, extra)
+        log: Log = {
+            'sn': row_id,
+            'ts': ts,
+            'src': src,
+            'dst': dst,
+            'event': event,
+            'extra': extra,
+        }
+        # TODO notify log
+        return log
+
+    def try_update(self):
+        with self.__lock.gen_rlock():
+            if self.__stopped or not self.leader:
+                return
+        self.__timer = None
+
+        try :
+            now = datetime.now()
+
+            with self.__update_lock:
+                status = self.__links.query_status(True)
+                with self.__lock.gen_wlock():
+                    if self.__stopped or not self.leader:
+                        return
+                    updated, changes = self.__links.apply_status(status)
+        except BaseException as exc:
+            with self.__lock.gen_rlock():
+                if self.__stopped or not self.leader:
+                    return
+            traceback.print_exc()
+            self.write_log(now, "", "", "log", f'Exception:{str(exc)}')
+            self.publish_snapshot(now)
+            self.__schedule_update(REFRESH_INTERVAL)
+            return
+
+        if not self.__initialized:
+            self.__initialized = True
+            self.write_log(now, '', '', 'log', f'START {MONITOR_VERSION}')
+        if len(changes) > 0:
+            events = []
+            for c in changes:
+                extra = None
+                if c.name == LinkEvent.TX:
+                    extra = {'seq': c.seq, 'count': c.count}
+                elif c.name == LinkEvent.RX:
+                    extra = {'seq': c.seq, 'count': c.count, 'delta': c.delta.total_seconds()}
+                elif c.name == LinkEvent.STATE:
+                    extra = {'after': c.after, 'before': c.before}
+                event = self.write_log(now, c.link.src, c.link.dst, c.name, extra)
+                events.append(event)
+
+            if updated and self.__notifier is not None:
+                self.__notifier.notify(changes, now.timestamp())
+
+        self.publish_snapshot(now)
+        self.__schedule_update(REFRESH_INTERVAL)
+
+    @staticmethod
+    def link_snapshot(link: Link, now: datetime) -> dict:
+        ts = now.timestamp()
+        return {
+            'src': link.src,
+            'dst': link.dst,
+            'src_name': link.src_name,
+            'dst_name': link.dst_name,
+            'state': link.state,
+            'tx_seq': link.tx_seq,
+            'rx_seq': link.rx_seq,
+            'tx_height': link.tx_height,
+            'rx_height': link.rx_height,
+            'pending_count': link.pending_count,
+            'pending_since': link.pending_since,
+            'time_limit': link.time_limit,
+            'latency': link.latency.summary(ts),
+            'throughput': link.throughput.summary(ts, link.pending_count),
+        }
+
+    def build_snapshot(self, now: datetime) -> dict:
+        with self.__lock.gen_rlock():
+            links = {}
+            names = {}
+            networks = {}
+            if self.__links is None:
+                return {
+                    'ts': now.timestamp(),
+                    'stale': True,
+                    'links': links,
+                    'connected': [],
+                    'names': names,
+                    'networks': networks,
+                }
+            for link in self.__links.get_all_links():
+                links[link_key(link.src, link.dst)] = self.link_snapshot(link, now)
+                for addr in [link.src, link.dst]:
+                    if addr in names:
+                        continue
+                    names[addr] = self.__links.name_of(addr)
+                    net_info = self.__links.get_network(addr)
+                    if net_info is not None:
+                        net_info = net_info.copy()
+                        del net_info['endpoint']
+                        networks[addr] = net_info
+
+            connected = self.__links.get_connected_pairs()
+
+        return {
+            'ts': now.timestamp(),
+            'stale': not self.__initialized,
+            'links': links,
+            'connected': connected,
+            'names': names,
+            'networks': networks,
+        }
+
+    def publish_snapshot(self, now: datetime):
+        snapshot = self.build_snapshot(now)
+        self.__snapshot = snapshot
+        if self.__snapshot_path is not None:
+            # not to overwrite the snapshot of the next leader after term()
+            with self.__lock.gen_rlock():
+                if self.__stopped:
+                    return
+                try:
+                    write_snapshot(self.__snapshot_path, snapshot)
+                except BaseException:
+                    traceback.print_exc()
+
+    def get_snapshot(self) -> dict:
+        if self.__snapshot_reader is not None:
+            snapshot, changed = self.__snapshot_reader.load()
+            if changed:
+                self.__log_cache.sync()
+            if snapshot is not None:
+                self.__snapshot = snapshot
+        return self.__snapshot
+
+    def name_of(self, addr: str) -> str:
+        name = self.get_snapshot()['names'].get(addr)
+        if name is None and self.__links is not None:
+            name = self.__links.name_of(addr)
+        return name or addr
+
+    def get_links(self) -> List[LinkID]:
+        snapshot = self.get_snapshot()
+        names = snapshot['names']
+        return list(map(lambda key: {
+             'src': NetworkID.from_address(key[0]),
+             'src_name': names.get(key[0], key[0]),
+             'dst': NetworkID.from_address(key[1]),
+             'dst_name': names.get(key[1], key[1]),
+        }, snapshot['connected']))
+
+    def get_network(self, id: NetworkID) -> dict:
+        net_info = self.get_snapshot()['networks'].get(id.address)
+        if net_info is not None:
+            return net_info
+        net_info: dict = self.__links.get_network(id.address) if self.__links is not None else None
+        if net_info is None:
+            raise HTTPException(status_code=404, detail=f'unknown network')
+        net_info = net_info.copy()
+        del net_info['endpoint']
+        return net_info
+
+    def __get_link_snapshot(self, src: NetworkID, dst: NetworkID) -> tuple[dict,dict]:
+        snapshot = self.get_snapshot()
+        link = snapshot['links'].get(link_key(src.address, dst.address))
+        if link is None:
+            raise HTTPException(status_code=404, detail=f'unknown link')
+        return snapshot, link
+
+    def get_link(self, src: NetworkID, dst: NetworkID) -> LinkInfo:
+        snapshot, link = self.__get_link_snapshot(src, dst)
+        pending_since = link['pending_since']
+        pending_delay = datetime.now().timestamp() - pending_since if pending_since is not None else 0.0
+        return {
+            'src': NetworkID.from_address(link['src']),
+            'dst': NetworkID.from_address(link['dst']),
+            'src_name': link['src_name'],
+            'dst_name': link['dst_name'],
+            'state': link['state'],
+            'tx_seq': link['tx_seq'],
+            'rx_seq': link['rx_seq'],
+            'tx_height': link['tx_height'],
+            'rx_height': link['rx_height'],
+            'pending_count': link['pending_count'],
+            'pending_delay': pending_delay,
+            'time_limit': link['time_limit'],
+            'stale': snapshot['stale'],
+        }
+
+    def get_link_history(self, src: NetworkID, dst: NetworkID, since: Optional[float] = None, until: Optional[float] = None, step: Optional[float] = None) -> List[LinkHistory]:
+        cstate = self.__storage.get_connection_state(src.address, dst.address)
+        if cstate is None:
+            raise HTTPException(status_code=404, detail=f'unknown link')
+        now = datetime.now()
+        if until is None:
+            until = now.timestamp()
+        if since is None:
+            since = until - 24*3600
+        return self.__storage.get_link_history(cstate['id'], since, until, step, now)
+
+    def get_link_uptime(self, src: NetworkID, dst: NetworkID, since: Optional[float] = None, until: Optional[float] = None) -> LinkUptime:
+        cstate = self.__storage.get_connection_state(src.address, dst.address)
+        if cstate is None:
+            raise HTTPException(status_code=404, detail=f'unknown link')
+        now = datetime.now()
+        if until is None:
+            until = now.timestamp()
+        if since is None:
+            since = until - 24*3600
+        return self.__storage.get_link_uptime(cstate['id'], since, until, now)
+
+    def get_link_latency(self, src: NetworkID, dst: NetworkID) -> dict[str,QuantileSummary]:
+        return self.__get_link_snapshot(src, dst)[1]['latency']
+
+    def get_link_throughput(self, src: NetworkID, dst: NetworkID) -> ThroughputSummary:
+        return self.__get_link_snapshot(src, dst)[1]['throughput']
+
+    def get_metrics(self) -> str:
+        lines = [
+            '# TYPE btp2_link_pending_count gauge',
+            '# TYPE btp2_link_pending_seconds gauge',
+            '# TYPE btp2_link_delivery_latency_seconds summary',
+            '# TYPE btp2_link_delivery_latency_max_seconds gauge',
+            '# TYPE btp2_link_delivered_messages gauge',
+        ]
+        snapshot = self.get_snapshot()
+        now = datetime.now().timestamp()
+        for link in snapshot['links'].values():
+            labels = f'src="{NetworkID.from_address(link["src"])}",dst="{NetworkID.from_address(link["dst"])}"'
+            pending_since = link['pending_since']
+            lines.append(f'btp2_link_pending_count{{{labels}}} {link["pending_count"]}')
+            lines.append(f'btp2_link_pending_seconds{{{labels}}} {now - pending_since if pending_since is not None else 0.0}')
+            for window, summary in link['latency'].items():
+                wlabels = f'{labels},window="{window}"'
+                lines.append(f'btp2_link_delivered_messages{{{wlabels}}} {summary["count"]}')
+                lines.append(f'btp2_link_delivery_latency_seconds_sum{{{wlabels}}} {summary["sum"]}')
+                lines.append(f'btp2_link_delivery_latency_seconds_count{{{wlabels}}} {summary["count"]}')
+                if summary['count'] == 0:
+                    continue
+                for key, quantile in [('p50', '0.5'), ('p90', '0.9'), ('p99', '0.99')]:
+                    lines.append(f'btp2_link_delivery_latency_seconds{{{wlabels},quantile="{quantile}"}} {summary[key]}')
+                lines.append(f'btp2_link_delivery_latency_max_seconds{{{wlabels}}} {summary["max"]}')
+        return "\n".join(lines)+"\n"
+
+    def get_logs(self, src: Optional[NetworkID], dst: Optional[NetworkID], **kwargs) -> List[Log]:
+        if self.__snapshot_reader is not None:
+            # logs may be written without publishing a snapshot (ex: SHUTDOWN),
+            # and a lookup of newer rows by sn is cheap
+            self.__log_cache.sync()
+        logs = None
+        if kwargs.get('before') is None and kwargs.get('since') is None and kwargs.get('until') is None:
+            logs = self.__log_cache.get_logs(
+                src=NetworkID.as_address(src),
+                dst=NetworkID.as_address(dst),
+                events=kwargs.get('events'),
+                limit=kwargs.get('limit'),
+                after=kwargs.get('after'))
+        if logs is None:
+            logs = self.__storage.get_logs(
+                src=NetworkID.as_address(src),
+                dst=NetworkID.as_address(dst),
+                **kwargs)
+        for log in logs:
+            if 'src' in log:
+                log['src_name'] = self.name_of(log['src'])
+                log['src'] = NetworkID.from_address(log['src'])
+            if 'dst' in log:
+                log['dst_name'] = self.name_of(log['dst'])
+                log['dst'] = NetworkID.from_address(log['dst'])
+        return logs
+
+    def get_log_stats(self, src: Optional[NetworkID], dst: Optional[NetworkID], **kwargs) -> List[LogStat]:
+        stats = self.__storage.get_log_stats(
+            src=NetworkID.as_address(src),
+            dst=NetworkID.as_address(dst),
+            **kwargs)
+        for stat in stats:
+            stat['src_name'] = self.name_of(stat['src'])
+            stat['src'] = NetworkID.from_address(stat['src'])
+            stat['dst_name'] = self.name_of(stat['dst'])
+            stat['dst'] = NetworkID.from_address(stat['dst'])
+        return stats
+
+    def reload(self, networks: Optional[list[dict]] = None) -> NetworkChanges:
+        if networks is None:
+            networks = load_networks()
+        now = datetime.now()
+        with self.__update_lock, self.__lock.gen_wlock():
+            if self.__links is None:
+                # proxies for fee tables are built from the file on demand
+                self.__relay_fee_table.clear()
+                return { 'added': [], 'removed': [], 'changed': [] }
+            changes = self.__links.reload(networks)
+            if len(changes['added'])+len(changes['removed'])+len(changes['changed']) == 0:
+                return changes
+            # fee tables include names of other networks
+            self.__relay_fee_table.clear()
+        if self.leader:
+            self.write_log(now, '', '', 'log', 'RELOAD '+' '.join(f'{k}={",".join(v)}' for k, v in changes.items() if len(v) > 0))
+            self.publish_snapshot(now)
+        return changes
+
+    def get_fee_table(self, id: NetworkID, refresh: Optional[bool] = False) -> FeeTableJSON:
+        with self.__lock.gen_wlock():
+            if self.__stopped:
+                return None
+            now = datetime.now()
+            if id in self.__relay_fee_table and not refresh:
+                ts, table = self.__relay_fee_table[id]
+                if (now-ts).total_seconds() >= REFRESH_INTERVAL:
+                    self.__relay_fee_table[id] = (now, table)
+                    timer = Timer(0.1, self.get_fee_table, [id, True])
+                    timer.start()
+                return table
+
+            if self.__links is None:
+                # API workers build BMC proxies only for fee tables, with
+                # a storage of their own not to write the shared one
+                self.__links = Links(load_networks(), Storage(), TOPOLOGY_REVALIDATE)
+            try:
+                table = self.__links.get_relay_fee_table(id.address)
+            except BaseException as exc:
+                raise HTTPException(status_code=500, detail=f'fail to get relay_fee_table')
+
+            for e in table['table']:
+                e['fees'] = list(map(lambda x: str(x), e['fees']))
+            self.__relay_fee_table[id] = (now, table)
+            return table
+
+    def term(self):
+        if self.__lease is not None:
+            self.__lease.stop()
+        with self.__lock.gen_wlock():
+            if self.__stopped:
+                return
+            self.__stopped = True
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            if self.leader:
+                self.write_log(datetime.now(), '', '', 'log', f'SHUTDOWN {MONITOR_VERSION}')
+            if self.__lease is not None:
+                self.__lease.release()
+            self.__storage.term()
+            if self.__recorder is not None:
+                self.__recorder.close()
+        if self.__notifier is not None:
+            self.__notifier.term(NOTIFY_TIMEOUT)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import json
+from collections import OrderedDict, deque
+from datetime import datetime
+from threading import RLock
+from typing import List, Optional
+
+from .storage import Log, Storage
+
+LinkKey = Optional[tuple[str,str]]
+
+
+def log_matches(log: Log, src: Optional[str], dst: Optional[str], events: Optional[list[str]]) -> bool:
+    if src is not None and log['src'] != src and log['src'] != '':
+        return False
+    if dst is not None and log['dst'] != dst and log['dst'] != '':
+        return False
+    if events is not None and log['event'] not in events:
+        return False
+    return True
+
+
+class CachedLogs:
+    def __init__(self, logs: List[Log], size: int):
+        self.logs: deque[Log] = deque(logs, maxlen=size)
+        # all the matching logs in the storage are in the cache
+        self.complete = len(logs) < size
+
+    def append(self, log: Log):
+        if len(self.logs) > 0 and self.logs[-1]['sn'] >= log['sn']:
+            return
+        if len(self.logs) == self.logs.maxlen:
+            self.complete = False
+        self.logs.append(log)
+
+    def covers(self, after: Optional[int]) -> bool:
+        if self.complete or after is None:
+            return True
+        return len(self.logs) > 0 and self.logs[0]['sn'] <= after
+
+
+class LogCache:
+    def __init__(self, storage: Storage, size: int = 100, max_links: int = 1024):
+        self.__storage = storage
+        self.__size = size
+        self.__max_links = max_links
+        self.__lock = RLock()
+        self.__entries: OrderedDict[LinkKey,CachedLogs] = OrderedDict()
+        self.__last_sn = 0
+        latest = storage.get_logs(limit=1)
+        if len(latest) > 0:
+            self.__last_sn = latest[0]['sn']
+
+    def __get_entry(self, key: LinkKey) -> CachedLogs:
+        entry = self.__entries.get(key)
+        if entry is None:
+            src, dst = key if key is not None else (None, None)
+            logs = self.__storage.get_logs(src=src, dst=dst, limit=self.__size)
+            logs.reverse()
+            entry = CachedLogs(logs, self.__size)
+            self.__entries[key] = entry
+            if len(self.__entries) > self.__max_links:
+                for old in self.__entries.keys():
+                    if old is not None and old != key:
+                        del self.__entries[old]
+                        break
+        else:
+            self.__entries.move_to_end(key)
+        return entry
+
+    def write_log(self, ts: datetime, src: str, dst: str, event: str, msg: any) -> int:
+        with self.__lock:
+            sn = self.__storage.write_log(ts, src, dst, event, msg)
+            self.append({
+                'sn': sn,
+                'ts': ts.timestamp(),
+                'src': src,
+                'dst': dst,
+                'event': event,
+                'extra': json.dumps(msg),
+            })
+            return sn
+
+    def sync(self):
+        with self.__lock:
+            while True:
+                logs = self.__storage.get_logs(after=self.__last_sn)
+                for log in logs:
+                    self.append(log)
+                if len(logs) < 100:
+                    break
+
+    def append(self, log: Log):
+        with self.__lock:
+            self.__last_sn = max(self.__last_sn, log['sn'])
+            for key, entry in self.__entries.items():
+                if key is None or log_matches(log, key[0], key[1], None):
+                    entry.append(log)
+
+    def get_logs(self, src: Optional[str] = None, dst: Optional[str] = None, events: Optional[list[str]] = None, limit: Optional[int] = None, after: Optional[int] = None) -> Optional[List[Log]]:
+        if limit is None or limit > 100:
+            limit = 100
+        with self.__lock:
+            if src is not None and dst is not None:
+                entry = self.__get_entry((src, dst))
+            else:
+                entry = self.__get_entry(None)
+            logs = self.__filter(entry, src, dst, events, limit, after)
+        if logs is None:
+            return None
+        return list(map(lambda x: x.copy(), logs))
+
+    @staticmethod
+    def __filter(entry: CachedLogs, src: Optional[str], dst: Optional[str], events: Optional[list[str]], limit: int, after: Optional[int]) -> Optional[List[Log]]:
+        if not entry.covers(after):
+            return None
+        items = entry.logs if after is not None else reversed(entry.logs)
+        logs = []
+        for log in items:
+            if len(logs) >= limit:
+                break
+            if after is not None and log['sn'] <= after:
+                continue
+            if log_matches(log, src, dst, events):
+                logs.append(log)
+        if after is None and len(logs) < limit and not entry.complete:
+            return None
+        return logs
@@ -1,52 +1,152 @@
 #!/usr/bin/env python3
 
-from datetime import datetime
-from typing import Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Union
+from rich.text import Text
+from textual import work
 from textual.app import App, ComposeResult
-from textual.widgets import Header, Static, TextLog, ProgressBar
-from textual.containers import Container, Horizontal
-
-from .monitor import Link, LinkEvent, Links, strfdelta
-
-class StatusEntry(Static):
-    def __init__(self, links: Links, conn: Tuple[str,str]):
-        super().__init__()
+from textual.message import Message
+from textual.widgets import DataTable, Header, Static, TextLog, ProgressBar
+from textual.containers import Horizontal
+
+from .monitor import Link, LinkEvent, Links, NetworkStatus, strfdelta
+
+# lines kept in the log view
+MAX_LOG_LINES = 1000
+
+# cells sorted by the key, but rendered as the text
+class SortableCell:
+    __slots__ = ('key', 'text')
+
+    def __init__(self, key: Any, text: Union[str,Text]):
+        self.key = key
+        self.text = text
+
+    def __rich__(self) -> Union[str,Text]:
+        return self.text
+
+    def __lt__(self, other: 'SortableCell') -> bool:
+        return self.key < other.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, SortableCell) and self.key == other.key and self.text == other.text
+
+def seq_cell(seq: Optional[int]) -> SortableCell:
+    # sequences are None for unknown links
+    return SortableCell((seq is None, seq or 0), str(seq) if seq is not None else '')
+
+STATE_RANKS = {
+    Link.BROKEN: 4,
+    Link.BAD: 3,
+    Link.UNKNOWN: 2,
+}
+
+STATE_STYLES = {
+    'bad': 'bold white on red',
+    'pending': 'bold yellow on green',
+    'good': 'bold white on green',
+}
+
+COLUMNS = (
+    ('link', 'Link'),
+    ('state', 'State'),
+    ('pending', 'Pending'),
+    ('delay', 'Delay'),
+    ('tx_seq', 'TX Seq'),
+    ('rx_seq', 'RX Seq'),
+)
+
+class StatusTable(DataTable):
+    def __init__(self, links: Links, id: Optional[str] = None):
+        super().__init__(id=id, zebra_stripes=True)
+        self.cursor_type = 'row'
         self.__links = links
-        self.__conn = conn
-
-    def compose(self) -> ComposeResult:
-        src_name = self.__links.name_of(self.__conn[0])
-        dst_name = self.__links.name_of(self.__conn[1])
-        self.border_title = f'{src_name} <-> {dst_name}'
-        self.__forward = Static('', id='forward')
-        self.__forward.border_title = 'Forward'
-        yield self.__forward
-        self.__backward = Static('', id='backward')
-        self.__backward.border_title = 'Backward'
-        yield self.__backward
+        self.__rows: Dict[str,tuple] = {}
+        self.__sort_by = ('state',)
+        self.__reverse = True
 
     def on_mount(self) -> None:
-        self.update_self()
+        for key, label in COLUMNS:
+            self.add_column(label, key=key)
+        self.refresh_links()
 
     @staticmethod
-    def state_from_link(link: Link):
-        return f'[b]{link.state.upper()}[/b]\ntx_seq={link.tx_seq}, rx_seq={link.rx_seq}\npending={link.pending_count}, delay={strfdelta(link.pending_duration)}'
+    def row_key(src: str, dst: str) -> str:
+        return f'{src} {dst}'
 
-    def update_status(self, w: Static, link: Link):
+    @staticmethod
+    def cells_from_link(link: Link) -> tuple:
+        pending = link.pending_count
+        delay = link.pending_duration.total_seconds()
         if link.state == Link.GOOD:
-            if link.pending_count > 0:
-                w.set_classes('pending')
+            style = 'pending' if pending > 0 else 'good'
+        else:
+            style = 'bad'
+        rank = STATE_RANKS.get(link.state, 1 if pending > 0 else 0)
+        return (
+            f'{link.src_name} -> {link.dst_name}',
+            SortableCell((rank, delay), Text(link.state.upper(), style=STATE_STYLES[style])),
+            pending,
+            SortableCell(delay, strfdelta(timedelta(seconds=int(delay)))),
+            seq_cell(link.tx_seq),
+            seq_cell(link.rx_seq),
+        )
+
+    def refresh_links(self, events: Optional[List[LinkEvent]] = None):
+        keys = set()
+        for src, dst in self.__links.get_connected_pairs():
+            keys.add((src, dst))
+            keys.add((dst, src))
+
+        dirty = set()
+        for key in list(self.__rows.keys()):
+            if key not in keys:
+                self.remove_row(self.row_key(*key))
+                del self.__rows[key]
+                dirty.add(key)
+        if events is None:
+            candidates = keys
+        else:
+            # links with events, new links and ones showing growing delay
+            candidates = set((e.link.src, e.link.dst) for e in events)
+            for key in keys:
+                if key not in self.__rows or self.__links.get_link(*key).pending_count > 0:
+                    candidates.add(key)
+
+        for key in candidates:
+            if key not in keys:
+                continue
+            cells = self.cells_from_link(self.__links.get_link(*key))
+            prev = self.__rows.get(key)
+            if prev == cells:
+                continue
+            if prev is None:
+                self.add_row(*cells, key=self.row_key(*key))
             else:
-                w.set_classes('good')
+                row_key = self.row_key(*key)
+                for (column, _), value, old in zip(COLUMNS, cells, prev):
+                    if value != old:
+                        self.update_cell(row_key, column, value)
+            self.__rows[key] = cells
+            dirty.add(key)
+        if len(dirty) > 0:
+            self.sort(*self.__sort_by, reverse=self.__reverse)
+
+    def on_data_table_header_selected(self, message: DataTable.HeaderSelected) -> None:
+        column = message.column_key.value
+        if self.__sort_by == (column,):
+            self.__reverse = not self.__reverse
         else:
-            w.set_classes('bad')
-        w.update(self.state_from_link(link))
+            self.__sort_by = (column,)
+            self.__reverse = column in ('state', 'pending', 'delay')
+        self.sort(*self.__sort_by, reverse=self.__reverse)
 
-    def update_self(self):
-        fw_link = self.__links.get_link(self.__conn[0], self.__conn[1])
-        bw_link = self.__links.get_link(self.__conn[1], self.__conn[0])
-        self.update_status(self.__forward, fw_link)
-        self.update_status(self.__backward, bw_link)
+class StatusPolled(Message):
+    def __init__(self, now: datetime, status: Optional[NetworkStatus], error: Optional[BaseException] = None) -> None:
+        super().__init__()
+        self.now = now
+        self.status = status
+        self.error = error
 
 class MonitorApp(App):
     CSS_PATH = 'cui.css'
@@ -59,6 +159,7 @@ class MonitorApp(App):
         self.__on_update = on_update
         self.__on_log = None
         self.__last_update: Optional[datetime] = None
+        self.__polling = False
 
     @property
     def on_log(self) -> Optional[callable]:
@@ -70,14 +171,9 @@ class MonitorApp(App):
 
     def compose(self) -> ComposeResult:
         yield Header(name='BTP2 Network Monitor')
-        entries: Dict[Tuple[str,str], StatusEntry] = {}
-        for conn in self.__links.get_connected_links():
-            if conn in entries or (conn[1], conn[0]) in entries:
-                continue
-            entries[conn] = StatusEntry(self.__links, conn)
-        self.__entries = entries
-        yield Container(*entries.values(), id="monitors")
-        self.__log = TextLog(id="log")
+        self.__table = StatusTable(self.__links, id="monitors")
+        yield self.__table
+        self.__log = TextLog(id="log", max_lines=MAX_LOG_LINES)
         self.__log.border_title = 'Log'
         yield self.__log
         self.__progress = ProgressBar(total=self.__interval, show_percentage=False, show_eta=False)
@@ -103,25 +199,48 @@ class MonitorApp(App):
         self.__log.write(msg)
 
     def update_status(self) -> None:
+        # skip the cycle if the previous query is still running
+        if self.__polling:
+            return
+        self.__polling = True
+        self.poll_status()
+
+    @work(group='poll')
+    def poll_status(self) -> None:
+        # runs in a worker thread, only querying BMCs which may block.
+        # the status is applied to links on the event loop.
         now = datetime.now()
         try:
-            changed, updated = self.__links.update()
+            status = self.__links.query_status()
+        except BaseException as exc:
+            self.post_message(StatusPolled(now, None, exc))
+            return
+        self.post_message(StatusPolled(now, status))
+
+    def on_status_polled(self, message: StatusPolled) -> None:
+        self.__polling = False
+        now = message.now
+        if message.error is not None:
+            self.__last_update = now
+            self.write_log(f'{str(now)}: FAIL to update err={message.error}')
+            return
+        try:
+            changed, updated = self.__links.apply_status(message.status)
         except BaseException as exc:
             self.__last_update = now
             self.write_log(f'{str(now)}: FAIL to update err={exc}')
             return
-        self.update_self(now=now)
-        if changed:
+        self.update_self(now, updated)
+        if changed and self.__on_update is not None:
             self.__on_update(list(filter(lambda x: x.name == LinkEvent.STATE, updated)))
         if len(updated)>0:
             self.write_log(f'{str(now)}: UPDATED')
             for event in updated:
                 self.write_log(f'* {str(event)}')
 
-    def update_self(self, now: Optional[datetime] = None):
+    def update_self(self, now: Optional[datetime] = None, events: Optional[List[LinkEvent]] = None):
         if now is None:
             now = datetime.now()
         self.__last_update = now
         self.__bottom.update("[b]Last Update:[/b] "+str(now))
-        for entry in self.__entries.values():
-            entry.update_self()
+        self.__table.refresh_links(events)
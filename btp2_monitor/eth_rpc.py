@@ -25,7 +25,7 @@ class BMCWithEthereumRPC(types.BMC):
         return self.__address
 
     def get_status(self, _link: str) -> LinkStatus:
-        return LinkStatus(self.__periphery.functions.getStatus(_link=_link).call())
+        return LinkStatus.from_tuple(self.__periphery.functions.getStatus(_link=_link).call())
 
     def get_links(self) -> Tuple[str]:
         return tuple(self.__management.functions.getLinks().call())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import itertools
+from typing import Optional, Tuple
+
+import requests
+
+from . import types
+from .types import LinkStatus, VerifierStatus
+
+# 4-byte selectors of the BMC functions, keccak256 of the signatures
+SELECTOR_GET_STATUS = '22b05ed2'    # getStatus(string)
+SELECTOR_GET_LINKS = 'f66ddcbb'     # getLinks()
+SELECTOR_GET_ROUTES = '7e928072'    # getRoutes()
+SELECTOR_GET_FEE = '7d4c4f4a'       # getFee(string,bool)
+
+WORD = 32
+
+
+def encode_uint(value: int) -> str:
+    return f'{value:064x}'
+
+
+def encode_string(value: str) -> str:
+    data = value.encode()
+    padded = (len(data) + WORD - 1) // WORD * WORD
+    return encode_uint(len(data)) + data.ljust(padded, b'\0').hex()
+
+
+def decode_uint(data: bytes, offset: int) -> int:
+    return int.from_bytes(data[offset:offset+WORD], 'big')
+
+
+def decode_bytes(data: bytes, offset: int) -> bytes:
+    size = decode_uint(data, offset)
+    return data[offset+WORD:offset+WORD+size]
+
+
+def decode_string(data: bytes, offset: int) -> str:
+    return decode_bytes(data, offset).decode()
+
+
+def decode_array(data: bytes, offset: int) -> list[int]:
+    # offsets of the dynamic elements of the array at the offset
+    count = decode_uint(data, offset)
+    base = offset + WORD
+    return [base + decode_uint(data, base + i*WORD) for i in range(count)]
+
+
+def decode_status(data: bytes) -> LinkStatus:
+    base = decode_uint(data, 0)
+    verifier = base + decode_uint(data, base + 2*WORD)
+    return LinkStatus(
+        decode_uint(data, base),
+        decode_uint(data, base + WORD),
+        VerifierStatus(
+            decode_uint(data, verifier),
+            decode_bytes(data, verifier + decode_uint(data, verifier + WORD)),
+        ),
+        decode_uint(data, base + 3*WORD),
+    )
+
+
+def decode_links(data: bytes) -> Tuple[str]:
+    return tuple(decode_string(data, offset) for offset in decode_array(data, decode_uint(data, 0)))
+
+
+def decode_routes(data: bytes) -> dict[str,str]:
+    routes = {}
+    for offset in decode_array(data, decode_uint(data, 0)):
+        dst = decode_string(data, offset + decode_uint(data, offset))
+        routes[dst] = decode_string(data, offset + decode_uint(data, offset + WORD))
+    return routes
+
+
+class BMCWithEVMRPC(types.BMC):
+    def __init__(self, config: dict, session: Optional[requests.Session] = None) -> None:
+        bmc = config['bmc']
+        self.__url = config['endpoint']
+        self.__timeout = config.get('timeout', 10)
+        self.__session = session or requests.Session()
+        self.__ids = itertools.count(1)
+        self.__periphery = bmc
+        self.__management = config.get('bmcm', bmc)
+        self.__address = f'btp://{config["network"]}/{bmc}'
+
+    @property
+    def address(self) -> str:
+        return self.__address
+
+    def __call(self, to: str, data: str) -> bytes:
+        req = {
+            'jsonrpc': '2.0',
+            'id': next(self.__ids),
+            'method': 'eth_call',
+            'params': [{'to': to, 'data': '0x'+data}, 'latest'],
+        }
+        resp = self.__session.post(self.__url, json=req, timeout=self.__timeout)
+        resp.raise_for_status()
+        result = resp.json()
+        if 'error' in result:
+            raise Exception(f'eth_call failed to={to} error={result["error"]}')
+        return bytes.fromhex(result['result'][2:])
+
+    def get_status(self, _link: str) -> LinkStatus:
+        data = SELECTOR_GET_STATUS + encode_uint(WORD) + encode_string(_link)
+        return decode_status(self.__call(self.__periphery, data))
+
+    def get_links(self) -> Tuple[str]:
+        return decode_links(self.__call(self.__management, SELECTOR_GET_LINKS))
+
+    def get_routes(self) -> dict[str,str]:
+        return decode_routes(self.__call(self.__management, SELECTOR_GET_ROUTES))
+
+    def get_fee(self, dst: str, rollback: bool) -> int:
+        data = SELECTOR_GET_FEE + encode_uint(2*WORD) + encode_uint(1 if rollback else 0) + encode_string(dst)
+        return decode_uint(self.__call(self.__periphery, data), 0)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, List
+
+from .storage import Log
+
+LOG_FIELDS = [ 'sn', 'ts', 'src', 'dst', 'event', 'extra' ]
+
+def encode_ndjson(chunks: Iterable[List[Log]]) -> Iterator[str]:
+    for logs in chunks:
+        lines = []
+        for log in logs:
+            item = log.copy()
+            item['extra'] = json.loads(log['extra']) if log['extra'] is not None else None
+            lines.append(json.dumps(item)+'\n')
+        yield ''.join(lines)
+
+def encode_csv(chunks: Iterable[List[Log]]) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, LOG_FIELDS)
+    writer.writeheader()
+    for logs in chunks:
+        writer.writerows(logs)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    header = out.getvalue()
+    if header != '':
+        yield header
+
+ENCODERS = {
+    'ndjson': encode_ndjson,
+    'csv': encode_csv,
+}
+
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+def encode_logs(chunks: Iterable[List[Log]], fmt: str) -> Iterator[bytes]:
+    for text in ENCODERS[fmt](chunks):
+        yield text.encode()
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if len(data) > 0:
+            yield data
+    yield compressor.flush()
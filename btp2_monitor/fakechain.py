@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+from threading import Event, Lock, Thread
+import time
+from typing import Optional
+
+from .evm_rpc import (SELECTOR_GET_FEE, SELECTOR_GET_LINKS, SELECTOR_GET_ROUTES,
+    SELECTOR_GET_STATUS, WORD, decode_string, decode_uint, encode_string, encode_uint)
+
+TYPE_ICON = 'icon'
+TYPE_ETH = 'eth'
+
+PATH_ICON = '/api/v3/'
+PATH_ETH = '/eth/'
+
+FEE = 10**16
+
+
+def encode_offsets(items: list[str]) -> str:
+    # heads of the dynamic items followed by their encodings
+    offset = WORD * len(items)
+    heads = []
+    for item in items:
+        heads.append(encode_uint(offset))
+        offset += len(item) // 2
+    return ''.join(heads) + ''.join(items)
+
+
+def encode_strings(values: list[str]) -> str:
+    return encode_uint(WORD) + encode_uint(len(values)) + encode_offsets([encode_string(v) for v in values])
+
+
+def encode_routes(routes: dict[str,str]) -> str:
+    items = [encode_offsets([encode_string(dst), encode_string(link)]) for dst, link in routes.items()]
+    return encode_uint(WORD) + encode_uint(len(items)) + encode_offsets(items)
+
+
+def encode_status(rx_seq: int, tx_seq: int, height: int, current_height: int) -> str:
+    return (encode_uint(WORD) + encode_uint(rx_seq) + encode_uint(tx_seq) + encode_uint(4*WORD)
+        + encode_uint(current_height) + encode_uint(height) + encode_uint(2*WORD) + encode_uint(0))
+
+
+class FakeNetwork:
+    def __init__(self, index: int, type: str, height: int):
+        self.index = index
+        self.type = type
+        self.height = height
+        if type == TYPE_ICON:
+            self.network = f'0x{index+1:x}.icon'
+            self.bmc = f'cx{index+1:040x}'
+        else:
+            self.network = f'0x{index+1:x}.eth2'
+            # only decimal digits, so it's a valid checksum address as well
+            self.bmc = f'0x{index+1:040d}'
+        self.address = f'btp://{self.network}/{self.bmc}'
+
+
+class FakeLink:
+    def __init__(self, src: FakeNetwork, dst: FakeNetwork):
+        self.src = src
+        self.dst = dst
+        self.tx_seq = 0
+        self.rx_seq = 0
+        self.rx_height = 0
+        self.stalled_until = 0.0
+
+
+class FakeChain:
+    def __init__(self, networks: int, degree: int = 1, eth_ratio: float = 0.5,
+                 tx_rate: float = 1.0, latency: float = 0.0, error_rate: float = 0.0,
+                 stall_rate: float = 0.0, stall_duration: float = 60.0, seed: Optional[int] = None):
+        self.__rng = random.Random(seed)
+        self.__lock = Lock()
+        self.tx_rate = tx_rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_duration = stall_duration
+
+        eth_count = int(networks * eth_ratio)
+        self.networks = [FakeNetwork(i, TYPE_ETH if i < eth_count else TYPE_ICON, 1000 * (i+1)) for i in range(networks)]
+        self.links: dict[tuple[str,str],FakeLink] = {}
+        self.__peers: dict[str,list[str]] = { n.address: [] for n in self.networks }
+        for i, src in enumerate(self.networks):
+            for j in range(1, degree+1):
+                for k in [(i+j) % networks, (i-j) % networks]:
+                    dst = self.networks[k]
+                    if dst is src or (src.address, dst.address) in self.links:
+                        continue
+                    self.links[(src.address, dst.address)] = FakeLink(src, dst)
+                    self.__peers[src.address].append(dst.address)
+
+    def configs(self, base_url: str, eth_type: str = TYPE_ETH) -> list[dict]:
+        configs = []
+        for n in self.networks:
+            if n.type == TYPE_ICON:
+                endpoint = f'{base_url}{PATH_ICON}{n.index}'
+                type = TYPE_ICON
+            else:
+                endpoint = f'{base_url}{PATH_ETH}{n.index}'
+                type = eth_type
+            configs.append({
+                'type': type,
+                'network': n.network,
+                'name': f'{n.type.upper()}{n.index+1}',
+                'bmc': n.bmc,
+                'endpoint': endpoint,
+            })
+        return configs
+
+    def stall(self, src: str, dst: str, duration: float, now: Optional[float] = None):
+        with self.__lock:
+            now = time.time() if now is None else now
+            self.links[(src, dst)].stalled_until = now + duration
+
+    def __messages(self) -> int:
+        count = int(self.tx_rate)
+        if self.__rng.random() < self.tx_rate - count:
+            count += 1
+        return count
+
+    def step(self, now: Optional[float] = None):
+        with self.__lock:
+            now = time.time() if now is None else now
+            for n in self.networks:
+                n.height += 1
+            for link in self.links.values():
+                if self.stall_rate > 0 and self.__rng.random() < self.stall_rate:
+                    link.stalled_until = now + self.stall_duration
+                # the relay delivers messages sent before the new block
+                if link.stalled_until <= now and link.rx_seq < link.tx_seq:
+                    link.rx_seq = link.tx_seq
+                    link.rx_height = link.src.height - 1
+                link.tx_seq += self.__messages()
+
+    def run(self, interval: float, stop: Event):
+        while not stop.wait(interval):
+            self.step()
+
+    def get_status(self, network: FakeNetwork, peer: str) -> tuple[int,int,int,int]:
+        with self.__lock:
+            tx = self.links.get((network.address, peer))
+            rx = self.links.get((peer, network.address))
+            if tx is None or rx is None:
+                raise Exception(f'NotFound link={peer}')
+            return rx.rx_seq, tx.tx_seq, rx.rx_height, network.height
+
+    def get_links(self, network: FakeNetwork) -> list[str]:
+        return list(self.__peers[network.address])
+
+    def get_routes(self, network: FakeNetwork) -> dict[str,str]:
+        return {}
+
+    def get_fee(self, network: FakeNetwork, dst: str, rollback: bool) -> int:
+        return FEE * 2 if rollback else FEE
+
+    def handle_icx(self, network: FakeNetwork, req: dict):
+        if req['method'] != 'icx_call':
+            raise Exception(f'MethodNotFound method={req["method"]}')
+        data = req['params']['data']
+        params = data.get('params', {})
+        method = data['method']
+        if method == 'getStatus':
+            rx_seq, tx_seq, height, current_height = self.get_status(network, params['_link'])
+            return {
+                'rx_seq': hex(rx_seq),
+                'tx_seq': hex(tx_seq),
+                'verifier': { 'height': hex(height), 'extra': '0x' },
+                'cur_height': hex(current_height),
+            }
+        elif method == 'getLinks':
+            return self.get_links(network)
+        elif method == 'getRoutes':
+            return self.get_routes(network)
+        elif method == 'getFee':
+            return hex(self.get_fee(network, params['_to'], params['_response'] in (True, '0x1')))
+        raise Exception(f'MethodNotFound method={method}')
+
+    def handle_eth(self, network: FakeNetwork, req: dict):
+        method = req['method']
+        if method == 'eth_chainId':
+            return hex(network.index+1)
+        elif method == 'eth_blockNumber':
+            return hex(network.height)
+        elif method != 'eth_call':
+            raise Exception(f'MethodNotFound method={method}')
+        data = bytes.fromhex(req['params'][0]['data'][2:])
+        selector, args = data[:4].hex(), data[4:]
+        if selector == SELECTOR_GET_STATUS:
+            result = encode_status(*self.get_status(network, decode_string(args, decode_uint(args, 0))))
+        elif selector == SELECTOR_GET_LINKS:
+            result = encode_strings(self.get_links(network))
+        elif selector == SELECTOR_GET_ROUTES:
+            result = encode_routes(self.get_routes(network))
+        elif selector == SELECTOR_GET_FEE:
+            dst = decode_string(args, decode_uint(args, 0))
+            result = encode_uint(self.get_fee(network, dst, decode_uint(args, WORD) != 0))
+        else:
+            raise Exception(f'MethodNotFound selector={selector}')
+        return '0x' + result
+
+    def handle(self, path: str, req: dict) -> dict:
+        if self.latency > 0:
+            time.sleep(self.__rng.uniform(0.5, 1.5) * self.latency)
+        try:
+            if self.error_rate > 0 and self.__rng.random() < self.error_rate:
+                raise Exception('InjectedError')
+            if path.startswith(PATH_ICON):
+                handler, index = self.handle_icx, path[len(PATH_ICON):]
+            elif path.startswith(PATH_ETH):
+                handler, index = self.handle_eth, path[len(PATH_ETH):]
+            else:
+                raise Exception(f'NotFound path={path}')
+            result = handler(self.networks[int(index)], req)
+            return { 'jsonrpc': '2.0', 'id': req.get('id'), 'result': result }
+        except Exception as exc:
+            return { 'jsonrpc': '2.0', 'id': req.get('id'), 'error': { 'code': -32000, 'message': str(exc) } }
+
+
+class FakeChainHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        size = int(self.headers.get('Content-Length', 0))
+        req = json.loads(self.rfile.read(size))
+        body = json.dumps(self.server.chain.handle(self.path, req)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        pass
+
+
+class FakeChainServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, chain: FakeChain, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), FakeChainHandler)
+        self.chain = chain
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self, interval: Optional[float] = None) -> Event:
+        stop = Event()
+        Thread(target=self.serve_forever, daemon=True).start()
+        if interval is not None:
+            Thread(target=self.chain.run, args=(interval, stop), daemon=True).start()
+        return stop
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import os
+import socket
+from threading import Lock, Timer
+import time
+import traceback
+from typing import Callable, Optional
+import uuid
+
+from .storage import Storage
+
+LEASE_NAME = 'monitor'
+
+
+def new_owner() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+
+class Lease:
+    def __init__(self, storage: Storage, ttl: float, on_change: Callable[[bool],None],
+                 name: str = LEASE_NAME, owner: Optional[str] = None, interval: Optional[float] = None):
+        self.__storage = storage
+        self.__ttl = ttl
+        self.__on_change = on_change
+        self.__name = name
+        self.__owner = owner if owner is not None else new_owner()
+        self.__interval = interval if interval is not None else ttl / 3
+        self.__lock = Lock()
+        self.__timer = None
+        self.__stopped = False
+        self.__leader = False
+        self.__expires = 0.0
+
+    @property
+    def owner(self) -> str:
+        return self.__owner
+
+    @property
+    def leader(self) -> bool:
+        return self.__leader
+
+    def renew(self, now: Optional[float] = None) -> bool:
+        with self.__lock:
+            if self.__stopped:
+                return self.__leader
+            now = time.time() if now is None else now
+            try:
+                acquired = self.__storage.acquire_lease(self.__name, self.__owner, self.__ttl, now)
+            except BaseException:
+                traceback.print_exc()
+                # keep leading on a busy database unless the lease may expire
+                # before the next heartbeat
+                acquired = self.__leader and now + self.__interval < self.__expires
+            else:
+                if acquired:
+                    self.__expires = now + self.__ttl
+            changed = acquired != self.__leader
+            self.__leader = acquired
+        if changed:
+            self.__on_change(acquired)
+        return acquired
+
+    def __run(self):
+        self.renew()
+        with self.__lock:
+            if self.__stopped:
+                return
+            self.__timer = Timer(self.__interval, self.__run)
+            self.__timer.start()
+
+    def start(self):
+        self.__run()
+
+    def stop(self):
+        with self.__lock:
+            self.__stopped = True
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+
+    def release(self):
+        with self.__lock:
+            if not self.__leader:
+                return
+            self.__leader = False
+            try:
+                self.__storage.release_lease(self.__name, self.__owner)
+            except BaseException:
+                traceback.print_exc()
@@ -1,39 +1,67 @@
 
 import json
+import threading
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import click
-import requests
 
-from .cui import MonitorApp
+from .export import ENCODERS, encode_logs, gzip_stream
 from .monitor import Link, LinkEvent, Links, strfdelta
+from .notify import format_state
 from .storage import Storage
 
+KEY_NETWORKS = 'networks'
+KEY_NETWORKS_PATH = 'networks_path'
 KEY_LINKS = 'links'
+KEY_STORAGE = 'storage'
+# commands running without the network configuration
+STANDALONE_COMMANDS = ('fake-chain',)
+# commands building links by themselves
+REPLAY_COMMANDS = ('replay', 'shard')
+# keys of report.FORMATTERS, listed here not to import NumPy for other commands
+REPORT_FORMATS = ('csv', 'json')
 
 @click.group()
 @click.option('--networks', metavar='<networks.json>', type=str, envvar="NETWORKS_JSON")
 @click.option('--storage_url', type=str, envvar="STORAGE_URL")
+@click.option('--record', metavar='<recording>', type=str, envvar="STATUS_RECORDING", help='Append polled statuses to the recording')
+@click.option('--shard_urls', type=str, envvar="SHARD_URLS", help='Comma separated URLs of the shards to get statuses from')
 @click.pass_context
-def main(ctx: click.Context, networks: str, storage_url: Optional[str] = None):
+def main(ctx: click.Context, networks: str, storage_url: Optional[str] = None, record: Optional[str] = None,
+         shard_urls: Optional[str] = None):
+    ctx.ensure_object(dict)
+    if ctx.invoked_subcommand in STANDALONE_COMMANDS:
+        return
+    if networks is None:
+        raise click.UsageError('--networks is required')
     with open(networks, 'rb') as fd:
         network_json = json.load(fd)
 
     storage = storage_url and Storage(storage_url)
-    links = Links(network_json, storage)
+    ctx.obj[KEY_NETWORKS] = network_json
+    ctx.obj[KEY_NETWORKS_PATH] = networks
+    ctx.obj[KEY_STORAGE] = storage
+    if ctx.invoked_subcommand in REPLAY_COMMANDS:
+        return
+
+    on_status = None
+    if record is not None:
+        from .recording import StatusRecorder
+        on_status = StatusRecorder(record).write
+    if shard_urls is not None:
+        from .shard import ShardedLinks
+        links = ShardedLinks(network_json, shard_urls.split(','), storage, on_status=on_status)
+    else:
+        links = Links(network_json, storage, on_status=on_status)
 
-    ctx.ensure_object(dict)
     ctx.obj[KEY_LINKS] = links
 
 def build_slack_message(events:list[LinkEvent]) -> str:
     items = []
     for event in events:
-        link_str = f'{event.link.src_name} -> {event.link.dst_name}'
-        if event.after == Link.GOOD:
-            items.append(f'{link_str} : :large_green_circle: *GOOD*')
-        else:
-            items.append(f'{link_str} : :red_circle: *{event.after.upper()}*')
+        items.append(format_state(event.link.src_name, event.link.dst_name, event.after))
     return "\n".join(items)
 
 @main.command('monitor')
@@ -41,29 +69,31 @@ def build_slack_message(events:list[LinkEvent]) -> str:
 @click.option('--interval', type=click.INT, default=30.0, envvar="REFRESH_INTERVAL")
 @click.option('--slack_hook', type=str, envvar='SLACK_HOOK')
 @click.option('--slack_channel', type=str, envvar='SLACK_CHANNEL')
+@click.option('--webhooks', type=str, envvar='NOTIFY_WEBHOOKS', help='Comma separated URLs to post state changes')
+@click.option('--notify_window', type=click.FLOAT, default=10.0, envvar='NOTIFY_WINDOW', help='Seconds to batch state changes')
 @click.option('--log_file', type=str, envvar="LOG_FILE")
-def monitor_status(obj: dict, interval: int = 30, slack_hook: str = None, slack_channel: str = None, log_file: str = None):
+def monitor_status(obj: dict, interval: int = 30, slack_hook: str = None, slack_channel: str = None,
+                   webhooks: str = None, notify_window: float = 10.0, log_file: str = None):
+    from .cui import MonitorApp
+    from .notify import build_notifier
+
     links: Links = obj[KEY_LINKS]
     links.update(True)
 
-    def on_update(changes: List[LinkEvent]):
-        if slack_hook is not None and slack_channel is not None:
-            msg = {
-                'channel': slack_channel,
-                'username': 'BTP Monitor',
-                'text': build_slack_message(changes)
-            }
-            requests.post(slack_hook, json=msg)
-
-    app = MonitorApp(links, interval, on_update)
-    if log_file is not None:
-        with open(log_file, "+at") as fd:
-            def on_log(log):
-                print(log, file=fd, flush=True)
-            app.on_log = on_log
+    notifier = build_notifier(slack_hook, slack_channel, webhooks, notify_window)
+    app = MonitorApp(links, interval, notifier and notifier.notify)
+    try:
+        if log_file is not None:
+            with open(log_file, "+at") as fd:
+                def on_log(log):
+                    print(log, file=fd, flush=True)
+                app.on_log = on_log
+                app.run()
+        else:
             app.run()
-    else:
-        app.run()
+    finally:
+        if notifier is not None:
+            notifier.term()
 
 
 @main.command('status')
@@ -71,13 +101,7 @@ def monitor_status(obj: dict, interval: int = 30, slack_hook: str = None, slack_
 def show_status(obj: dict):
     links: Links = obj[KEY_LINKS]
     btp_status = links.query_status(True)
-    known_links = btp_status.get_known_links()
-
-    connected: list[tuple[str,str]] = []
-    for link in known_links:
-        rlink = (link[1], link[0])
-        if rlink in known_links and rlink not in connected:
-            connected.append(link)
+    connected = btp_status.get_known_links().connected()
 
     click.secho(f'| {"Network":^44s} | {"FW Pending":^10s} | {"BW Pending":^10s} |',reverse=True)
     for conn in connected:
@@ -89,6 +113,203 @@ def show_status(obj: dict):
         dst_name = links.name_of(conn[1])
         click.echo(f'| {src_name:>20s} -> {dst_name:<20s} | {fw_pending:10d} | {bw_pending:10d} |')
 
+@main.command('report')
+@click.pass_obj
+@click.option('--from', 'since', type=click.DateTime(), help='Start of the range (default: 30 days before the end)')
+@click.option('--to', 'until', type=click.DateTime(), help='End of the range (default: now)')
+@click.option('--format', 'fmt', type=click.Choice(REPORT_FORMATS), default='json')
+@click.option('--output', type=click.File('wt'), default='-')
+def show_report(obj: dict, since: Optional[datetime], until: Optional[datetime], fmt: str, output):
+    from .report import FORMATTERS, build_report
+
+    links: Links = obj[KEY_LINKS]
+    storage: Optional[Storage] = obj[KEY_STORAGE]
+    if storage is None:
+        raise click.UsageError('--storage_url is required for the report')
+    if until is None:
+        until = datetime.now()
+    if since is None:
+        since = until - timedelta(days=30)
+    reports = build_report(links, storage, since, until)
+    output.write(FORMATTERS[fmt](reports))
+
+@main.command('export-events')
+@click.pass_obj
+@click.option('--from', 'since', type=click.DateTime(), help='Start of the range')
+@click.option('--to', 'until', type=click.DateTime(), help='End of the range')
+@click.option('--format', 'fmt', type=click.Choice(list(ENCODERS.keys())), default='ndjson')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the output with gzip')
+@click.option('--output', type=click.File('wb'), default='-')
+def export_events(obj: dict, since: Optional[datetime], until: Optional[datetime], fmt: str, compress: bool, output):
+    storage: Optional[Storage] = obj[KEY_STORAGE]
+    if storage is None:
+        raise click.UsageError('--storage_url is required to export events')
+    chunks = storage.iter_logs(
+        since.timestamp() if since is not None else None,
+        until.timestamp() if until is not None else None)
+    content = encode_logs(chunks, fmt)
+    if compress:
+        content = gzip_stream(content)
+    for data in content:
+        output.write(data)
+
+@main.command('poller')
+@click.pass_obj
+@click.option('--snapshot', type=str, envvar='SNAPSHOT_PATH', required=True, help='Path of the status snapshot for API workers')
+@click.option('--ha', is_flag=True, help='Poll only while holding the lease in the storage')
+def run_poller(obj: dict, snapshot: str, ha: bool):
+    import signal
+    from .backend import MODE_HA, MODE_POLLER, MonitorBackend, load_networks
+
+    links: Links = obj[KEY_LINKS]
+    storage: Optional[Storage] = obj[KEY_STORAGE]
+    if storage is None:
+        raise click.UsageError('--storage_url is required for the poller')
+    backend = MonitorBackend(MODE_HA if ha else MODE_POLLER, storage, links, snapshot)
+
+    def on_reload(signum, frame):
+        try:
+            changes = backend.reload(load_networks(obj[KEY_NETWORKS_PATH]))
+            click.echo(f'Reloaded networks {changes}')
+        except BaseException as exc:
+            click.echo(f'FAIL to reload networks err={exc}', err=True)
+    signal.signal(signal.SIGHUP, on_reload)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.term()
+
+@main.command('shard')
+@click.pass_obj
+@click.option('--host', type=str, default='127.0.0.1')
+@click.option('--port', type=click.INT, default=9100)
+@click.option('--shards', type=str, envvar='SHARD_NAMES', required=True, help='Comma separated names of all the shards')
+@click.option('--name', type=str, envvar='SHARD_NAME', required=True, help='Name of this shard')
+def run_shard(obj: dict, host: str, port: int, shards: str, name: str):
+    import signal
+    from .backend import load_networks
+    from .shard import ShardServer, shard_networks
+
+    names = shards.split(',')
+    networks = shard_networks(obj[KEY_NETWORKS], names, name)
+    # shards only serve statuses; the states are kept by the poller
+    server = ShardServer(Links(networks, Storage()), name, host, port)
+
+    def on_reload(signum, frame):
+        try:
+            changes = server.reload(shard_networks(load_networks(obj[KEY_NETWORKS_PATH]), names, name))
+            click.echo(f'Reloaded networks {changes}')
+        except BaseException as exc:
+            click.echo(f'FAIL to reload networks err={exc}', err=True)
+    signal.signal(signal.SIGHUP, on_reload)
+    click.echo(f'Serving {len(networks)} networks of shard {name} at {server.url}')
+    server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+@main.command('replay')
+@click.pass_obj
+@click.argument('recording', type=click.Path(exists=True, dir_okay=False))
+@click.option('--from', 'since', type=click.DateTime(), help='Start of the range')
+@click.option('--to', 'until', type=click.DateTime(), help='End of the range')
+@click.option('--tx_limit', type=click.INT, help='Override tx_limit of all networks')
+@click.option('--rx_limit', type=click.INT, help='Override rx_limit of all networks')
+@click.option('--events', 'show_events', is_flag=True, help='Print the events of the cycles')
+@click.option('--replay_storage', type=str, help='Storage for the replayed states and logs (default: in memory)')
+def replay_status(obj: dict, recording: str, since: Optional[datetime], until: Optional[datetime],
+                  tx_limit: Optional[int], rx_limit: Optional[int], show_events: bool, replay_storage: Optional[str]):
+    import time
+    from .recording import VirtualClock, read_recording, replay
+
+    networks = obj[KEY_NETWORKS]
+    limits = {}
+    if tx_limit is not None:
+        limits['tx_limit'] = tx_limit
+    if rx_limit is not None:
+        limits['rx_limit'] = rx_limit
+    networks = [dict(net, **limits) for net in networks]
+
+    frames = read_recording(recording,
+        since.timestamp() if since is not None else None,
+        until.timestamp() if until is not None else None)
+    clock = VirtualClock()
+    # never the one of --storage_url, not to overwrite the monitored states
+    links = Links(networks, Storage(replay_storage or ':memory:'), clock=clock)
+
+    changes: Dict[Link,int] = {}
+    durations: Dict[Link,Dict[str,float]] = {}
+    cycles = 0
+    first_ts = last_ts = None
+    start = time.perf_counter()
+    for ts, _, events in replay(links, clock, frames):
+        if last_ts is not None:
+            for link in links.get_all_links():
+                stats = durations.setdefault(link, {})
+                stats[link.state] = stats.get(link.state, 0.0) + ts - last_ts
+        else:
+            first_ts = ts
+        for event in events:
+            if event.name == LinkEvent.STATE:
+                changes[event.link] = changes.get(event.link, 0) + 1
+            if show_events:
+                click.echo(f'{datetime.fromtimestamp(ts)}: {event}')
+        cycles += 1
+        last_ts = ts
+    elapsed = time.perf_counter() - start
+
+    if cycles == 0:
+        click.echo('No status in the range')
+        return
+    click.secho(f'| {"Link":^44s} | {"Changes":^7s} | {"Bad":^12s} | {"Broken":^12s} |', reverse=True)
+    for link in links.get_all_links():
+        stats = durations.get(link, {})
+        bad = strfdelta(timedelta(seconds=stats.get(Link.BAD, 0.0)))
+        broken = strfdelta(timedelta(seconds=stats.get(Link.BROKEN, 0.0)))
+        click.echo(f'| {link.src_name:>20s} -> {link.dst_name:<20s} | {changes.get(link, 0):7d} | {bad:>12s} | {broken:>12s} |')
+    span = timedelta(seconds=last_ts - first_ts)
+    click.echo(f'Replayed {cycles} cycles over {span} in {elapsed:.2f}s')
+
+@main.command('fake-chain')
+@click.option('--host', type=str, default='127.0.0.1')
+@click.option('--port', type=click.INT, default=9080)
+@click.option('--chains', type=click.INT, default=10, help='Number of networks')
+@click.option('--degree', type=click.INT, default=1, help='Links to the neighbors in each direction')
+@click.option('--eth_ratio', type=click.FLOAT, default=0.5, help='Ratio of EVM networks')
+@click.option('--eth_type', type=click.Choice(['eth', 'evm']), default='eth', help='Type of EVM networks in the configuration')
+@click.option('--interval', type=click.FLOAT, default=2.0, help='Block interval in seconds')
+@click.option('--tx_rate', type=click.FLOAT, default=1.0, help='Messages of a link per block')
+@click.option('--latency', type=click.FLOAT, default=0.0, help='Mean latency of the calls in seconds')
+@click.option('--error_rate', type=click.FLOAT, default=0.0, help='Ratio of the calls failing')
+@click.option('--stall_rate', type=click.FLOAT, default=0.0, help='Probability of a link stalling for each block')
+@click.option('--stall_duration', type=click.FLOAT, default=60.0, help='Duration of the stalls in seconds')
+@click.option('--seed', type=click.INT)
+@click.option('--output', type=click.File('wt'), help='Write the network configuration for the monitor')
+def fake_chain(host: str, port: int, chains: int, degree: int, eth_ratio: float, eth_type: str,
+               interval: float, tx_rate: float, latency: float, error_rate: float,
+               stall_rate: float, stall_duration: float, seed: Optional[int], output):
+    from .fakechain import FakeChain, FakeChainServer
+
+    chain = FakeChain(chains, degree, eth_ratio, tx_rate, latency, error_rate, stall_rate, stall_duration, seed)
+    server = FakeChainServer(chain, host, port)
+    if output is not None:
+        json.dump(chain.configs(server.url, eth_type), output, indent=2)
+        output.close()
+    click.echo(f'Serving {len(chain.networks)} networks with {len(chain.links)} links at {server.url}')
+    stop = server.start(interval)
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.shutdown()
+
 @main.command('web')
 @click.pass_obj
 def web_server(obj: dict):
@@ -1,30 +1,56 @@
 #!/usr/bin/env python3
 
 from datetime import datetime, timedelta
-from typing import Any, Dict, Iterable, List, Optional, Tuple, TypeVar
+import importlib
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypedDict, TypeVar
 from urllib.parse import urlparse
 
-from .storage import ConnectionState, Storage, TXRecord, new_connection_state
+from .stats import LatencyStats, ThroughputStats
+from .storage import ConnectionStateFields, LinkSample, Storage, Topology, TXRecord, new_connection_state
+from .topology import TopologyIndex
 
-from .eth_rpc import BMCWithEthereumRPC
-from .icon_rpc import BMCWithICONRPC
 from .types import BMC, LinkStatus, FeeTable
 
+# factories are imported on the first use, so the RPC libraries of unused
+# network types are never loaded.
 BMC_FACTORY = {
-    'icon': BMCWithICONRPC,
-    'eth': BMCWithEthereumRPC,
+    'icon': '.icon_rpc:BMCWithICONRPC',
+    'eth': '.eth_rpc:BMCWithEthereumRPC',
+    'evm': '.evm_rpc:BMCWithEVMRPC',
 }
 
+# returns the current time in seconds since the epoch, replaced with
+# a virtual clock on replaying recorded statuses.
+Clock = Callable[[], float]
+
 COIN_BY_TYPE = {
     'icon': 'ICX',
     'eth': 'ETH',
+    'evm': 'ETH',
 }
 
-def build_proxy(net: dict) -> BMC:
-    factory = BMC_FACTORY.get(net['type'], None)
+def get_factory(type: str) -> Callable[[dict],BMC]:
+    factory = BMC_FACTORY.get(type, None)
     if factory is None:
-        raise Exception(f'unknown network type={net["type"]}')
-    return factory(net)
+        raise Exception(f'unknown network type={type}')
+    if isinstance(factory, str):
+        module, name = factory.split(':')
+        factory = getattr(importlib.import_module(module, __package__), name)
+        BMC_FACTORY[type] = factory
+    return factory
+
+def build_proxy(net: dict) -> BMC:
+    return get_factory(net['type'])(net)
+
+def configs_of(networks: List[dict]) -> dict[str,dict]:
+    configs = {}
+    for net in networks:
+        network = net['network']
+        if network in configs:
+            raise Exception(f'duplicate network id={network}')
+        configs[network] = net
+    return configs
 
 def bmc_changed(net: dict, bmc: str) -> dict:
     n2 = net.copy()
@@ -35,105 +61,91 @@ def bmc_changed(net: dict, bmc: str) -> dict:
     n2['name'] = n2.get('name', net['network'])+f'({str(bmc)[:6]})'
     return n2
 
-class EdgeState(tuple[str,Optional[int],Optional[int]]):
+class NetworkChanges(TypedDict):
+    added: list[str]
+    removed: list[str]
+    changed: list[str]
+
+LATENCY_PERSIST_INTERVAL = 60
+TOPOLOGY_REVALIDATE = 3600
+
+class EdgeState:
     ACTIVE = 'active'
     INACTIVE = 'inactive'
 
-    @property
-    def state(self) -> str:
-        return self[0]
-    
-    @property
-    def seq(self) -> Optional[int]:
-        return self[1]
+    __slots__ = ('state', 'seq', 'height')
 
-    @property
-    def height(self) -> Optional[int]:
-        return self[2]
+    def __init__(self, state: str, seq: Optional[int] = None, height: Optional[int] = None):
+        self.state = state
+        self.seq = seq
+        self.height = height
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, EdgeState):
+            return NotImplemented
+        return self.state == other.state and self.seq == other.seq and self.height == other.height
+
+    def __repr__(self) -> str:
+        return f'EdgeState(state={self.state},seq={self.seq},height={self.height})'
+
+class LinkUpdate:
+    __slots__ = ('tx', 'rx')
+
+    def __init__(self, tx: Optional[EdgeState], rx: Optional[EdgeState]):
+        self.tx = tx
+        self.rx = rx
 
-class LinkUpdate(tuple[Optional[EdgeState],Optional[EdgeState]]):
-    @property
-    def tx(self) -> Optional[EdgeState]:
-        return self[0]
-    
     @property
     def tx_state(self) -> Optional[str]:
-        tx = self[0]
-        return tx.state if tx is not None else None
+        return self.tx.state if self.tx is not None else None
 
     @property
     def tx_seq(self) -> Optional[int]:
-        tx = self[0]
-        return tx.seq if tx is not None else None
+        return self.tx.seq if self.tx is not None else None
 
     @property
     def tx_height(self) -> Optional[int]:
-        tx = self[0]
-        return tx.height if tx is not None else None
-
-    @property
-    def rx(self) -> Optional[EdgeState]:
-        return self[1]
+        return self.tx.height if self.tx is not None else None
 
     @property
     def rx_state(self) -> Optional[str]:
-        rx = self[1]
-        return rx.state if rx is not None else None
+        return self.rx.state if self.rx is not None else None
 
     @property
     def rx_seq(self) -> Optional[int]:
-        rx = self[1]
-        return rx.seq if rx is not None else None
+        return self.rx.seq if self.rx is not None else None
 
     @property
     def rx_height(self) -> Optional[int]:
-        rx = self[1]
-        return rx.height if rx is not None else None
+        return self.rx.height if self.rx is not None else None
 
-class LinkEvent(tuple):
+class LinkEvent:
     TX = 'tx'
     RX = 'rx'
     STATE = 'state'
 
+    __slots__ = ('name', 'link', 'seq', 'count', 'delta', 'before', 'after')
+
+    def __init__(self, name: str, link: 'Link', seq: Optional[int] = None, count: Optional[int] = None, delta: Optional[timedelta] = None, before: Optional[str] = None, after: Optional[str] = None):
+        self.name = name
+        self.link = link
+        self.seq = seq
+        self.count = count
+        self.delta = delta
+        self.before = before
+        self.after = after
+
     @staticmethod
     def TXEvent(link: 'Link', seq: int, count: int) -> 'LinkEvent':
-        return LinkEvent((LinkEvent.TX, link, seq, count))
-    
+        return LinkEvent(LinkEvent.TX, link, seq=seq, count=count)
+
     @staticmethod
     def RXEvent(link: 'Link', seq: int, count: int, delta: timedelta) -> 'LinkEvent':
-        return LinkEvent((LinkEvent.RX, link, seq, count, delta))
+        return LinkEvent(LinkEvent.RX, link, seq=seq, count=count, delta=delta)
 
     @staticmethod
     def StateEvent(link: 'Link', before: str, after: str) -> 'LinkEvent':
-        return LinkEvent((LinkEvent.STATE, link, before, after))
-
-    @property
-    def name(self) -> str:
-        return self[0]
-
-    @property
-    def link(self) -> 'Link':
-        return self[1]
-
-    @property
-    def seq(self) -> int:
-        return self[2]
-
-    @property
-    def count(self) -> int:
-        return self[3]
-
-    @property
-    def delta(self) -> timedelta:
-        return self[4]
-
-    @property
-    def before(self) -> str:
-        return self[2]
-
-    @property
-    def after(self) -> str:
-        return self[3]
+        return LinkEvent(LinkEvent.STATE, link, before=before, after=after)
 
     def __str__(self) -> str:
         name = self.name
@@ -145,7 +157,7 @@ class LinkEvent(tuple):
         elif name == self.STATE:
             return f'{link_str} : {self.after.upper()} delay={strfdelta(self.link.pending_duration)}'
         else:
-            super().__str__()
+            return f'{link_str} : {name}'
 
 class Link:
     UNKNOWN = 'unknown'
@@ -153,132 +165,82 @@ class Link:
     BAD = 'bad'
     GOOD = 'good'
 
-    def __init__(self, storage: Storage, src: str, dst: str, time_limit: int, src_name: str, dst_name: str) -> None:
+    __slots__ = (
+        'src', 'dst', 'src_name', 'dst_name', 'time_limit', 'state', 'tx_history',
+        'tx_state', 'tx_seq', 'tx_height', 'tx_ts',
+        'rx_state', 'rx_seq', 'rx_height', 'rx_ts',
+        'latency', 'throughput',
+        '__storage', '__conn_id', '__flushed', '__latency_ts', '__clock',
+    )
+
+    def __init__(self, storage: Storage, src: str, dst: str, time_limit: int, src_name: str, dst_name: str, clock: Clock = time.time) -> None:
         self.__storage = storage
-        self.__conn_id = None
-        self.__conn_dirty = True
-        self.__conn_state = new_connection_state()
+        self.__clock = clock
+        self.__flushed: Optional[tuple] = None
         self.src = src
         self.dst = dst
         self.src_name = src_name
         self.dst_name = dst_name
-        self.tx_history: List[TXRecord] = []
-        self.__tx_state = None
-        self.__rx_state = None
         self.time_limit = time_limit
-        self.state = Link.UNKNOWN
-        self.__tx_ts = None
-        self.__rx_ts = None
+        self.latency = LatencyStats()
+        self.__latency_ts: Optional[datetime] = None
+        self.throughput = ThroughputStats()
 
         cstate = storage.get_connection_state(src, dst)
         if cstate is None:
             cstate = new_connection_state()
             self.__storage.set_connection_state(self.src, self.dst, cstate)
-        self.__conn_state = cstate
-        self.__conn_id = self.__conn_state['id']
+        self.__conn_id = cstate['id']
+        self.state = cstate['state'] or Link.UNKNOWN
+        self.tx_state: Optional[EdgeState] = None
+        self.rx_state: Optional[EdgeState] = None
         if cstate['tx_state'] is not None:
-            self.__tx_state = EdgeState((cstate['tx_state'], cstate['tx_seq'], cstate['tx_height']))
+            self.tx_state = EdgeState(cstate['tx_state'], cstate['tx_seq'], cstate['tx_height'])
         if cstate['rx_state'] is not None:
-            self.__rx_state = EdgeState((cstate['rx_state'], cstate['rx_seq'], cstate['rx_height']))
-        self.tx_history = list(storage.get_tx_records(self.__conn_id))
-        self.__tx_ts = datetime.fromtimestamp(cstate['tx_ts']) if cstate['tx_ts'] is not None else None
-        self.__rx_ts = datetime.fromtimestamp(cstate['rx_ts']) if cstate['rx_ts'] is not None else None
-        self.handle_update(LinkUpdate((None,None)), datetime.now())
+            self.rx_state = EdgeState(cstate['rx_state'], cstate['rx_seq'], cstate['rx_height'])
+        self.tx_seq: Optional[int] = cstate['tx_seq']
+        self.tx_height: Optional[int] = cstate['tx_height']
+        self.tx_ts: Optional[float] = cstate['tx_ts']
+        self.rx_seq: Optional[int] = cstate['rx_seq']
+        self.rx_height: Optional[int] = cstate['rx_height']
+        self.rx_ts: Optional[float] = cstate['rx_ts']
+        self.tx_history: List[TXRecord] = list(storage.get_tx_records(self.__conn_id))
+        latency = storage.get_link_stats(self.__conn_id, 'latency')
+        if latency is not None:
+            self.latency.load_dict(latency)
+        heartbeat = storage.get_link_stats(self.__conn_id, 'heartbeat')
+        if heartbeat is not None:
+            # the state is unknown while the monitor was down
+            self.__storage.add_state_interval(self.__conn_id, Link.UNKNOWN, datetime.fromtimestamp(heartbeat))
+        now = datetime.fromtimestamp(clock())
+        self.throughput.start(now.timestamp())
+        self.handle_update(LinkUpdate(None, None), now)
+        self.__storage.add_state_interval(self.__conn_id, self.state, now)
 
     @property
-    def state(self) -> str:
-        state = self.__conn_state['state']
-        return self.UNKNOWN if state is None else state
-
-    @state.setter
-    def state(self, state: str):
-        self.__conn_state['state'] = state
-        self.__conn_dirty = True
-    
-    @property
-    def tx_state(self) -> Optional[EdgeState]:
-        return self.__tx_state
-
-    @tx_state.setter
-    def tx_state(self, state: Optional[EdgeState]):
-        if self.__tx_state != state:
-            self.__tx_state = state
-            self.__conn_dirty = True
-            self.__conn_state['tx_state'] = None if state is None else state.state
-
-    @property
-    def tx_seq(self) -> Optional[int]:
-        return self.__conn_state['tx_seq']
-    
-    @tx_seq.setter
-    def tx_seq(self, seq: Optional[int]):
-        self.__conn_dirty = True
-        self.__conn_state['tx_seq'] = seq
-
-    @property
-    def tx_height(self) -> Optional[int]:
-        return self.__conn_state['tx_height']
-    
-    @tx_height.setter
-    def tx_height(self, height: Optional[int]):
-        self.__conn_dirty = True
-        self.__conn_state['tx_height'] = height
+    def conn_id(self) -> int:
+        return self.__conn_id
 
-    @property
-    def tx_ts(self) -> Optional[datetime]:
-        return self.__tx_ts
-    
-    @tx_ts.setter
-    def tx_ts(self, ts: Optional[datetime]):
-        self.__tx_ts = ts
-        ts_value = None if ts is None else ts.timestamp()
-        self.__conn_dirty = True
-        self.__conn_state['tx_ts'] = ts_value
-
-    @property
-    def rx_state(self) -> Optional[EdgeState]:
-        return self.__rx_state
-
-    @rx_state.setter
-    def rx_state(self, state: Optional[EdgeState]):
-        if self.__rx_state != state:
-            self.__rx_state = state
-            self.__conn_dirty = True
-            self.__conn_state['rx_state'] = None if state is None else state.state
-
-    @property
-    def rx_seq(self) -> Optional[int]:
-        return self.__conn_state['rx_seq']
-    
-    @rx_seq.setter
-    def rx_seq(self, seq: Optional[int]):
-        self.__conn_dirty = True
-        self.__conn_state['rx_seq'] = seq
-
-    @property
-    def rx_height(self) -> Optional[int]:
-        return self.__conn_state['rx_height']
-    
-    @rx_height.setter
-    def rx_height(self, height: Optional[int]):
-        self.__conn_dirty = True
-        self.__conn_state['rx_height'] = height
-
-    @property
-    def rx_ts(self) -> Optional[datetime]:
-        return self.__rx_ts
-    
-    @rx_ts.setter
-    def rx_ts(self, ts: Optional[datetime]):
-        self.__rx_ts = ts
-        ts_value = None if ts is None else ts.timestamp()
-        self.__conn_dirty = True
-        self.__conn_state['rx_ts'] = ts_value
-    
     def flush(self):
-        if self.__conn_dirty:
-            self.__storage.set_connection_state(self.src, self.dst, self.__conn_state, False)
-            self.__conn_dirty = False
+        values = (
+            self.state,
+            self.tx_state.state if self.tx_state is not None else None,
+            self.tx_seq, self.tx_ts, self.tx_height,
+            self.rx_state.state if self.rx_state is not None else None,
+            self.rx_seq, self.rx_ts, self.rx_height,
+        )
+        if values != self.__flushed:
+            self.__storage.set_connection_state(self.src, self.dst, dict(zip(ConnectionStateFields, values)), False)
+            self.__flushed = values
+
+    def flush_stats(self, now: datetime):
+        if not self.latency.dirty:
+            return
+        if self.__latency_ts is not None and (now - self.__latency_ts).total_seconds() < LATENCY_PERSIST_INTERVAL:
+            return
+        self.__storage.set_link_stats(self.__conn_id, 'latency', now, self.latency.to_dict())
+        self.latency.dirty = False
+        self.__latency_ts = now
 
     @property
     def pending_count(self) -> int:
@@ -286,19 +248,35 @@ class Link:
             return self.tx_seq - self.rx_seq
         else:
             return 0
-    
+
     @property
-    def pending_duration(self) -> timedelta:
-        ts = datetime.now()
+    def pending_since(self) -> Optional[float]:
         if len(self.tx_history) > 0:
-            first = self.tx_history[0]
-            return ts - first.tx_ts
-        else:
+            return self.tx_history[0].ts
+        return None
+
+    @property
+    def pending_duration(self) -> timedelta:
+        since = self.pending_since
+        if since is None:
             return timedelta(0)
+        return timedelta(seconds=self.__clock() - since)
+
+    def get_sample(self, now: datetime) -> Optional[LinkSample]:
+        if self.tx_seq is None or self.rx_seq is None:
+            return None
+        if self.tx_height is None or self.rx_height is None:
+            return None
+        since = self.pending_since
+        return {
+            'pending_count': self.pending_count,
+            'height_gap': self.tx_height - self.rx_height,
+            'pending_duration': now.timestamp() - since if since is not None else 0.0,
+        }
 
     def __str__(self) -> str:
         return f'Link(src={self.src},dst={self.dst},tx={self.tx_seq},rx={self.rx_seq},state={self.state})'
-    
+
     def add_tx_record(self, seq: int, ts: datetime):
         record = self.__storage.add_tx_record(self.__conn_id, seq, ts)
         self.tx_history.append(record)
@@ -312,13 +290,14 @@ class Link:
         if tx_state.state == EdgeState.ACTIVE:
             if self.tx_seq is None:
                 self.tx_seq = tx_state.seq
-                self.tx_ts = now
+                self.tx_ts = now.timestamp()
             elif self.tx_seq < tx_state.seq:
                 tx_seq = self.tx_seq
                 count = tx_state.seq - tx_seq
                 self.tx_seq = tx_state.seq
-                self.tx_ts = now
+                self.tx_ts = now.timestamp()
                 self.add_tx_record(tx_state.seq, now)
+                self.throughput.add_tx(self.tx_ts, count)
                 yield LinkEvent.TXEvent(self, tx_seq, count)
 
             if self.tx_height is None or tx_state.height > self.tx_height:
@@ -326,15 +305,16 @@ class Link:
 
         elif self.tx_seq is not None:
             self.tx_seq = None
-            self.tx_ts = now
+            self.tx_ts = now.timestamp()
             self.tx_height = None
 
     def handle_rx(self, rx_state: EdgeState, now: datetime) -> Iterable['LinkEvent']:
         if rx_state.state == EdgeState.ACTIVE:
             if self.rx_seq is None:
                 self.rx_seq = rx_state.seq
-                self.rx_ts = now
+                self.rx_ts = now.timestamp()
             elif self.rx_seq < rx_state.seq:
+                ts = now.timestamp()
                 while len(self.tx_history) > 0 and self.rx_seq < rx_state.seq:
                     tx_record = self.tx_history[0]
                     if tx_record.tx_seq <= rx_state.seq:
@@ -346,8 +326,10 @@ class Link:
                         rx_seq = self.rx_seq
                         count = rx_state.seq - self.rx_seq
                         self.rx_seq = rx_state.seq
-                    delay = now - tx_record.tx_ts
-                    yield LinkEvent.RXEvent(self, rx_seq, count, delay)
+                    delay = ts - tx_record.ts
+                    self.latency.add(ts, delay, count)
+                    self.throughput.add_rx(ts, count)
+                    yield LinkEvent.RXEvent(self, rx_seq, count, timedelta(seconds=delay))
 
             if self.rx_height is None or rx_state.height > self.rx_height:
                 self.rx_height = rx_state.height
@@ -355,8 +337,8 @@ class Link:
         elif self.rx_seq is not None:
             self.rx_seq = None
             self.rx_height = None
-            self.rx_ts = now
-    
+            self.rx_ts = now.timestamp()
+
     def handle_update(self, update: LinkUpdate, now: datetime) -> tuple[bool,list['LinkEvent']]:
         changed = False
         events: list[LinkEvent] = []
@@ -374,8 +356,8 @@ class Link:
                 state = Link.BROKEN
             else:
                 if len(self.tx_history) > 0:
-                    delay = now - self.tx_history[0].tx_ts
-                    if delay.total_seconds() > self.time_limit:
+                    delay = now.timestamp() - self.tx_history[0].ts
+                    if delay > self.time_limit:
                         state = Link.BAD
                     else:
                         state = Link.GOOD
@@ -386,71 +368,160 @@ class Link:
             changed = True
             events.append(LinkEvent.StateEvent(self, self.state, state))
             self.state = state
+            self.__storage.add_state_interval(self.__conn_id, state, now)
 
         self.tx_state = tx_state
         self.rx_state = rx_state
         self.flush()
+        self.flush_stats(now)
+        self.__storage.set_link_stats(self.__conn_id, 'heartbeat', now, now.timestamp())
         return changed, events
 
 class NetworkStatus(dict[str,dict[str,LinkStatus]]):
     def __new__(cls, *args: Any, **kwargs: Any) -> 'NetworkStatus':
         return super().__new__(cls, *args, **kwargs)
 
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.__index: Optional[TopologyIndex] = None
+
     def set_link_statuses(self, src: str, links: list[tuple[str,LinkStatus]]):
         self[src] = dict(links)
+        self.__index = None
 
-    def get_known_links(self) -> list[tuple[str,str]]:
-        knowns: list[tuple[str,str]] = list()
-        for src, link in self.items():
-            for dst in link.keys():
-                knowns.append((src, dst))
-        return knowns
+    def get_known_links(self) -> TopologyIndex:
+        if self.__index is None:
+            index = TopologyIndex()
+            for src, link in self.items():
+                for dst in link.keys():
+                    index.add((src, dst))
+            self.__index = index
+        return self.__index
 
     def get_tx_update(self, src: str, dst: str) -> Optional[EdgeState]:
         if src not in self:
             return None
         link_map = self[src]
         if dst not in link_map:
-            return EdgeState((EdgeState.INACTIVE, None, None))
+            return EdgeState(EdgeState.INACTIVE)
         link_status = link_map[dst]
-        return EdgeState((EdgeState.ACTIVE, link_status.tx_seq, link_status.current_height))
+        return EdgeState(EdgeState.ACTIVE, link_status.tx_seq, link_status.current_height)
     
     def get_rx_update(self, src: str, dst: str) -> Optional[EdgeState]:
         if dst not in self:
             return None
         link_map = self[dst]
         if src not in link_map:
-            return EdgeState((EdgeState.INACTIVE, None, None))
+            return EdgeState(EdgeState.INACTIVE)
         link_status = link_map[src]
-        return EdgeState((EdgeState.ACTIVE, link_status.rx_seq, link_status.verifier.height))
+        return EdgeState(EdgeState.ACTIVE, link_status.rx_seq, link_status.verifier.height)
 
     def get_link_update(self, src: str, dst: str) -> LinkUpdate:
-        return LinkUpdate((self.get_tx_update(src, dst), self.get_rx_update(src, dst)))
+        return LinkUpdate(self.get_tx_update(src, dst), self.get_rx_update(src, dst))
 
 
 class Links:
-    def __init__(self, networks: List[dict], storage: Optional[Storage] = None):
+    def __init__(self, networks: List[dict], storage: Optional[Storage] = None, revalidate: float = TOPOLOGY_REVALIDATE,
+                 clock: Clock = time.time, on_status: Optional[Callable[[float,'NetworkStatus'],None]] = None):
         if storage is None:
             storage = Storage()
         self.__storage = storage
+        self.__revalidate = revalidate
+        self.__clock = clock
+        self.__on_status = on_status
         self.__bmcs = {}
         self.__links = {}
         self.__networks = {}
-        self.__configs = {}
-        for net in networks:
-            network = net['network']
-            if network in self.__configs:
-                raise Exception(f'duplicate network id={network}')
-            bmc = build_proxy(net)
-            self.__configs[network] = net
-            self.__bmcs[bmc.address] = bmc
-            self.__networks[bmc.address] = net
+        self.__topology: dict[str,Topology] = {}
+        self.__index = TopologyIndex()
+        self.__configs = configs_of(networks)
+        for net in self.__configs.values():
+            self.__add_network(net)
+        self.load_topology()
+
+    def __add_network(self, net: dict):
+        bmc = build_proxy(net)
+        self.__bmcs[bmc.address] = bmc
+        self.__networks[bmc.address] = net
+
+    def reload(self, networks: List[dict]) -> NetworkChanges:
+        configs = configs_of(networks)
+        added = [id for id in configs if id not in self.__configs]
+        removed = [id for id in self.__configs if id not in configs]
+        changed = [id for id in configs if id in self.__configs and configs[id] != self.__configs[id]]
+        affected = set(removed + changed)
+
+        # proxies of the affected networks including ones for changed BMCs
+        configured = []
+        for addr in [addr for addr in self.__bmcs if urlparse(addr).netloc in affected]:
+            if self.__networks[addr] is self.__configs[urlparse(addr).netloc]:
+                configured.append(addr)
+            del self.__bmcs[addr]
+            del self.__networks[addr]
+            self.invalidate_topology(addr)
+        self.__configs = configs
+        for id in added + changed:
+            self.__add_network(configs[id])
+        # links of the replaced BMCs are not queried any more, while ones of
+        # the discovered proxies are kept as they're found again
+        stale = set(configured).difference(self.__bmcs.keys())
+
+        updated = set(added + changed)
+        for key, link in list(self.__links.items()):
+            networks = (urlparse(key[0]).netloc, urlparse(key[1]).netloc)
+            if networks[0] in removed or networks[1] in removed or key[0] in stale or key[1] in stale:
+                del self.__links[key]
+            elif networks[0] in updated or networks[1] in updated:
+                link.time_limit = self.get_time_limit(*key)
+                link.src_name = self.name_of(key[0])
+                link.dst_name = self.name_of(key[1])
+        if len(removed) > 0 or len(stale) > 0:
+            self.__index = TopologyIndex(self.__links.keys())
+        return { 'added': added, 'removed': removed, 'changed': changed }
+
+    def load_topology(self):
+        for topology in self.__storage.get_topology():
+            addr = topology['bmc']
+            if addr not in self.__bmcs and not self.add_proxy(addr):
+                continue
+            if topology['config'] != self.__networks[addr]:
+                # configuration is changed after it's discovered
+                continue
+            self.__topology[addr] = topology
+
+    def __get_topology(self, addr: str, now: datetime) -> Topology:
+        topology = self.__topology.get(addr)
+        if topology is not None and now.timestamp() - topology['ts'] < self.__revalidate:
+            return topology
+        bmc: BMC = self.__bmcs[addr]
+        topology = {
+            'bmc': addr,
+            'config': self.__networks[addr],
+            'links': list(bmc.get_links()),
+            'routes': bmc.get_routes(),
+            'ts': now.timestamp(),
+        }
+        self.__topology[addr] = topology
+        self.__storage.set_topology(topology)
+        return topology
+
+    def invalidate_topology(self, addr: str):
+        if self.__topology.pop(addr, None) is not None:
+            self.__storage.delete_topology(addr)
+
+    def __network_of(self, id: str) -> dict:
+        if id in self.__networks:
+            return self.__networks[id]
+        return self.__configs.get(urlparse(id).netloc, {})
 
     def get_rx_limit(self, id: str) -> int:
-        return self.__networks[id].get('rx_limit', 30)
+        return self.__network_of(id).get('rx_limit', 30)
 
     def get_tx_limit(self, id: str) -> int:
-        return self.__networks[id].get('tx_limit', 30)
+        return self.__network_of(id).get('tx_limit', 30)
+
+    def get_time_limit(self, src: str, dst: str) -> int:
+        return self.get_tx_limit(src)+self.get_rx_limit(dst)
 
     def name_of(self, id: str) -> str:
         return self.__networks.get(id, {}).get('name', id)
@@ -461,12 +532,28 @@ class Links:
     def get_link(self, src: str, dst: str) -> Link:
         key = (src, dst)
         if key not in self.__links:
-            time_limit = self.get_tx_limit(src)+self.get_rx_limit(dst)
+            time_limit = self.get_time_limit(src, dst)
             src_name = self.name_of(src)
             dst_name = self.name_of(dst)
-            self.__links[key] = Link(self.__storage, src, dst, time_limit, src_name=src_name, dst_name=dst_name)
+            self.__links[key] = Link(self.__storage, src, dst, time_limit, src_name=src_name, dst_name=dst_name, clock=self.__clock)
+            self.__index.add(key)
         return self.__links[key]
 
+    def load_links(self):
+        for _, src, dst, _ in self.__storage.get_connections():
+            self.get_link(src, dst)
+
+    def reset_links(self):
+        # drop the states in memory to take over the ones in the storage
+        self.__links = {}
+        self.__index = TopologyIndex()
+        self.__topology = {}
+        self.load_topology()
+        self.load_links()
+
+    def get_all_links(self) -> Iterable[Link]:
+        return self.__links.values()
+
     def get_connected_links(self):
         return map(
             lambda x: (x.src, x.dst),
@@ -476,6 +563,12 @@ class Links:
             )
         )
 
+    def get_known_links(self) -> TopologyIndex:
+        return self.__index
+
+    def get_connected_pairs(self) -> list[tuple[str,str]]:
+        return self.__index.unique(self.get_connected_links())
+
     def add_proxy(self, addr: str) -> bool:
         btp_addr = urlparse(addr)
         if btp_addr.netloc not in self.__configs:
@@ -488,12 +581,16 @@ class Links:
 
     def query_status(self, all: bool = False) -> NetworkStatus:
         btp_status = NetworkStatus()
+        now = datetime.fromtimestamp(self.__clock())
         bmc_addrs = list(self.__bmcs.keys())
         while len(bmc_addrs):
             addr = bmc_addrs.pop(0)
-            bmc = self.__bmcs[addr]
+            bmc = self.__bmcs.get(addr)
+            if bmc is None:
+                # removed by reloading the configuration
+                continue
             try :
-                links = bmc.get_links()
+                links = self.__get_topology(addr, now)['links']
 
                 link_statuses = []
                 for link in links:
@@ -505,9 +602,12 @@ class Links:
                 # print('STATUS:', addr, link_statuses)
                 btp_status.set_link_statuses(addr, link_statuses)
             except BaseException as exc:
+                self.invalidate_topology(addr)
                 if all:
                     raise exc
                 continue
+        if self.__on_status is not None:
+            self.__on_status(self.__clock(), btp_status)
         return btp_status
     
     def get_relay_fee_table(self, id: str) -> FeeTable:
@@ -515,20 +615,23 @@ class Links:
             raise Exception(f'Unknown Network id={id}')
         proxy: BMC = self.__bmcs[id]
         network: dict = self.__networks[id]
-        links = proxy.get_links()
-        routes = proxy.get_routes()
-        networks = set(routes.keys())
-        networks = networks.union(set(map(lambda x: urlparse(x).netloc, links)))
-        fee_table = []
-        for net in networks:
-            config = self.__configs[net]
-            fee1: int = proxy.get_fee(net, False)
-            fee2: int = proxy.get_fee(net, True)
-            fee_table.append({
-                'id': net,
-                'name': config['name'],
-                'fees': [fee1, fee2],
-            })
+        try:
+            topology = self.__get_topology(id, datetime.fromtimestamp(self.__clock()))
+            networks = set(topology['routes'].keys())
+            networks = networks.union(set(map(lambda x: urlparse(x).netloc, topology['links'])))
+            fee_table = []
+            for net in networks:
+                config = self.__configs[net]
+                fee1: int = proxy.get_fee(net, False)
+                fee2: int = proxy.get_fee(net, True)
+                fee_table.append({
+                    'id': net,
+                    'name': config['name'],
+                    'fees': [fee1, fee2],
+                })
+        except BaseException as exc:
+            self.invalidate_topology(id)
+            raise exc
         decimal = network.get('decimal', 18)
         symbol = network.get('symbol') or COIN_BY_TYPE.get(network['type'], 'UNK')
         return {
@@ -539,23 +642,23 @@ class Links:
 
     def apply_status(self, btp_status: NetworkStatus, now: Optional[datetime] = None) -> Tuple[bool, List[LinkEvent]]:
         if now is None:
-            now = datetime.now()
-
-        links = list(self.__links.keys())
-        for link in btp_status.get_known_links():
-            if link not in links:
-                links.append(link)
-        link_objs = map(lambda x: self.get_link(x[0], x[1]), links)
+            now = datetime.fromtimestamp(self.__clock())
 
         def do_update() -> tuple[bool, list[LinkEvent]]:
+            for src, dst in btp_status.get_known_links():
+                self.get_link(src, dst)
             status_change = False
             link_events: List[LinkEvent] = []
-            for link in link_objs:
+            for link in list(self.__links.values()):
                 update = btp_status.get_link_update(link.src, link.dst)
                 change, events = link.handle_update(update, now)
                 if change:
                     status_change = True
                 link_events += events
+                sample = link.get_sample(now)
+                if sample is not None:
+                    self.__storage.add_link_sample(link.conn_id, now, sample)
+            self.__storage.expire_link_samples(now)
             return status_change, link_events
         return self.__storage.do_batch(do_update)
 
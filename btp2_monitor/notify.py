@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import os
+import queue
+from threading import Thread
+import time
+import traceback
+from typing import Any, List, Optional, TypedDict
+
+from .monitor import Link, LinkEvent
+
+SLACK_HOOK = os.environ.get('SLACK_HOOK')
+SLACK_CHANNEL = os.environ.get('SLACK_CHANNEL')
+NOTIFY_WEBHOOKS = os.environ.get('NOTIFY_WEBHOOKS')
+NOTIFY_WINDOW = float(os.environ.get('NOTIFY_WINDOW', '10.0'))
+NOTIFY_INTERVAL = float(os.environ.get('NOTIFY_INTERVAL', '1.0'))
+NOTIFY_RETRIES = int(os.environ.get('NOTIFY_RETRIES', '3'))
+NOTIFY_TIMEOUT = 10.0
+
+
+class StateChange(TypedDict):
+    ts: float
+    src: str
+    dst: str
+    src_name: str
+    dst_name: str
+    before: str
+    after: str
+    delay: float
+    count: int
+
+
+def change_of(event: LinkEvent, ts: float) -> StateChange:
+    link = event.link
+    return {
+        'ts': ts,
+        'src': link.src,
+        'dst': link.dst,
+        'src_name': link.src_name,
+        'dst_name': link.dst_name,
+        'before': event.before,
+        'after': event.after,
+        'delay': link.pending_duration.total_seconds(),
+        'count': 1,
+    }
+
+
+def merge_changes(changes: List[StateChange]) -> List[StateChange]:
+    # a change per link from the first state to the last, dropping flaps
+    # returning to the first state
+    merged: dict[tuple[str,str],StateChange] = {}
+    for change in changes:
+        key = (change['src'], change['dst'])
+        prev = merged.get(key)
+        if prev is not None:
+            change = dict(change, before=prev['before'], count=prev['count']+change['count'])
+        merged[key] = change
+    return [c for c in merged.values() if c['before'] != c['after']]
+
+
+def format_state(src_name: str, dst_name: str, after: str) -> str:
+    link_str = f'{src_name} -> {dst_name}'
+    if after == Link.GOOD:
+        return f'{link_str} : :large_green_circle: *GOOD*'
+    else:
+        return f'{link_str} : :red_circle: *{after.upper()}*'
+
+
+class Sink:
+    def __init__(self, url: str):
+        self.url = url
+
+    def payload(self, changes: List[StateChange]) -> dict:
+        return { 'changes': changes }
+
+
+class SlackSink(Sink):
+    def __init__(self, url: str, channel: str, username: str = 'BTP Monitor'):
+        super().__init__(url)
+        self.channel = channel
+        self.username = username
+
+    def payload(self, changes: List[StateChange]) -> dict:
+        items = []
+        for c in changes:
+            line = format_state(c['src_name'], c['dst_name'], c['after'])
+            if c['count'] > 1:
+                line += f' ({c["count"]} changes)'
+            items.append(line)
+        return {
+            'channel': self.channel,
+            'username': self.username,
+            'text': "\n".join(items),
+        }
+
+
+class Notifier:
+    def __init__(self, sinks: List[Sink], window: float = NOTIFY_WINDOW, interval: float = NOTIFY_INTERVAL,
+                 retries: int = NOTIFY_RETRIES, backoff: float = 1.0, session: Optional[Any] = None):
+        if session is None:
+            # imported here not to slow down the commands without notifications
+            import requests
+            session = requests.Session()
+        self.__sinks = sinks
+        self.__window = window
+        self.__interval = interval
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__session = session
+        self.__sent: dict[str,float] = {}
+        self.__queue: queue.Queue[Optional[List[StateChange]]] = queue.Queue()
+        self.__thread = Thread(target=self.__run, name='notifier', daemon=True)
+        self.__thread.start()
+
+    def notify(self, events: List[LinkEvent], ts: Optional[float] = None):
+        # converted on the caller, as links keep changing after the call
+        if ts is None:
+            ts = time.time()
+        changes = [change_of(e, ts) for e in events if e.name == LinkEvent.STATE]
+        if len(changes) > 0:
+            self.__queue.put(changes)
+
+    def __run(self):
+        stopped = False
+        while not stopped:
+            item = self.__queue.get()
+            if item is None:
+                break
+            changes = list(item)
+            deadline = time.monotonic() + self.__window
+            while True:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.__queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopped = True
+                    break
+                changes += item
+            changes = merge_changes(changes)
+            if len(changes) > 0:
+                self.dispatch(changes)
+
+    def dispatch(self, changes: List[StateChange]):
+        for sink in self.__sinks:
+            try:
+                self.__send(sink, sink.payload(changes))
+            except BaseException as exc:
+                traceback.print_exc()
+                print(f'FAIL to notify url={sink.url} err={exc}')
+
+    def __send(self, sink: Sink, payload: dict):
+        for attempt in range(self.__retries+1):
+            last = self.__sent.get(sink.url)
+            if last is not None:
+                wait = last + self.__interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            self.__sent[sink.url] = time.monotonic()
+            delay = self.__backoff * (2 ** attempt)
+            try:
+                resp = self.__session.post(sink.url, json=payload, timeout=NOTIFY_TIMEOUT)
+            except BaseException:
+                if attempt >= self.__retries:
+                    raise
+                time.sleep(delay)
+                continue
+            if resp.status_code < 400:
+                return
+            if (resp.status_code != 429 and resp.status_code < 500) or attempt >= self.__retries:
+                raise Exception(f'HTTP {resp.status_code}')
+            retry_after = resp.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
+
+    def term(self, timeout: Optional[float] = None):
+        self.__queue.put(None)
+        self.__thread.join(timeout)
+
+
+def build_notifier(slack_hook: Optional[str] = SLACK_HOOK, slack_channel: Optional[str] = SLACK_CHANNEL,
+                   webhooks: Optional[str] = NOTIFY_WEBHOOKS, window: float = NOTIFY_WINDOW) -> Optional[Notifier]:
+    sinks = []
+    if slack_hook is not None and slack_channel is not None:
+        sinks.append(SlackSink(slack_hook, slack_channel))
+    if webhooks is not None:
+        for url in webhooks.split(','):
+            if url.strip() != '':
+                sinks.append(Sink(url.strip()))
+    if len(sinks) == 0:
+        return None
+    return Notifier(sinks, window)
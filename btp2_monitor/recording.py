@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+from datetime import datetime
+import struct
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from .monitor import LinkEvent, Links, NetworkStatus
+from .types import LinkStatus, VerifierStatus
+
+# Each segment starts with the magic followed by the frames of the cycles.
+# A frame is a length-prefixed record of the timestamp and the statuses.
+# Addresses are interned in the segment, and the integers are zigzag varints
+# of the differences from the previous values of the same link.
+# Extra data of the verifiers are not recorded.
+MAGIC = b'BTPSREC1'
+TS = struct.Struct('<d')
+FIELDS = 4
+
+
+def write_varint(buf: bytearray, value: int):
+    while value >= 0x80:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> tuple[int,int]:
+    value = 0
+    shift = 0
+    while True:
+        b = data[offset]
+        offset += 1
+        value |= (b & 0x7f) << shift
+        if b < 0x80:
+            return value, offset
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    return value >> 1 if value & 1 == 0 else -((value + 1) >> 1)
+
+
+def values_of(status: LinkStatus) -> tuple:
+    return status.rx_seq, status.tx_seq, status.verifier.height, status.current_height
+
+
+class StatusRecorder:
+    def __init__(self, path: str):
+        self.__fd: BinaryIO = open(path, 'ab')
+        self.__fd.write(MAGIC)
+        self.__ids: dict[str,int] = {}
+        self.__values: dict[tuple[int,int],tuple] = {}
+
+    def __write_addr(self, buf: bytearray, addr: str):
+        id = self.__ids.get(addr)
+        if id is not None:
+            write_varint(buf, id)
+            return id
+        id = len(self.__ids)
+        self.__ids[addr] = id
+        data = addr.encode()
+        write_varint(buf, id)
+        write_varint(buf, len(data))
+        buf += data
+        return id
+
+    def write(self, ts: float, status: NetworkStatus):
+        buf = bytearray(TS.pack(ts))
+        write_varint(buf, len(status))
+        for src, links in status.items():
+            src_id = self.__write_addr(buf, src)
+            write_varint(buf, len(links))
+            for dst, link in links.items():
+                dst_id = self.__write_addr(buf, dst)
+                values = values_of(link)
+                prev = self.__values.get((src_id, dst_id), (0,)*FIELDS)
+                for value, base in zip(values, prev):
+                    write_varint(buf, zigzag(value - base))
+                self.__values[(src_id, dst_id)] = values
+        header = bytearray()
+        write_varint(header, len(buf))
+        self.__fd.write(header + buf)
+        self.__fd.flush()
+
+    def close(self):
+        self.__fd.close()
+
+
+class RecordingReader:
+    def __init__(self, data: bytes):
+        self.__data = data
+        self.__addrs: list[str] = []
+        self.__values: dict[tuple[int,int],tuple] = {}
+
+    def __read_addr(self, offset: int) -> tuple[int,int]:
+        id, offset = read_varint(self.__data, offset)
+        if id == len(self.__addrs):
+            size, offset = read_varint(self.__data, offset)
+            self.__addrs.append(self.__data[offset:offset+size].decode())
+            offset += size
+        return id, offset
+
+    def __read_frame(self, offset: int) -> tuple[float,NetworkStatus]:
+        data = self.__data
+        ts, = TS.unpack_from(data, offset)
+        offset += TS.size
+        status = NetworkStatus()
+        count, offset = read_varint(data, offset)
+        for _ in range(count):
+            src_id, offset = self.__read_addr(offset)
+            links = []
+            size, offset = read_varint(data, offset)
+            for _ in range(size):
+                dst_id, offset = self.__read_addr(offset)
+                prev = self.__values.get((src_id, dst_id), (0,)*FIELDS)
+                values = []
+                for base in prev:
+                    delta, offset = read_varint(data, offset)
+                    values.append(base + unzigzag(delta))
+                self.__values[(src_id, dst_id)] = tuple(values)
+                rx_seq, tx_seq, height, current_height = values
+                links.append((self.__addrs[dst_id], LinkStatus(rx_seq, tx_seq, VerifierStatus(height, None), current_height)))
+            status.set_link_statuses(self.__addrs[src_id], links)
+        return ts, status
+
+    def __iter__(self) -> Iterator[tuple[float,NetworkStatus]]:
+        data = self.__data
+        offset = 0
+        next_magic = data.find(MAGIC)
+        while offset < len(data):
+            if offset == next_magic:
+                offset += len(MAGIC)
+                next_magic = data.find(MAGIC, offset)
+                self.__addrs = []
+                self.__values = {}
+                continue
+            end = next_magic if next_magic >= 0 else len(data)
+            try:
+                size, start = read_varint(data, offset)
+            except IndexError:
+                return
+            if start + size > end:
+                # truncated by the interrupted recorder, which may have been
+                # restarted with a new segment
+                if next_magic < 0:
+                    return
+                offset = next_magic
+                continue
+            yield self.__read_frame(start)
+            offset = start + size
+
+
+def read_recording(path: str, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[tuple[float,NetworkStatus]]:
+    with open(path, 'rb') as fd:
+        data = fd.read()
+    for ts, status in RecordingReader(data):
+        if since is not None and ts < since:
+            continue
+        if until is not None and ts >= until:
+            break
+        yield ts, status
+
+
+class VirtualClock:
+    def __init__(self, ts: float = 0.0):
+        self.ts = ts
+
+    def __call__(self) -> float:
+        return self.ts
+
+
+def replay(links: Links, clock: VirtualClock, frames: Iterable[tuple[float,NetworkStatus]]) -> Iterator[tuple[float,bool,list[LinkEvent]]]:
+    for ts, status in frames:
+        clock.ts = ts
+        changed, events = links.apply_status(status, datetime.fromtimestamp(ts))
+        yield ts, changed, events
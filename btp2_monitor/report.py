@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import List, Optional, TypedDict
+
+import numpy as np
+
+from .monitor import Link, LinkEvent, Links
+from .storage import Storage
+
+DAY = 24*3600
+EVENTS = [LinkEvent.TX, LinkEvent.RX, LinkEvent.STATE]
+STATES = [Link.UNKNOWN, Link.BROKEN, Link.BAD, Link.GOOD]
+
+
+class LatencyReport(TypedDict):
+    count: int
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+    max: Optional[float]
+
+
+class DailyVolume(TypedDict):
+    day: str
+    tx: int
+    rx: int
+
+
+class OutageReport(TypedDict):
+    start: float
+    end: float
+    duration: float
+
+
+class LinkReport(TypedDict):
+    src: str
+    dst: str
+    src_name: str
+    dst_name: str
+    time_limit: int
+    tx: int
+    rx: int
+    latency: LatencyReport
+    daily: List[DailyVolume]
+    time_over_limit: float
+    longest_outage: Optional[OutageReport]
+    pending: int
+    oldest_pending: Optional[float]
+
+
+def day_of(idx: int, day0: int) -> str:
+    return datetime.fromtimestamp((day0+idx)*DAY, timezone.utc).strftime('%Y-%m-%d')
+
+
+def weighted_percentile(values: np.ndarray, weights: np.ndarray, q: list[float]) -> np.ndarray:
+    # same as np.percentile() of the values repeated by the weights
+    order = np.argsort(values, kind='stable')
+    values = values[order]
+    cum = np.cumsum(weights[order])
+    pos = (cum[-1]-1) * np.asarray(q) / 100
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo+1, cum[-1]-1)
+    v_lo = values[np.searchsorted(cum, lo, side='right')]
+    v_hi = values[np.searchsorted(cum, hi, side='right')]
+    return v_lo + (pos-lo)*(v_hi-v_lo)
+
+
+def latency_of(delta: np.ndarray, count: np.ndarray) -> LatencyReport:
+    valid = ~np.isnan(delta)
+    delta = delta[valid]
+    count = np.maximum(np.nan_to_num(count[valid]), 1).astype(np.int64)
+    if len(delta) == 0:
+        return { 'count': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None }
+    p50, p90, p99 = weighted_percentile(delta, count, [50, 90, 99])
+    return {
+        'count': int(count.sum()),
+        'p50': float(p50),
+        'p90': float(p90),
+        'p99': float(p99),
+        'max': float(delta.max()),
+    }
+
+
+def state_durations(ts: np.ndarray, states: np.ndarray, initial: int, since: float, until: float) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+    starts = np.concatenate(([since], np.clip(ts, since, until)))
+    states = np.concatenate(([initial], states))
+    ends = np.concatenate((starts[1:], [until]))
+    return starts, ends, states
+
+
+def longest_outage(starts: np.ndarray, ends: np.ndarray, states: np.ndarray) -> Optional[OutageReport]:
+    # unknown states mean no data, so they are not outages
+    outage = (states == STATES.index(Link.BAD)) | (states == STATES.index(Link.BROKEN))
+    if not outage.any():
+        return None
+    # consecutive non-good intervals belong to the same outage
+    run_id = np.cumsum(np.concatenate(([True], outage[1:] != outage[:-1])))
+    run_id = run_id[outage]
+    durations = np.bincount(run_id, weights=(ends-starts)[outage])
+    longest = int(np.argmax(durations))
+    members = np.flatnonzero(run_id == longest)
+    start = float(starts[outage][members[0]])
+    end = float(ends[outage][members[-1]])
+    return { 'start': start, 'end': end, 'duration': end-start }
+
+
+def build_report(links: Links, storage: Storage, since: datetime, until: datetime) -> List[LinkReport]:
+    since_ts = since.timestamp()
+    until_ts = until.timestamp()
+
+    keys: dict[tuple[str,str],int] = {}
+    conn_ids: dict[int,int] = {}
+    for conn_id, src, dst, _ in storage.get_connections():
+        conn_ids[conn_id] = keys.setdefault((src, dst), len(keys))
+
+    rows = storage.get_log_rows(since_ts, until_ts, EVENTS)
+    for src, dst, *_ in rows:
+        keys.setdefault((src, dst), len(keys))
+
+    n = len(rows)
+    columns = list(zip(*rows)) if n > 0 else [()] * 7
+    link = np.fromiter((keys[(src, dst)] for src, dst in zip(columns[0], columns[1])), dtype=np.int64, count=n)
+    event = np.fromiter((EVENTS.index(e) for e in columns[2]), dtype=np.int64, count=n)
+    ts = np.array(columns[3], dtype=np.float64)
+    count = np.array(columns[4], dtype=np.float64)
+    delta = np.array(columns[5], dtype=np.float64)
+    after = np.fromiter((STATES.index(s) if s in STATES else 0 for s in columns[6]), dtype=np.int64, count=n)
+
+    day0 = int(since_ts // DAY)
+    days = int((until_ts - 1) // DAY) - day0 + 1
+    volumes = np.zeros((len(keys), 2, max(days, 1)), dtype=np.int64)
+    traffic = event != EVENTS.index(LinkEvent.STATE)
+    day = ((ts[traffic] // DAY) - day0).astype(np.int64)
+    np.add.at(volumes, (link[traffic], event[traffic], day), np.nan_to_num(count[traffic]).astype(np.int64))
+
+    initials = np.full(len(keys), STATES.index(Link.UNKNOWN), dtype=np.int64)
+    for src, dst, state in storage.get_last_states(since_ts):
+        if (src, dst) in keys and state in STATES:
+            initials[keys[(src, dst)]] = STATES.index(state)
+
+    pending = np.zeros(len(keys), dtype=np.int64)
+    oldest = np.full(len(keys), np.nan)
+    for conn_id, cnt, min_ts in storage.get_tx_record_summary():
+        if conn_id in conn_ids:
+            pending[conn_ids[conn_id]] = cnt
+            oldest[conn_ids[conn_id]] = min_ts
+
+    order = np.argsort(link, kind='stable')
+    bounds = np.searchsorted(link[order], np.arange(len(keys)+1))
+    reports: List[LinkReport] = []
+    for (src, dst), idx in keys.items():
+        if src == '' or dst == '':
+            continue
+        sel = order[bounds[idx]:bounds[idx+1]]
+        l_event = event[sel]
+
+        rx = l_event == EVENTS.index(LinkEvent.RX)
+        latency = latency_of(delta[sel][rx], count[sel][rx])
+
+        st = l_event == EVENTS.index(LinkEvent.STATE)
+        starts, ends, states = state_durations(ts[sel][st], after[sel][st], initials[idx], since_ts, until_ts)
+        over_limit = float((ends-starts)[states == STATES.index(Link.BAD)].sum())
+
+        daily = []
+        for d in range(days):
+            tx_count, rx_count = volumes[idx, 0, d], volumes[idx, 1, d]
+            daily.append({ 'day': day_of(d, day0), 'tx': int(tx_count), 'rx': int(rx_count) })
+
+        reports.append({
+            'src': src,
+            'dst': dst,
+            'src_name': links.name_of(src),
+            'dst_name': links.name_of(dst),
+            'time_limit': links.get_time_limit(src, dst),
+            'tx': int(volumes[idx, 0].sum()),
+            'rx': int(volumes[idx, 1].sum()),
+            'latency': latency,
+            'daily': daily,
+            'time_over_limit': over_limit,
+            'longest_outage': longest_outage(starts, ends, states),
+            'pending': int(pending[idx]),
+            'oldest_pending': None if np.isnan(oldest[idx]) else float(oldest[idx]),
+        })
+    return reports
+
+
+CSV_FIELDS = [
+    'src', 'dst', 'src_name', 'dst_name', 'day', 'tx', 'rx',
+    'latency_count', 'latency_p50', 'latency_p90', 'latency_p99', 'latency_max',
+    'time_limit', 'time_over_limit',
+    'outage_start', 'outage_end', 'outage_duration',
+    'pending', 'oldest_pending',
+]
+
+
+def format_csv(reports: List[LinkReport]) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, CSV_FIELDS)
+    writer.writeheader()
+    for r in reports:
+        outage = r['longest_outage'] or {}
+        base = { 'src': r['src'], 'dst': r['dst'], 'src_name': r['src_name'], 'dst_name': r['dst_name'] }
+        writer.writerow(base | {
+            'day': 'total',
+            'tx': r['tx'],
+            'rx': r['rx'],
+            'latency_count': r['latency']['count'],
+            'latency_p50': r['latency']['p50'],
+            'latency_p90': r['latency']['p90'],
+            'latency_p99': r['latency']['p99'],
+            'latency_max': r['latency']['max'],
+            'time_limit': r['time_limit'],
+            'time_over_limit': r['time_over_limit'],
+            'outage_start': outage.get('start'),
+            'outage_end': outage.get('end'),
+            'outage_duration': outage.get('duration'),
+            'pending': r['pending'],
+            'oldest_pending': r['oldest_pending'],
+        })
+        for daily in r['daily']:
+            writer.writerow(base | daily)
+    return out.getvalue()
+
+
+def format_json(reports: List[LinkReport]) -> str:
+    return json.dumps(reports, indent=2)
+
+
+FORMATTERS = {
+    'csv': format_csv,
+    'json': format_json,
+}
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from threading import Lock, Thread
+import time
+from typing import Callable, List, Optional
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlparse
+from urllib.request import urlopen
+
+from .monitor import TOPOLOGY_REVALIDATE, Clock, Links, NetworkStatus
+from .storage import Storage
+from .types import LinkStatus
+
+SHARD_URLS = os.environ.get('SHARD_URLS')
+SHARD_TIMEOUT = float(os.environ.get('SHARD_TIMEOUT', '60.0'))
+
+PATH_STATUS = '/status'
+REPLICAS = 64
+
+
+def hash_of(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    def __init__(self, nodes: List[str], replicas: int = REPLICAS):
+        if len(nodes) == 0:
+            raise Exception('no shards')
+        if len(set(nodes)) != len(nodes):
+            raise Exception(f'duplicate shards {nodes}')
+        points = sorted((hash_of(f'{node}#{i}'), node) for node in nodes for i in range(replicas))
+        self.__hashes = [p[0] for p in points]
+        self.__nodes = [p[1] for p in points]
+
+    def node_of(self, key: str) -> str:
+        idx = bisect.bisect(self.__hashes, hash_of(key)) % len(self.__hashes)
+        return self.__nodes[idx]
+
+
+def shard_networks(networks: List[dict], shards: List[str], name: str) -> List[dict]:
+    if name not in shards:
+        raise Exception(f'unknown shard name={name} shards={shards}')
+    ring = HashRing(shards)
+    return [net for net in networks if ring.node_of(net['network']) == name]
+
+
+def encode_status(status: NetworkStatus) -> dict:
+    return {
+        src: {
+            dst: [s.rx_seq, s.tx_seq, [s.verifier.height, s.verifier.extra.hex() if s.verifier.extra is not None else None], s.current_height]
+            for dst, s in links.items()
+        } for src, links in status.items()
+    }
+
+
+def decode_status(data: dict) -> NetworkStatus:
+    status = NetworkStatus()
+    for src, links in data.items():
+        items = []
+        for dst, (rx_seq, tx_seq, (height, extra), current_height) in links.items():
+            verifier = (height, bytes.fromhex(extra) if extra is not None else None)
+            items.append((dst, LinkStatus.from_tuple((rx_seq, tx_seq, verifier, current_height))))
+        status.set_link_statuses(src, items)
+    return status
+
+
+class ShardHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != PATH_STATUS:
+            self.send_json(404, { 'error': f'NotFound path={url.path}' })
+            return
+        all = parse_qs(url.query).get('all', ['0'])[0] == '1'
+        try:
+            status = self.server.query_status(all)
+        except BaseException as exc:
+            self.send_json(500, { 'error': str(exc) })
+            return
+        self.send_json(200, {
+            'shard': self.server.name,
+            'status': encode_status(status),
+        })
+
+    def send_json(self, code: int, value: dict):
+        body = json.dumps(value).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        pass
+
+
+class ShardServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, links: Links, name: str, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), ShardHandler)
+        self.links = links
+        self.name = name
+        self.__lock = Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def query_status(self, all: bool) -> NetworkStatus:
+        # Links is not thread-safe, so requests are served one at a time
+        with self.__lock:
+            return self.links.query_status(all)
+
+    def reload(self, networks: List[dict]):
+        with self.__lock:
+            return self.links.reload(networks)
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+
+
+class ShardedLinks(Links):
+    def __init__(self, networks: List[dict], shards: List[str], storage: Optional[Storage] = None, revalidate: float = TOPOLOGY_REVALIDATE,
+                 clock: Clock = time.time, on_status: Optional[Callable[[float,NetworkStatus],None]] = None, timeout: float = SHARD_TIMEOUT):
+        super().__init__(networks, storage, revalidate, clock)
+        if len(shards) == 0:
+            raise Exception('no shards')
+        self.__shards = shards
+        self.__clock = clock
+        self.__on_status = on_status
+        self.__timeout = timeout
+
+    def fetch_status(self, url: str, all: bool) -> NetworkStatus:
+        try:
+            with urlopen(f'{url}{PATH_STATUS}?all={int(all)}', timeout=self.__timeout) as resp:
+                data = json.load(resp)
+        except HTTPError as exc:
+            raise Exception(f'fail to query shard url={url} err={json.load(exc).get("error")}')
+        return decode_status(data['status'])
+
+    def query_status(self, all: bool = False) -> NetworkStatus:
+        btp_status = NetworkStatus()
+        with ThreadPoolExecutor(len(self.__shards)) as executor:
+            futures = [(url, executor.submit(self.fetch_status, url, all)) for url in self.__shards]
+            for url, future in futures:
+                try:
+                    status = future.result()
+                except BaseException as exc:
+                    if all:
+                        raise exc
+                    print(f'FAIL to query shard url={url} err={exc}')
+                    continue
+                for src, links in status.items():
+                    if self.get_network(src) is None:
+                        # BMCs found by the shards, for names and fee tables
+                        self.add_proxy(src)
+                    btp_status.set_link_statuses(src, list(links.items()))
+        if self.__on_status is not None:
+            self.__on_status(self.__clock(), btp_status)
+        return btp_status
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+import json
+import os
+from typing import Optional
+
+
+def write_snapshot(path: str, snapshot: dict):
+    tmp = f'{path}.tmp{os.getpid()}'
+    with open(tmp, 'wt') as fd:
+        json.dump(snapshot, fd)
+    os.replace(tmp, path)
+
+
+class SnapshotReader:
+    def __init__(self, path: str):
+        self.__path = path
+        self.__stamp = None
+        self.__snapshot: Optional[dict] = None
+
+    def load(self) -> tuple[Optional[dict],bool]:
+        try:
+            st = os.stat(self.__path)
+        except FileNotFoundError:
+            return self.__snapshot, False
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self.__stamp:
+            return self.__snapshot, False
+        with open(self.__path, 'rt') as fd:
+            self.__snapshot = json.load(fd)
+        self.__stamp = stamp
+        return self.__snapshot, True
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import math
+from collections import deque
+from typing import Optional, TypedDict
+
+
+class QuantileSummary(TypedDict):
+    count: int
+    sum: float
+    max: Optional[float]
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+
+
+class QuantileSketch:
+    # values below MIN_VALUE (seconds) are counted in a single zero bucket
+    MIN_VALUE = 1e-3
+
+    def __init__(self, accuracy: float = 0.01, max_buckets: int = 512):
+        self.accuracy = accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: dict[int,int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.max: Optional[float] = None
+
+    def add(self, value: float, count: int = 1):
+        if count <= 0:
+            return
+        if value <= self.MIN_VALUE:
+            self.zeros += count
+        else:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[key] = self.buckets.get(key, 0) + count
+            if len(self.buckets) > self.max_buckets:
+                self.collapse()
+        self.count += count
+        self.sum += value * count
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def collapse(self):
+        keys = sorted(self.buckets.keys())
+        overflow = keys[:len(keys) - self.max_buckets + 1]
+        target = keys[len(overflow)]
+        for key in overflow:
+            self.buckets[target] += self.buckets.pop(key)
+
+    def merge(self, other: 'QuantileSketch'):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            self.collapse()
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def value_of(self, key: int) -> float:
+        return 2 * math.pow(self.gamma, key) / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets.keys()):
+            seen += self.buckets[key]
+            if rank < seen:
+                return min(self.value_of(key), self.max)
+        return self.max
+
+    def summary(self) -> QuantileSummary:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            'buckets': list(self.buckets.items()),
+            'zeros': self.zeros,
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+        }
+
+    def load_dict(self, value: dict):
+        self.buckets = dict(map(lambda x: (x[0], x[1]), value['buckets']))
+        self.zeros = value['zeros']
+        self.count = value['count']
+        self.sum = value.get('sum', 0.0)
+        self.max = value['max']
+
+
+class WindowedSketch:
+    def __init__(self, window: float, size: int):
+        self.window = window
+        self.size = size
+        self.slot_length = window / size
+        self.__slots: deque[tuple[int,QuantileSketch]] = deque()
+
+    def expire(self, ts: float):
+        current = int(ts // self.slot_length)
+        while len(self.__slots) > 0 and self.__slots[0][0] <= current - self.size:
+            self.__slots.popleft()
+
+    def add(self, ts: float, value: float, count: int = 1):
+        idx = int(ts // self.slot_length)
+        if len(self.__slots) == 0 or self.__slots[-1][0] < idx:
+            self.__slots.append((idx, QuantileSketch()))
+        self.__slots[-1][1].add(value, count)
+        self.expire(ts)
+
+    def get_sketch(self, ts: float) -> QuantileSketch:
+        self.expire(ts)
+        sketch = QuantileSketch()
+        for _, slot in self.__slots:
+            sketch.merge(slot)
+        return sketch
+
+    def to_list(self) -> list:
+        return list(map(lambda x: [x[0], x[1].to_dict()], self.__slots))
+
+    def load_list(self, value: list):
+        self.__slots.clear()
+        for idx, item in value:
+            sketch = QuantileSketch()
+            sketch.load_dict(item)
+            self.__slots.append((idx, sketch))
+
+
+class LatencyStats:
+    WINDOWS = {
+        '1h': (3600, 12),
+        '24h': (24*3600, 24),
+        '7d': (7*24*3600, 28),
+    }
+
+    def __init__(self):
+        self.__windows = dict(map(lambda x: (x[0], WindowedSketch(*x[1])), self.WINDOWS.items()))
+        self.dirty = False
+
+    def add(self, ts: float, delay: float, count: int = 1):
+        for sketch in self.__windows.values():
+            sketch.add(ts, delay, count)
+        self.dirty = True
+
+    def summary(self, ts: float) -> dict[str,QuantileSummary]:
+        return dict(map(lambda x: (x[0], x[1].get_sketch(ts).summary()), self.__windows.items()))
+
+    def to_dict(self) -> dict:
+        return dict(map(lambda x: (x[0], x[1].to_list()), self.__windows.items()))
+
+    def load_dict(self, value: dict):
+        for name, slots in value.items():
+            if name in self.__windows:
+                self.__windows[name].load_list(slots)
+
+
+class RateCounter:
+    def __init__(self, window: float, size: int):
+        self.window = window
+        self.size = size
+        self.slot_length = window / size
+        self.__counts = [0] * size
+        self.__indexes = [-1] * size
+        self.__since: Optional[float] = None
+
+    def add(self, ts: float, count: int = 1):
+        idx = int(ts // self.slot_length)
+        pos = idx % self.size
+        if self.__indexes[pos] != idx:
+            self.__indexes[pos] = idx
+            self.__counts[pos] = 0
+        self.__counts[pos] += count
+        if self.__since is None:
+            self.__since = ts
+
+    def start(self, ts: float):
+        if self.__since is None:
+            self.__since = ts
+
+    def total(self, ts: float) -> int:
+        current = int(ts // self.slot_length)
+        total = 0
+        for pos in range(self.size):
+            if current - self.size < self.__indexes[pos] <= current:
+                total += self.__counts[pos]
+        return total
+
+    def rate(self, ts: float) -> Optional[float]:
+        if self.__since is None:
+            return None
+        elapsed = min(self.window, ts - self.__since)
+        if elapsed <= 0:
+            return None
+        return self.total(ts) / elapsed
+
+
+class ThroughputSummary(TypedDict):
+    tx: dict[str,int]
+    rx: dict[str,int]
+    tx_rate: Optional[float]
+    rx_rate: Optional[float]
+    drain_time: Optional[float]
+
+
+class ThroughputStats:
+    WINDOWS = {
+        '1m': (60, 6),
+        '1h': (3600, 60),
+    }
+
+    def __init__(self):
+        self.__tx = dict(map(lambda x: (x[0], RateCounter(*x[1])), self.WINDOWS.items()))
+        self.__rx = dict(map(lambda x: (x[0], RateCounter(*x[1])), self.WINDOWS.items()))
+
+    def start(self, ts: float):
+        for counter in list(self.__tx.values()) + list(self.__rx.values()):
+            counter.start(ts)
+
+    def add_tx(self, ts: float, count: int):
+        for counter in self.__tx.values():
+            counter.add(ts, count)
+
+    def add_rx(self, ts: float, count: int):
+        for counter in self.__rx.values():
+            counter.add(ts, count)
+
+    def summary(self, ts: float, pending: int) -> ThroughputSummary:
+        tx_rate = self.__tx['1h'].rate(ts)
+        rx_rate = self.__rx['1h'].rate(ts)
+        if pending <= 0:
+            drain_time = 0.0
+        elif rx_rate:
+            drain_time = pending / rx_rate
+        else:
+            drain_time = None
+        return {
+            'tx': dict(map(lambda x: (x[0], x[1].total(ts)), self.__tx.items())),
+            'rx': dict(map(lambda x: (x[0], x[1].total(ts)), self.__rx.items())),
+            'tx_rate': tx_rate,
+            'rx_rate': rx_rate,
+            'drain_time': drain_time,
+        }
@@ -2,8 +2,11 @@
 
 from datetime import datetime
 import json
+import os
 import sqlite3
+import tempfile
 from threading import Timer, RLock
+import traceback
 from typing import Callable, Concatenate, Iterable, List, Optional, ParamSpec, TypedDict, TypeVar
 
 P = ParamSpec('P')
@@ -27,6 +30,24 @@ def log_from_list(item: Iterable) -> Log:
         'extra': item[5],
     }
 
+class LogStat(TypedDict):
+    ts: Optional[float]
+    event: str
+    src: str
+    dst: str
+    count: int
+    messages: Optional[int]
+
+def log_stat_from(item: Iterable) -> LogStat:
+    return {
+        'ts': item[0],
+        'event': item[1],
+        'src': item[2],
+        'dst': item[3],
+        'count': item[4],
+        'messages': item[5],
+    }
+
 class ConnectionState(TypedDict):
     id: Optional[int]
     state: Optional[str]
@@ -66,18 +87,94 @@ def connection_state_from(item: Iterable) -> ConnectionState:
         cs[ConnectionStateFields[i]] = item[i+1]
     return cs
 
-class TXRecord(tuple):
-    @property
-    def sn(self) -> int:
-        return self[0]
+LinkMetricFields = ( 'pending_count', 'height_gap', 'pending_duration' )
 
-    @property
-    def tx_seq(self) -> int:
-        return self[1]
+# (step, retention) of the link metric levels. Step 0 keeps raw samples.
+LinkMetricLevels = (
+    (0, 24*3600),
+    (60, 7*24*3600),
+    (3600, 180*24*3600),
+    (24*3600, None),
+)
+
+MAX_HISTORY_POINTS = 1000
+
+class LinkSample(TypedDict):
+    pending_count: int
+    height_gap: int
+    pending_duration: float
+
+class LinkMetric(TypedDict):
+    min: float
+    max: float
+    avg: float
+
+class LinkHistory(TypedDict):
+    ts: float
+    samples: int
+    pending_count: LinkMetric
+    height_gap: LinkMetric
+    pending_duration: LinkMetric
+
+def select_metric_level(since: float, step: float, now: float) -> int:
+    selected = None
+    for level, retention in LinkMetricLevels:
+        if retention is not None and since < now - retention:
+            continue
+        if selected is None or level <= step:
+            selected = level
+    return selected
+
+def link_history_from(item: Iterable) -> LinkHistory:
+    history = { 'ts': item[0], 'samples': item[1] }
+    for i in range(len(LinkMetricFields)):
+        mn, mx, sm = item[2+i*3:5+i*3]
+        history[LinkMetricFields[i]] = { 'min': mn, 'max': mx, 'avg': sm/item[1] }
+    return history
+
+LinkStateFields = ( 'unknown', 'broken', 'bad', 'good' )
+
+class LinkUptime(TypedDict):
+    since: float
+    until: float
+    durations: dict[str,float]
+    ratios: dict[str,Optional[float]]
+
+class Topology(TypedDict):
+    bmc: str
+    config: dict
+    links: list[str]
+    routes: dict[str,str]
+    ts: float
+
+def topology_from(item: Iterable) -> Topology:
+    return {
+        'bmc': item[0],
+        'config': json.loads(item[1]),
+        'links': json.loads(item[2]),
+        'routes': json.loads(item[3]),
+        'ts': item[4],
+    }
+
+class TXRecord:
+    __slots__ = ('sn', 'tx_seq', 'ts')
+
+    def __init__(self, sn: int, tx_seq: int, ts: float):
+        self.sn = sn
+        self.tx_seq = tx_seq
+        self.ts = ts
 
     @property
     def tx_ts(self) -> datetime:
-        return datetime.fromtimestamp(self[2])
+        return datetime.fromtimestamp(self.ts)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TXRecord):
+            return NotImplemented
+        return self.sn == other.sn and self.tx_seq == other.tx_seq and self.ts == other.ts
+
+    def __repr__(self) -> str:
+        return f'TXRecord(sn={self.sn},tx_seq={self.tx_seq},ts={self.ts})'
 
 class Storage:
     CREATE_LOGS_TABLE = """
@@ -90,6 +187,16 @@ CREATE TABLE IF NOT EXISTS logs (
         extra TEXT
 )
     """
+    # pages are ordered by sn, so the indexes end with it
+    CREATE_LOGS_INDEXES = [
+        'DROP INDEX IF EXISTS logs_link',
+        'DROP INDEX IF EXISTS logs_event_ts',
+        'CREATE INDEX IF NOT EXISTS logs_ts ON logs ( ts )',
+        'CREATE INDEX IF NOT EXISTS logs_link_sn ON logs ( src, dst, sn )',
+        'CREATE INDEX IF NOT EXISTS logs_src_sn ON logs ( src, sn )',
+        'CREATE INDEX IF NOT EXISTS logs_dst_sn ON logs ( dst, sn )',
+        'CREATE INDEX IF NOT EXISTS logs_event_sn ON logs ( event, sn )',
+    ]
     CREATE_CONNECTIONS_TABLE = '''
 CREATE TABLE IF NOT EXISTS connections (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -113,24 +220,105 @@ CREATE TABLE IF NOT EXISTS txhistory (
     conn_id INTEGER NOT NULL,
     tx_seq INTEGER NOT NULL,
     tx_ts DOUBLE NOT NULL
+)
+    '''
+    CREATE_LINK_METRICS_TABLE = f'''
+CREATE TABLE IF NOT EXISTS link_metrics (
+    conn_id INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    ts DOUBLE NOT NULL,
+    samples INTEGER NOT NULL,
+    {", ".join(map(lambda x: f"{x}_min DOUBLE, {x}_max DOUBLE, {x}_sum DOUBLE", LinkMetricFields))},
+    PRIMARY KEY(conn_id, step, ts)
+)
+    '''
+    CREATE_LINK_METRICS_INDEX = '''
+CREATE INDEX IF NOT EXISTS link_metrics_expire ON link_metrics ( step, ts )
+    '''
+    CREATE_LINK_STATS_TABLE = '''
+CREATE TABLE IF NOT EXISTS link_stats (
+    conn_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    ts DOUBLE NOT NULL,
+    data TEXT,
+    PRIMARY KEY(conn_id, name)
+)
+    '''
+    CREATE_STATE_INTERVALS_TABLE = f'''
+CREATE TABLE IF NOT EXISTS state_intervals (
+    sn INTEGER PRIMARY KEY AUTOINCREMENT,
+    conn_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    start_ts DOUBLE NOT NULL,
+    end_ts DOUBLE,
+    {", ".join(map(lambda x: f"cum_{x} DOUBLE NOT NULL", LinkStateFields))}
+)
+    '''
+    CREATE_STATE_INTERVALS_INDEX = '''
+CREATE INDEX IF NOT EXISTS state_intervals_start ON state_intervals ( conn_id, start_ts )
+    '''
+    CREATE_TOPOLOGY_TABLE = '''
+CREATE TABLE IF NOT EXISTS topology (
+    bmc TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    links TEXT NOT NULL,
+    routes TEXT NOT NULL,
+    ts DOUBLE NOT NULL
+)
+    '''
+    CREATE_LEASE_TABLE = '''
+CREATE TABLE IF NOT EXISTS lease (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires DOUBLE NOT NULL
 )
     '''
     CREATE_TABLES = [
         CREATE_LOGS_TABLE,
+        *CREATE_LOGS_INDEXES,
         CREATE_CONNECTIONS_TABLE,
         CREATE_TXHISTORY_TABLE,
+        CREATE_LINK_METRICS_TABLE,
+        CREATE_LINK_METRICS_INDEX,
+        CREATE_LINK_STATS_TABLE,
+        CREATE_STATE_INTERVALS_TABLE,
+        CREATE_STATE_INTERVALS_INDEX,
+        CREATE_TOPOLOGY_TABLE,
+        CREATE_LEASE_TABLE,
     ]
-    def __init__(self, url: str = ":memory:"):
+    def __init__(self, url: str = ":memory:", checkpoint: Optional[str] = None, checkpoint_interval: float = 300.0):
+        if checkpoint is not None and url != ':memory:':
+            # restoring would replace the database with an older copy
+            raise Exception('checkpoint is only for the in-memory storage')
         conn = sqlite3.connect(url, check_same_thread=False)
+        if url != ':memory:':
+            # let API workers in other processes read while the poller writes
+            conn.execute('PRAGMA journal_mode=WAL')
+        if checkpoint is not None and os.path.exists(checkpoint):
+            src = sqlite3.connect(checkpoint)
+            try:
+                src.backup(conn)
+            finally:
+                src.close()
         for sql in self.CREATE_TABLES:
             conn.execute(sql)
+        self.__url = url
         self.__conn = conn
         self.__cursor = None
         self.__lock = RLock()
 
         self.__timer = None
+        self.__checkpoint = checkpoint
+        self.__checkpoint_interval = checkpoint_interval
+        self.__checkpoint_timer = None
+        if checkpoint is not None:
+            self.__schedule_checkpoint()
         # self.generate_log()
 
+    @property
+    def url(self) -> str:
+        return self.__url
+
     def generate_log(self):
         self.__timer = None
         now = datetime.now()
@@ -147,21 +335,42 @@ CREATE TABLE IF NOT EXISTS txhistory (
             return c.lastrowid
         return self.do_write(write_log)
 
-    def get_logs(self, src: Optional[str] = None, dst: Optional[str] = None, events: Optional[list[str]] = None, limit: Optional[int] = None, after: Optional[int] = None, before: Optional[int] = None) -> List[Log]:
+    @staticmethod
+    def __log_conditions(src: Optional[str] = None, dst: Optional[str] = None, events: Optional[list[str]] = None, since: Optional[float] = None, until: Optional[float] = None) -> tuple[list[str],list]:
         conditions = []
         params = []
-        order = 'DESC'
         if src is not None:
-            conditions.append('( src = ? or src = ? )')
+            conditions.append('src IN ( ?, ? )')
             params.append(src)
             params.append('')
         if dst is not None:
-            conditions.append('( dst = ? or dst = ? )')
+            conditions.append('dst IN ( ?, ? )')
             params.append(dst)
             params.append('')
         if events is not None:
             conditions.append(f'event in ( {",".join(["?"]*len(events))} )')
             params += events
+        if since is not None:
+            conditions.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('ts < ?')
+            params.append(until)
+        return conditions, params
+
+    def __sn_range(self, since: Optional[float], until: Optional[float]) -> Optional[tuple[int,int]]:
+        # bounds of sn for the time range by a scan of logs_ts, so the logs
+        # can be paged by sn in the range
+        conditions, params = self.__log_conditions(since=since, until=until)
+        c = self.__conn.cursor()
+        c.execute(f'SELECT MIN(sn), MAX(sn) FROM logs INDEXED BY logs_ts WHERE {" AND ".join(conditions)}', params)
+        first, last = c.fetchone()
+        c.close()
+        return None if first is None else (first, last)
+
+    def __logs_query(self, src: Optional[str] = None, dst: Optional[str] = None, events: Optional[list[str]] = None, limit: Optional[int] = None, after: Optional[int] = None, before: Optional[int] = None, since: Optional[float] = None, until: Optional[float] = None) -> Optional[tuple[str,list]]:
+        conditions, params = self.__log_conditions(events=events, since=since, until=until)
+        order = 'DESC'
         if after is not None:
             order = 'ASC'
             conditions.append('sn > ?')
@@ -169,18 +378,114 @@ CREATE TABLE IF NOT EXISTS txhistory (
         if before is not None:
             conditions.append('sn < ?')
             params.append(before)
+        if since is not None or until is not None:
+            sn_range = self.__sn_range(since, until)
+            if sn_range is None:
+                return None
+            conditions.append('sn BETWEEN ? AND ?')
+            params += list(sn_range)
 
         if limit is None or limit > 100:
             limit = 100
 
-        where_clause = (' WHERE ' + " AND ".join(conditions)) if len(conditions) > 0 else ''
+        # Each branch is served in the order of sn by an index, and they are
+        # merged until the limit. IN lists for logs of the link and global
+        # logs (empty src and dst) would make SQLite sort all matching rows.
+        if src is None and dst is None:
+            index = 'INDEXED BY logs_event_sn' if events is not None and len(events) == 1 else 'NOT INDEXED'
+            branches = [(index, [], [])]
+        else:
+            if src is not None and dst is not None:
+                index = 'INDEXED BY logs_link_sn'
+            elif src is not None:
+                index = 'INDEXED BY logs_src_sn'
+            else:
+                index = 'INDEXED BY logs_dst_sn'
+            branches = []
+            for src_value in (dict.fromkeys([src, '']) if src is not None else [None]):
+                for dst_value in (dict.fromkeys([dst, '']) if dst is not None else [None]):
+                    link_conditions, link_params = [], []
+                    if src_value is not None:
+                        link_conditions.append('src = ?')
+                        link_params.append(src_value)
+                    if dst_value is not None:
+                        link_conditions.append('dst = ?')
+                        link_params.append(dst_value)
+                    branches.append((index, link_conditions, link_params))
+
+        selects = []
+        query_params = []
+        for index, link_conditions, link_params in branches:
+            where = link_conditions + conditions
+            where_clause = (' WHERE ' + " AND ".join(where)) if len(where) > 0 else ''
+            selects.append(f'SELECT sn, ts, src, dst, event, extra FROM logs {index}{where_clause}')
+            query_params += link_params + params
+        sql = ' UNION ALL '.join(selects) + f' ORDER BY sn {order} LIMIT ?'
+        return sql, query_params+[limit]
+
+    def get_logs(self, src: Optional[str] = None, dst: Optional[str] = None, events: Optional[list[str]] = None, limit: Optional[int] = None, after: Optional[int] = None, before: Optional[int] = None, since: Optional[float] = None, until: Optional[float] = None) -> List[Log]:
+        query = self.__logs_query(src, dst, events, limit, after, before, since, until)
+        if query is None:
+            return []
         c = self.__conn.cursor()
-        sql = f'SELECT sn, ts, src, dst, event, extra FROM logs {where_clause} ORDER BY sn {order} LIMIT ?'
-        c.execute(sql, params+[limit])
+        c.execute(*query)
         items = c.fetchall()
         c.close()
         return list(map(log_from_list, items))
 
+    def get_log_stats(self, src: Optional[str] = None, dst: Optional[str] = None, events: Optional[list[str]] = None, since: Optional[float] = None, until: Optional[float] = None, bucket: Optional[float] = None) -> List[LogStat]:
+        conditions, params = self.__log_conditions(src, dst, events, since, until)
+        where_clause = (' WHERE ' + " AND ".join(conditions)) if len(conditions) > 0 else ''
+        if bucket is not None:
+            first, last = since, until
+            if first is None or last is None:
+                # an open range is bounded by the matching logs
+                c = self.__conn.cursor()
+                c.execute(f'SELECT MIN(ts), MAX(ts) FROM logs {where_clause}', params)
+                min_ts, max_ts = c.fetchone()
+                c.close()
+                first = min_ts if first is None else first
+                last = max_ts if last is None else last
+            if first is not None and last is not None:
+                bucket = max(bucket, (last-first)/MAX_HISTORY_POINTS)
+            bucket_column = 'CAST(ts / ? AS INTEGER) * ?'
+            params = [bucket, bucket] + params
+        else:
+            bucket_column = 'NULL'
+        sql = f'SELECT {bucket_column} AS bucket, event, src, dst, COUNT(*), SUM(json_extract(extra, \'$.count\')) FROM logs {where_clause}'
+        sql += ' GROUP BY bucket, event, src, dst ORDER BY bucket, event, src, dst'
+        c = self.__conn.cursor()
+        c.execute(sql, params)
+        items = c.fetchall()
+        c.close()
+        return list(map(log_stat_from, items))
+
+    def iter_logs(self, since: Optional[float] = None, until: Optional[float] = None, events: Optional[list[str]] = None, chunk: int = 1000) -> Iterable[List[Log]]:
+        conditions, params = self.__log_conditions(events=events, since=since, until=until)
+        last = 0
+        if since is not None or until is not None:
+            # start and end at the logs in the range instead of scanning
+            # the whole table
+            sn_range = self.__sn_range(since, until)
+            if sn_range is None:
+                return
+            last = sn_range[0] - 1
+            conditions.append('sn <= ?')
+            params.append(sn_range[1])
+        sql = f'SELECT sn, ts, src, dst, event, extra FROM logs NOT INDEXED WHERE {" AND ".join(["sn > ?"]+conditions)} ORDER BY sn ASC LIMIT ?'
+
+        while True:
+            c = self.__conn.cursor()
+            c.execute(sql, [last] + params + [chunk])
+            items = c.fetchall()
+            c.close()
+            if len(items) == 0:
+                return
+            yield list(map(log_from_list, items))
+            if len(items) < chunk:
+                return
+            last = items[-1][0]
+
     def get_connection_state(self, src: str, dst: str) -> ConnectionState:
         c = self.__conn.cursor()
         sql = f'SELECT id, {",".join(ConnectionStateFields)} FROM connections WHERE src = ? AND dst = ?'
@@ -251,7 +556,7 @@ CREATE TABLE IF NOT EXISTS txhistory (
             params = [conn_id, tx_seq, tx_ts.timestamp()]
             cursor.execute(sql, params)
             sn = cursor.lastrowid
-            return TXRecord((sn, tx_seq, tx_ts.timestamp()))
+            return TXRecord(sn, tx_seq, tx_ts.timestamp())
         return self.do_write(do_write)
     
     def get_tx_records(self, conn_id: int) -> Iterable[TXRecord]:
@@ -263,7 +568,7 @@ CREATE TABLE IF NOT EXISTS txhistory (
             entry = cursor.fetchone()
             if entry is None:
                 break
-            yield TXRecord(entry)
+            yield TXRecord(*entry)
         cursor.close()
         return
     
@@ -272,8 +577,245 @@ CREATE TABLE IF NOT EXISTS txhistory (
             cursor.execute('DELETE FROM txhistory WHERE sn = ?', [sn])
         return self.do_write(do_write, **kwargs)
 
+    def add_link_sample(self, conn_id: int, ts: datetime, sample: LinkSample):
+        def do_write(cursor: sqlite3.Cursor):
+            columns = []
+            values = []
+            updates = []
+            for name in LinkMetricFields:
+                columns += [ f'{name}_min', f'{name}_max', f'{name}_sum' ]
+                values += [ sample[name] ] * 3
+                updates += [
+                    f'{name}_min = min({name}_min, excluded.{name}_min)',
+                    f'{name}_max = max({name}_max, excluded.{name}_max)',
+                    f'{name}_sum = {name}_sum + excluded.{name}_sum',
+                ]
+            sql = f'INSERT INTO link_metrics ( conn_id, step, ts, samples, {",".join(columns)} ) VALUES ( ?, ?, ?, 1, {",".join("?"*len(columns))} )'
+            sql += f' ON CONFLICT(conn_id, step, ts) DO UPDATE SET samples = samples + 1, {" , ".join(updates)}'
+            value = ts.timestamp()
+            for step, _ in LinkMetricLevels:
+                bucket = value if step == 0 else (value // step) * step
+                cursor.execute(sql, [conn_id, step, bucket] + values)
+        return self.do_write(do_write)
+
+    def expire_link_samples(self, now: datetime):
+        def do_write(cursor: sqlite3.Cursor):
+            for step, retention in LinkMetricLevels:
+                if retention is None:
+                    continue
+                cursor.execute('DELETE FROM link_metrics WHERE step = ? AND ts < ?', [step, now.timestamp()-retention])
+        return self.do_write(do_write)
+
+    def get_link_history(self, conn_id: int, since: float, until: float, step: Optional[float] = None, now: Optional[datetime] = None) -> List[LinkHistory]:
+        if now is None:
+            now = datetime.now()
+        step = max(step or 0, (until-since)/MAX_HISTORY_POINTS, 1)
+        level = select_metric_level(since, step, now.timestamp())
+
+        columns = []
+        for name in LinkMetricFields:
+            columns += [ f'MIN({name}_min)', f'MAX({name}_max)', f'SUM({name}_sum)' ]
+        sql = f'SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, SUM(samples), {",".join(columns)} FROM link_metrics'
+        sql += ' WHERE conn_id = ? AND step = ? AND ts >= ? AND ts < ? GROUP BY bucket ORDER BY bucket'
+        c = self.__conn.cursor()
+        c.execute(sql, [step, step, conn_id, level, since, until])
+        items = c.fetchall()
+        c.close()
+        return list(map(link_history_from, items))
+
+    def get_link_stats(self, conn_id: int, name: str) -> Optional[any]:
+        c = self.__conn.cursor()
+        c.execute('SELECT data FROM link_stats WHERE conn_id = ? AND name = ?', [conn_id, name])
+        result = c.fetchone()
+        c.close()
+        if result is None:
+            return None
+        return json.loads(result[0])
+
+    def set_link_stats(self, conn_id: int, name: str, ts: datetime, data: any):
+        def do_write(cursor: sqlite3.Cursor):
+            sql = 'INSERT INTO link_stats ( conn_id, name, ts, data ) VALUES ( ?, ?, ?, ? )'
+            sql += ' ON CONFLICT(conn_id, name) DO UPDATE SET ts = excluded.ts, data = excluded.data'
+            cursor.execute(sql, [conn_id, name, ts.timestamp(), json.dumps(data)])
+        return self.do_write(do_write)
+
+    def __get_state_interval(self, cursor: sqlite3.Cursor, conn_id: int, ts: Optional[float] = None) -> Optional[tuple]:
+        sql = f'SELECT sn, state, start_ts, end_ts, {",".join(map(lambda x: f"cum_{x}", LinkStateFields))} FROM state_intervals WHERE conn_id = ?'
+        params = [ conn_id ]
+        if ts is not None:
+            sql += ' AND start_ts <= ?'
+            params.append(ts)
+        sql += ' ORDER BY start_ts DESC, sn DESC LIMIT 1'
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+    def add_state_interval(self, conn_id: int, state: str, ts: datetime):
+        def do_write(cursor: sqlite3.Cursor):
+            value = ts.timestamp()
+            cums = dict(map(lambda x: (x, 0.0), LinkStateFields))
+            last = self.__get_state_interval(cursor, conn_id)
+            if last is not None:
+                sn, last_state, start_ts, end_ts = last[:4]
+                if end_ts is None and last_state == state:
+                    return
+                cums = dict(zip(LinkStateFields, last[4:]))
+                if end_ts is None:
+                    end_ts = max(value, start_ts)
+                    cursor.execute('UPDATE state_intervals SET end_ts = ? WHERE sn = ?', [end_ts, sn])
+                if last_state in cums:
+                    cums[last_state] += end_ts - start_ts
+                value = max(value, end_ts)
+            sql = f'INSERT INTO state_intervals ( conn_id, state, start_ts, end_ts, {",".join(map(lambda x: f"cum_{x}", LinkStateFields))} )'
+            sql += f' VALUES ( ?, ?, ?, NULL, {",".join("?"*len(LinkStateFields))} )'
+            cursor.execute(sql, [conn_id, state, value] + list(cums.values()))
+        return self.do_write(do_write)
+
+    def __get_state_cums(self, cursor: sqlite3.Cursor, conn_id: int, ts: float, now: float) -> dict[str,float]:
+        cums = dict(map(lambda x: (x, 0.0), LinkStateFields))
+        item = self.__get_state_interval(cursor, conn_id, ts)
+        if item is None:
+            return cums
+        _, state, start_ts, end_ts = item[:4]
+        cums = dict(zip(LinkStateFields, item[4:]))
+        end_ts = now if end_ts is None else end_ts
+        if state in cums:
+            cums[state] += max(0.0, min(ts, end_ts) - start_ts)
+        return cums
+
+    def get_link_uptime(self, conn_id: int, since: float, until: float, now: Optional[datetime] = None) -> LinkUptime:
+        if now is None:
+            now = datetime.now()
+        c = self.__conn.cursor()
+        cums1 = self.__get_state_cums(c, conn_id, since, now.timestamp())
+        cums2 = self.__get_state_cums(c, conn_id, until, now.timestamp())
+        c.close()
+        durations = dict(map(lambda x: (x, cums2[x]-cums1[x]), LinkStateFields))
+        total = sum(durations.values())
+        return {
+            'since': since,
+            'until': until,
+            'durations': durations,
+            'ratios': dict(map(lambda x: (x[0], x[1]/total if total > 0 else None), durations.items())),
+        }
+
+    def get_connections(self) -> List[tuple[int,str,str,Optional[str]]]:
+        c = self.__conn.cursor()
+        c.execute('SELECT id, src, dst, state FROM connections ORDER BY id')
+        items = c.fetchall()
+        c.close()
+        return items
+
+    def get_log_rows(self, since: float, until: float, events: list[str]) -> List[tuple]:
+        sql = 'SELECT src, dst, event, ts, json_extract(extra, \'$.count\'), json_extract(extra, \'$.delta\'), json_extract(extra, \'$.after\') FROM logs'
+        sql += f' WHERE ts >= ? AND ts < ? AND event IN ( {",".join(["?"]*len(events))} ) ORDER BY sn'
+        c = self.__conn.cursor()
+        c.execute(sql, [since, until] + events)
+        items = c.fetchall()
+        c.close()
+        return items
+
+    def get_last_states(self, before: float) -> List[tuple[str,str,str]]:
+        sql = 'SELECT src, dst, json_extract(extra, \'$.after\') FROM logs WHERE sn IN ('
+        sql += ' SELECT MAX(sn) FROM logs WHERE event = ? AND ts < ? GROUP BY src, dst )'
+        c = self.__conn.cursor()
+        c.execute(sql, ['state', before])
+        items = c.fetchall()
+        c.close()
+        return items
+
+    def get_tx_record_summary(self) -> List[tuple[int,int,float]]:
+        c = self.__conn.cursor()
+        c.execute('SELECT conn_id, COUNT(*), MIN(tx_ts) FROM txhistory GROUP BY conn_id')
+        items = c.fetchall()
+        c.close()
+        return items
+
+    def get_topology(self) -> List[Topology]:
+        c = self.__conn.cursor()
+        c.execute('SELECT bmc, config, links, routes, ts FROM topology')
+        items = c.fetchall()
+        c.close()
+        return list(map(topology_from, items))
+
+    def set_topology(self, topology: Topology):
+        def do_write(cursor: sqlite3.Cursor):
+            sql = 'INSERT INTO topology ( bmc, config, links, routes, ts ) VALUES ( ?, ?, ?, ?, ? )'
+            sql += ' ON CONFLICT(bmc) DO UPDATE SET config = excluded.config, links = excluded.links, routes = excluded.routes, ts = excluded.ts'
+            cursor.execute(sql, [
+                topology['bmc'],
+                json.dumps(topology['config']),
+                json.dumps(topology['links']),
+                json.dumps(topology['routes']),
+                topology['ts'],
+            ])
+        return self.do_write(do_write)
+
+    def delete_topology(self, bmc: str):
+        def do_write(cursor: sqlite3.Cursor):
+            cursor.execute('DELETE FROM topology WHERE bmc = ?', [bmc])
+        return self.do_write(do_write)
+
+    def acquire_lease(self, name: str, owner: str, ttl: float, now: float) -> bool:
+        def do_write(cursor: sqlite3.Cursor) -> bool:
+            # a single statement, so instances racing for an expired lease
+            # can't both take it
+            sql = 'INSERT INTO lease ( name, owner, expires ) VALUES ( ?, ?, ? )'
+            sql += ' ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires'
+            sql += ' WHERE lease.owner = excluded.owner OR lease.expires <= ?'
+            cursor.execute(sql, [name, owner, now+ttl, now])
+            return cursor.rowcount > 0
+        return self.do_write(do_write)
+
+    def release_lease(self, name: str, owner: str):
+        def do_write(cursor: sqlite3.Cursor):
+            cursor.execute('DELETE FROM lease WHERE name = ? AND owner = ?', [name, owner])
+        return self.do_write(do_write)
+
+    def get_lease(self, name: str) -> Optional[tuple[str,float]]:
+        c = self.__conn.cursor()
+        c.execute('SELECT owner, expires FROM lease WHERE name = ?', [name])
+        item = c.fetchone()
+        c.close()
+        return item
+
+    def __schedule_checkpoint(self):
+        self.__checkpoint_timer = Timer(self.__checkpoint_interval, self.__on_checkpoint)
+        self.__checkpoint_timer.start()
+
+    def __on_checkpoint(self):
+        with self.__lock:
+            if self.__checkpoint_timer is None:
+                return
+            try:
+                self.checkpoint()
+            except BaseException:
+                traceback.print_exc()
+            self.__schedule_checkpoint()
+
+    def checkpoint(self):
+        if self.__checkpoint is None:
+            return
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.__checkpoint)+'.', dir=os.path.dirname(self.__checkpoint) or '.')
+        os.close(fd)
+        try:
+            with self.__lock:
+                dst = sqlite3.connect(tmp)
+                try:
+                    self.__conn.backup(dst)
+                finally:
+                    dst.close()
+            os.replace(tmp, self.__checkpoint)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
     def term(self):
-        self.__conn.close()
+        with self.__lock:
+            if self.__checkpoint_timer is not None:
+                self.__checkpoint_timer.cancel()
+                self.__checkpoint_timer = None
+                self.checkpoint()
+            self.__conn.close()
         if self.__timer is not None:
             self.__timer.cancel()
             self.__timer = None
\ No newline at end of file
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+from typing import Iterable, Iterator, List, Optional
+
+LinkKey = tuple[str,str]
+
+
+class TopologyIndex:
+    __slots__ = ('__ids', '__keys', '__reverse')
+
+    def __init__(self, keys: Iterable[LinkKey] = ()):
+        self.__ids: dict[LinkKey,int] = {}
+        self.__keys: List[LinkKey] = []
+        self.__reverse: List[Optional[int]] = []
+        for key in keys:
+            self.add(key)
+
+    def add(self, key: LinkKey) -> int:
+        id = self.__ids.get(key)
+        if id is not None:
+            return id
+        id = len(self.__keys)
+        self.__ids[key] = id
+        self.__keys.append(key)
+        rid = self.__ids.get((key[1], key[0]))
+        self.__reverse.append(rid)
+        if rid is not None:
+            self.__reverse[rid] = id
+        return id
+
+    def id_of(self, key: LinkKey) -> Optional[int]:
+        return self.__ids.get(key)
+
+    def key_of(self, id: int) -> LinkKey:
+        return self.__keys[id]
+
+    def reverse_of(self, id: int) -> Optional[int]:
+        return self.__reverse[id]
+
+    def __contains__(self, key: LinkKey) -> bool:
+        return key in self.__ids
+
+    def __iter__(self) -> Iterator[LinkKey]:
+        return iter(self.__keys)
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def connected(self) -> List[LinkKey]:
+        # one key for each pair of links in both directions
+        return [key for id, key in enumerate(self.__keys) if self.__reverse[id] is not None and id < self.__reverse[id]]
+
+    def unique(self, keys: Iterable[LinkKey]) -> List[LinkKey]:
+        # one key for each pair of links regardless of the direction
+        seen = set()
+        result = []
+        for key in keys:
+            id = self.add(key)
+            if id in seen or self.__reverse[id] in seen:
+                continue
+            seen.add(id)
+            result.append(key)
+        return result
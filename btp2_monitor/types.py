@@ -4,62 +4,52 @@
 import json
 from abc import ABCMeta, abstractmethod
 from collections.abc import Iterable
-from typing import Tuple, TypedDict, Union
+from typing import Optional, Tuple, TypedDict, Union
 from urllib.parse import urlparse
 
 
-class VerifierStatus(tuple):
-    def __new__(cls, __iterable: Iterable = ...) -> 'VerifierStatus':
-        return super().__new__(cls, __iterable)
+class VerifierStatus:
+    __slots__ = ('height', 'extra')
 
+    def __init__(self, height: int, extra: Optional[bytes]):
+        self.height = height
+        self.extra = extra
+
+    @staticmethod
     def from_dict(value: dict) -> 'VerifierStatus':
-        return VerifierStatus((
+        return VerifierStatus(
             int(value['height'], 0),
             bytes.fromhex(value['extra'][2:]) if value['extra'] is not None else None,
-        ))
-
-    @property
-    def height(self) -> int:
-        return self[0]
-
-    @property
-    def extra(self) -> bytes:
-        return self[1]
+        )
 
     def __str__(self) -> str:
-        return f'VerifierStatus(height={self.height},extra={self.extra.hex()})'
+        return f'VerifierStatus(height={self.height},extra={self.extra.hex() if self.extra is not None else None})'
 
-class LinkStatus(tuple):
-    def __new__(cls, __iterable: Iterable = ...) -> 'LinkStatus':
-        return super().__new__(cls, __iterable)
+class LinkStatus:
+    __slots__ = ('rx_seq', 'tx_seq', 'verifier', 'current_height')
+
+    def __init__(self, rx_seq: int, tx_seq: int, verifier: VerifierStatus, current_height: int):
+        self.rx_seq = rx_seq
+        self.tx_seq = tx_seq
+        self.verifier = verifier
+        self.current_height = current_height
 
     @staticmethod
     def from_dict(value: dict) -> 'LinkStatus':
         try:
-            return LinkStatus((
+            return LinkStatus(
                 int(value['rx_seq'], 0),
                 int(value['tx_seq'], 0),
                 VerifierStatus.from_dict(value['verifier']),
                 int(value['cur_height'], 0),
-            ))
+            )
         except:
             raise Exception(f'Invalid LinkStatus({json.dumps(value)})')
 
-    @property
-    def rx_seq(self) -> int:
-        return self[0]
-
-    @property
-    def tx_seq(self) -> int:
-        return self[1]
-
-    @property
-    def verifier(self) -> VerifierStatus:
-        return VerifierStatus(self[2])
-
-    @property
-    def current_height(self) -> int:
-        return self[3]
+    @staticmethod
+    def from_tuple(value: Iterable) -> 'LinkStatus':
+        rx_seq, tx_seq, verifier, current_height = value
+        return LinkStatus(rx_seq, tx_seq, VerifierStatus(*verifier), current_height)
 
     def __str__(self) -> str:
         return f'LinkStatus(rx_seq={self.rx_seq},tx_seq={self.tx_seq},verifier={self.verifier},current_height={self.current_height})'
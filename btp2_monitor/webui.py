@@ -1,195 +1,26 @@
 from contextlib import asynccontextmanager
-from datetime import datetime
-import json
 import os
-from threading import Timer
-import traceback
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.utils import get_openapi
-from readerwriterlock import rwlock
 
+from .backend import MODE_STANDALONE, MONITOR_VERSION, MonitorBackend
+from .monitor import NetworkChanges
+from .export import MEDIA_TYPES, encode_logs, gzip_stream
 from .webui_types import FeeTableJSON, NetworkID, LinkID, LinkInfo
-from .monitor import LinkEvent, Links
-from .storage import Log, Storage
+from .stats import QuantileSummary, ThroughputSummary
+from .storage import LinkHistory, LinkUptime
 
-NETWORKS_JSON = os.environ.get('NETWORKS_JSON', 'networks.json')
 DOCUMENT_ROOT = os.environ.get('DOCUMENT_ROOT', "web/build/")
-STORAGE_URL = os.environ.get('STORAGE_URL', ':memory:')
-REFRESH_INTERVAL = float(os.environ.get('REFRESH_INTERVAL', '30.0'))
-MONITOR_VERSION = os.environ.get('MONITOR_VERSION', 'unknown')
-INITIAL_INTERVAL = 1.0
+MONITOR_MODE = os.environ.get('MONITOR_MODE', MODE_STANDALONE)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
 
 
-class MonitorBackend:
-    def __init__(self):
-        with open(NETWORKS_JSON, 'rb') as fd:
-            network_json = json.load(fd)
-        self.__storage = Storage(STORAGE_URL)
-        self.__links = Links(network_json, self.__storage)
-        self.__initialized = False
-        self.__stopped = False
-        self.__relay_fee_table: dict[NetworkID,tuple[datetime,FeeTableJSON]] = {}
-        self.__lock = rwlock.RWLockFair()
-        self.try_update()
-
-    @property
-    def storage(self) -> Storage:
-        return self.__storage
-
-    def write_log(self, ts: datetime, src: str, dst: str, event: str, extra: any) -> Log:
-        row_id = self.__storage.write_log(ts, src, dst, event, extra)
-        log: Log = {
-            'sn': row_id,
-            'ts': ts,
-            'src': src,
-            'dst': dst,
-            'event': event,
-            'extra': extra,
-        }
-        # TODO notify log
-        return log
-
-    def try_update(self):
-        with self.__lock.gen_rlock():
-            if self.__stopped:
-                return
-        self.__timer = None
-
-        try :
-            now = datetime.now()
-
-            status = self.__links.query_status(True)
-            with self.__lock.gen_wlock():
-                updated, changes = self.__links.apply_status(status)
-        except BaseException as exc:
-            traceback.print_exc()
-            self.write_log(now, "", "", "log", f'Exception:{str(exc)}')
-            self.__timer = Timer(REFRESH_INTERVAL, self.try_update)
-            self.__timer.start()
-            return
-
-        if not self.__initialized:
-            self.__initialized = True
-            self.write_log(now, '', '', 'log', f'START {MONITOR_VERSION}')
-        if len(changes) > 0:
-            events = []
-            for c in changes:
-                extra = None
-                if c.name == LinkEvent.TX:
-                    extra = {'seq': c.seq, 'count': c.count}
-                elif c.name == LinkEvent.RX:
-                    extra = {'seq': c.seq, 'count': c.count, 'delta': c.delta.total_seconds()}
-                elif c.name == LinkEvent.STATE:
-                    extra = {'after': c.after, 'before': c.before}
-                event = self.write_log(now, c.link.src, c.link.dst, c.name, extra)
-                events.append(event)
-
-            if updated:
-                # notify changes to slack
-                pass
-
-        self.__timer = Timer(REFRESH_INTERVAL, self.try_update)
-        self.__timer.start()
-
-    def get_links(self) -> List[LinkID]:
-        links = []
-        if not self.__initialized:
-            return links
-
-        with self.__lock.gen_rlock():
-            for key in self.__links.get_connected_links():
-                if key in links or (key[1], key[0]) in links:
-                    continue
-                links.append(key)
-
-        return list(map(lambda key: {
-             'src': NetworkID.from_address(key[0]),
-             'src_name': self.__links.name_of(key[0]),
-             'dst': NetworkID.from_address(key[1]),
-             'dst_name': self.__links.name_of(key[1]),
-        }, links))
-
-    def get_network(self, id: NetworkID) -> dict:
-        net_info: dict = self.__links.get_network(id.address)
-        net_info = net_info.copy()
-        del net_info['endpoint']
-        return net_info
-
-    def get_link(self, src: NetworkID, dst: NetworkID) -> LinkInfo:
-        if not self.__initialized:
-            raise Exception('Unknown')
-
-        with self.__lock.gen_rlock():
-            link = self.__links.get_link(src.address, dst.address)
-            return {
-                'src': NetworkID.from_address(link.src),
-                'dst': NetworkID.from_address(link.dst),
-                'src_name': link.src_name,
-                'dst_name': link.dst_name,
-                'state': link.state,
-                'tx_seq': link.tx_seq,
-                'rx_seq': link.rx_seq,
-                'tx_height': link.tx_height,
-                'rx_height': link.rx_height,
-                'pending_count': link.pending_count,
-                'pending_delay': link.pending_duration.total_seconds(),
-                'time_limit': link.time_limit,
-            }
-
-    def get_logs(self, src: Optional[NetworkID], dst: Optional[NetworkID], **kwargs) -> List[Log]:
-        logs = self.__storage.get_logs(
-            src=NetworkID.as_address(src),
-            dst=NetworkID.as_address(dst),
-            **kwargs)
-        for log in logs:
-            if 'src' in log:
-                log['src_name'] = be.__links.name_of(log['src'])
-                log['src'] = NetworkID.from_address(log['src'])
-            if 'dst' in log:
-                log['dst_name'] = be.__links.name_of(log['dst'])
-                log['dst'] = NetworkID.from_address(log['dst'])
-        return logs
-
-    def get_fee_table(self, id: NetworkID, refresh: Optional[bool] = False) -> FeeTableJSON:
-        with self.__lock.gen_wlock():
-            if self.__stopped:
-                return None
-            now = datetime.now()
-            if id in self.__relay_fee_table and not refresh:
-                ts, table = self.__relay_fee_table[id]
-                if (now-ts).total_seconds() >= REFRESH_INTERVAL:
-                    self.__relay_fee_table[id] = (now, table)
-                    timer = Timer(0.1, self.get_fee_table, [id, True])
-                    timer.start()
-                return table
-
-            try:
-                table = self.__links.get_relay_fee_table(id.address)
-            except BaseException as exc:
-                raise HTTPException(status_code=500, detail=f'fail to get relay_fee_table')
-
-            for e in table['table']:
-                e['fees'] = list(map(lambda x: str(x), e['fees']))
-            self.__relay_fee_table[id] = (now, table)
-            return table
-
-    def term(self):
-        with self.__lock.gen_wlock():
-            if self.__stopped:
-                return
-            self.__stopped = True
-            if self.__timer is not None:
-                self.__timer.cancel()
-                self.__timer = None
-            self.write_log(datetime.now(), '', '', 'log', f'SHUTDOWN {MONITOR_VERSION}')
-            self.__storage.term()
-
-
-be = MonitorBackend()
+be = MonitorBackend(MONITOR_MODE)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -215,6 +46,26 @@ async def getLinks() -> List[LinkID]:
 async def getLinkInfo(src: str, dst: str) -> LinkInfo:
     return be.get_link(NetworkID(src), NetworkID(dst))
 
+@app.get("/links/{src}/{dst}/history")
+async def getLinkHistory(src: str, dst: str, since: Optional[float] = Query(None, alias='from'), until: Optional[float] = Query(None, alias='to'), step: Optional[float] = None) -> List[LinkHistory]:
+    return be.get_link_history(NetworkID(src), NetworkID(dst), since, until, step)
+
+@app.get("/links/{src}/{dst}/uptime")
+async def getLinkUptime(src: str, dst: str, since: Optional[float] = Query(None, alias='from'), until: Optional[float] = Query(None, alias='to')) -> LinkUptime:
+    return be.get_link_uptime(NetworkID(src), NetworkID(dst), since, until)
+
+@app.get("/links/{src}/{dst}/latency")
+async def getLinkLatency(src: str, dst: str) -> dict[str,QuantileSummary]:
+    return be.get_link_latency(NetworkID(src), NetworkID(dst))
+
+@app.get("/links/{src}/{dst}/throughput")
+async def getLinkThroughput(src: str, dst: str) -> ThroughputSummary:
+    return be.get_link_throughput(NetworkID(src), NetworkID(dst))
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def getMetrics() -> str:
+    return be.get_metrics()
+
 @app.get('/network/{id}')
 async def getNetworkInfo(id: str) -> dict:
     return be.get_network(NetworkID(id))
@@ -223,20 +74,55 @@ async def getNetworkInfo(id: str) -> dict:
 async def getFeeTable(id: str) -> FeeTableJSON:
     return be.get_fee_table(NetworkID(id))
 
+def parse_events(events: Optional[str]) -> Optional[list[str]]:
+    if events is None:
+        return None
+    event_list = []
+    for event in map(lambda x: x.strip(), events.split(',')):
+        event_list.append(event)
+        if event == 'tx':
+            event_list.append('rx')
+    return event_list
+
 @app.get("/events")
-async def getLogs(limit: Optional[int] = None, after: Optional[int] = None, before: Optional[int] = None, events: Optional[str] = None, src: Optional[str] = None, dst: Optional[str] = None) -> List[dict]:
-    if events is not None:
-        event_list = []
-        for event in map(lambda x: x.strip(), events.split(',')):
-            event_list.append(event)
-            if event == 'tx':
-                event_list.append('rx')
-        events = event_list
+async def getLogs(limit: Optional[int] = None, after: Optional[int] = None, before: Optional[int] = None, events: Optional[str] = None, src: Optional[str] = None, dst: Optional[str] = None, since: Optional[float] = Query(None, alias='from'), until: Optional[float] = Query(None, alias='to')) -> List[dict]:
+    events = parse_events(events)
     return be.get_logs(
         src=NetworkID.from_str(src),
         dst=NetworkID.from_str(dst),
         events=events,
-        after=after, limit=limit, before=before)
+        after=after, limit=limit, before=before,
+        since=since, until=until)
+
+@app.get("/events/stats")
+async def getLogStats(events: Optional[str] = None, src: Optional[str] = None, dst: Optional[str] = None, since: Optional[float] = Query(None, alias='from'), until: Optional[float] = Query(None, alias='to'), bucket: Optional[float] = Query(None, gt=0)) -> List[dict]:
+    return be.get_log_stats(
+        src=NetworkID.from_str(src),
+        dst=NetworkID.from_str(dst),
+        events=parse_events(events),
+        since=since, until=until, bucket=bucket)
+
+@app.get("/events/export")
+def exportLogs(request: Request, since: Optional[float] = Query(None, alias='from'), until: Optional[float] = Query(None, alias='to'), format: str = 'ndjson', events: Optional[str] = None):
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f'unknown format')
+    content = encode_logs(be.storage.iter_logs(since, until, parse_events(events)), format)
+    headers = {
+        'Content-Disposition': f'attachment; filename="events.{format}"',
+    }
+    if 'gzip' in request.headers.get('accept-encoding', ''):
+        content = gzip_stream(content)
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(content, media_type=MEDIA_TYPES[format], headers=headers)
+
+@app.post("/admin/reload")
+def reloadNetworks(authorization: Optional[str] = Header(None)) -> NetworkChanges:
+    if ADMIN_TOKEN is not None and authorization != f'Bearer {ADMIN_TOKEN}':
+        raise HTTPException(status_code=401, detail='invalid token')
+    try:
+        return be.reload()
+    except BaseException as exc:
+        raise HTTPException(status_code=400, detail=f'fail to reload networks err={exc}')
 
 app.mount("/", StaticFiles(directory=DOCUMENT_ROOT, html=True), name="static")
 
@@ -252,8 +138,16 @@ def get_openapi_schema():
         description="""
 Use `/links` to get a list of links.
 Use `/links/{src}/{dst}` to get link status of the specific link.
+Use `/links/{src}/{dst}/history` to get time-series of pending messages of the link.
+Use `/links/{src}/{dst}/uptime` to get time spent in each state of the link.
+Use `/links/{src}/{dst}/latency` to get delivery latency percentiles of the link.
+Use `/links/{src}/{dst}/throughput` to get message rates and estimated time to drain pending messages.
+Use `/metrics` to get metrics in Prometheus text format.
 Use `/network/{id}` to get network information of the network.
 Use `/events` to get a list of events.
+Use `/events/stats` to get counts of events per type, link and time bucket.
+Use `/events/export` to download events in the range as NDJSON or CSV.
+Use `POST /admin/reload` to apply changes of the network configuration.
 """
     )
     app.openapi_schema = schema
@@ -67,4 +67,5 @@ class LinkInfo(TypedDict):
     rx_height: Optional[int]
     pending_count: Optional[int]
     pending_delay: Optional[float]
-    time_limit: Optional[int]
\ No newline at end of file
+    time_limit: Optional[int]
+    stale: bool
\ No newline at end of file
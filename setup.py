@@ -12,6 +12,7 @@ setup(
         'web3',
         'requests',
         'textual',
+        'numpy',
     ],
     entry_points={
         'console_scripts': [
@@ -0,0 +1,159 @@
+from datetime import datetime
+import os
+import tempfile
+from threading import Thread
+import time
+import unittest
+from unittest.mock import patch
+from btp2_monitor.backend import MODE_API, MODE_HA, MODE_POLLER, MonitorBackend
+from btp2_monitor.monitor import Links
+from btp2_monitor.storage import Storage
+from btp2_monitor.webui_types import NetworkID
+
+A = 'btp://0x1.icon/cx1'
+B = 'btp://0x2.eth2/0x2'
+
+class TestBackend(unittest.TestCase):
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, 'storage.db')
+            path = os.path.join(tmp, 'snapshot.json')
+
+            storage = Storage(db)
+            links = Links([], storage)
+            poller = MonitorBackend(MODE_POLLER, storage, links, path)
+            api = None
+            try:
+                links.get_link(A, B)
+                poller.publish_snapshot(datetime.now())
+
+                api_storage = Storage(db)
+                api = MonitorBackend(MODE_API, api_storage, None, path)
+                info = api.get_link(NetworkID.from_address(A), NetworkID.from_address(B))
+                self.assertEqual('unknown', info['state'])
+                self.assertEqual(0, info['pending_count'])
+                self.assertIn('1h', api.get_link_latency(NetworkID.from_address(A), NetworkID.from_address(B)))
+                metrics = api.get_metrics()
+                self.assertIn('# TYPE btp2_link_delivery_latency_seconds summary', metrics)
+                self.assertIn(f'btp2_link_delivery_latency_seconds_count{{src="{NetworkID.from_address(A)}",dst="{NetworkID.from_address(B)}",window="1h"}} 0', metrics)
+
+                poller.write_log(datetime.now(), A, B, 'tx', { 'seq': 1, 'count': 1 })
+                poller.publish_snapshot(datetime.now())
+                logs = api.get_logs(None, None, limit=10)
+                self.assertEqual('tx', logs[0]['event'])
+
+                # written without publishing a snapshot
+                poller.term()
+                logs = api.get_logs(None, None, limit=10)
+                self.assertEqual('"SHUTDOWN unknown"', logs[0]['extra'])
+                self.assertEqual(B, logs[1]['dst_name'])
+
+                self.assertRaises(Exception, MonitorBackend, MODE_API, Storage(), None, path)
+            finally:
+                if api is not None:
+                    api.term()
+                poller.term()
+
+    def test_hydrate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, 'storage.db')
+            storage = Storage(db)
+            Links([], storage).get_link(A, B)
+            storage.term()
+
+            storage = Storage(db)
+            backend = MonitorBackend(MODE_POLLER, storage, Links([], storage), None)
+            try:
+                links = backend.get_links()
+                self.assertEqual(1, len(links))
+                self.assertEqual(NetworkID.from_address(A), links[0]['src'])
+                info = backend.get_link(NetworkID.from_address(A), NetworkID.from_address(B))
+                self.assertEqual('unknown', info['state'])
+            finally:
+                backend.term()
+
+    def test_reload(self):
+        c = 'btp://0x3.icon/cx3'
+        d = 'btp://0x4.icon/cx4'
+        networks = [
+            { 'type': 'icon', 'network': '0x1.icon', 'name': 'A', 'bmc': 'cx1', 'endpoint': 'http://localhost/api/v3' },
+            { 'type': 'evm', 'network': '0x2.eth2', 'name': 'B', 'bmc': '0x2', 'endpoint': 'http://localhost' },
+            { 'type': 'icon', 'network': '0x3.icon', 'name': 'C', 'bmc': 'cx3', 'endpoint': 'http://localhost/api/v3' },
+        ]
+        storage = Storage()
+        links = Links(networks, storage)
+        backend = MonitorBackend(MODE_POLLER, storage, links, None)
+        try:
+            link = links.get_link(A, B)
+            link.state = 'bad'
+            links.get_link(A, c)
+            links.get_link(c, A)
+            self.assertEqual([(A, B), (A, c)], links.get_connected_pairs())
+            self.assertEqual(60, link.time_limit)
+
+            changed = dict(networks[1], name='B2', rx_limit=90)
+            added = { 'type': 'icon', 'network': '0x4.icon', 'name': 'D', 'bmc': 'cx4', 'endpoint': 'http://localhost/api/v3' }
+            changes = backend.reload([networks[0], changed, added])
+            self.assertEqual({ 'added': ['0x4.icon'], 'removed': ['0x3.icon'], 'changed': ['0x2.eth2'] }, changes)
+
+            self.assertIs(link, links.get_link(A, B))
+            self.assertEqual(('bad', 120, 'B2'), (link.state, link.time_limit, link.dst_name))
+            self.assertEqual([(A, B)], [(l.src, l.dst) for l in links.get_all_links()])
+            self.assertEqual([(A, B)], list(links.get_known_links()))
+            self.assertEqual([(A, B)], links.get_connected_pairs())
+            self.assertEqual('D', links.name_of(d))
+            self.assertIsNone(links.get_network(c))
+            logs = backend.get_logs(None, None, events=['log'], limit=10)
+            self.assertIn('"RELOAD added=0x4.icon removed=0x3.icon changed=0x2.eth2"', [log['extra'] for log in logs])
+
+            self.assertEqual({ 'added': [], 'removed': [], 'changed': [] }, backend.reload([networks[0], changed, added]))
+
+            # links of the replaced BMC are dropped
+            moved = dict(changed, bmc='0x22')
+            self.assertEqual({ 'added': [], 'removed': [], 'changed': ['0x2.eth2'] }, backend.reload([networks[0], moved, added]))
+            self.assertEqual([], list(links.get_all_links()))
+            self.assertEqual([], list(links.get_known_links()))
+
+            # waits for the poll in progress
+            with backend._MonitorBackend__update_lock:
+                reload = Thread(target=backend.reload, args=([networks[0], changed, added],))
+                reload.start()
+                reload.join(0.2)
+                self.assertTrue(reload.is_alive())
+            reload.join()
+            self.assertEqual('B2', links.name_of(B))
+        finally:
+            backend.term()
+
+    def test_ha(self):
+        with tempfile.TemporaryDirectory() as tmp, patch('btp2_monitor.backend.LEASE_TTL', 0.3):
+            db = os.path.join(tmp, 'storage.db')
+            path = os.path.join(tmp, 'snapshot.json')
+            storage = Storage(db)
+            Links([], storage).get_link(A, B)
+
+            active = MonitorBackend(MODE_HA, storage, Links([], storage), path)
+            standby_storage = Storage(db)
+            standby = MonitorBackend(MODE_HA, standby_storage, Links([], standby_storage), path)
+            try:
+                self.assertTrue(active.leader)
+                self.assertFalse(standby.leader)
+                info = standby.get_link(NetworkID.from_address(A), NetworkID.from_address(B))
+                self.assertEqual('unknown', info['state'])
+
+                active.term()
+                deadline = time.time() + 3
+                while not standby.leader and time.time() < deadline:
+                    time.sleep(0.05)
+                self.assertTrue(standby.leader)
+                logs = [log['extra'] for log in standby.get_logs(None, None, events=['log'], limit=10)]
+                self.assertTrue(any(log.startswith('"LEADER') for log in logs))
+                self.assertIn('"SHUTDOWN unknown"', logs)
+                self.assertEqual(1, len(standby.get_links()))
+            finally:
+                standby.term()
+                active.term()
+
+            # a lease in memory isn't shared with others
+            storage = Storage()
+            self.assertRaises(Exception, MonitorBackend, MODE_HA, storage, Links([], storage), path)
@@ -0,0 +1,39 @@
+from datetime import datetime
+import unittest
+from btp2_monitor.cache import LogCache
+from btp2_monitor.storage import Storage
+
+A = 'btp://0x1.icon/cx1'
+B = 'btp://0x2.eth2/0x2'
+
+class TestLogCache(unittest.TestCase):
+    def assertSameAsStorage(self, s: Storage, cache: LogCache, **kwargs):
+        logs = cache.get_logs(**kwargs)
+        self.assertIsNotNone(logs)
+        self.assertEqual(s.get_logs(**kwargs), logs)
+
+    def test_cache(self):
+        s = Storage()
+        cache = LogCache(s, size=10)
+        now = datetime.now()
+        s.write_log(now, A, B, 'tx', { 'count': 1 })
+        self.assertSameAsStorage(s, cache)
+        self.assertSameAsStorage(s, cache, src=A, dst=B)
+
+        for i in range(30):
+            cache.write_log(now, A, B, 'tx', { 'count': i })
+            cache.write_log(now, B, A, 'rx', { 'count': i })
+            if i % 10 == 0:
+                cache.write_log(now, '', '', 'log', 'hello')
+
+        self.assertSameAsStorage(s, cache, limit=10)
+        self.assertSameAsStorage(s, cache, limit=5)
+        self.assertSameAsStorage(s, cache, src=A, dst=B, limit=10)
+        self.assertSameAsStorage(s, cache, src=B, dst=A, events=['rx'], limit=3)
+        self.assertSameAsStorage(s, cache, after=60, limit=5)
+        self.assertSameAsStorage(s, cache, src=A, dst=B, after=60)
+
+        # older pages are not in the cache
+        self.assertIsNone(cache.get_logs())
+        self.assertIsNone(cache.get_logs(after=1))
+        self.assertIsNone(cache.get_logs(events=['log']))
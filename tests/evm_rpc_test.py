@@ -0,0 +1,62 @@
+import unittest
+from eth_abi import encode
+from eth_utils import keccak
+from btp2_monitor import evm_rpc
+from btp2_monitor.evm_rpc import BMCWithEVMRPC
+
+LINK = 'btp://0x1.icon/cx0000000000000000000000000000000000000001'
+
+class FakeResponse:
+    def __init__(self, result: bytes) -> None:
+        self.__result = result
+
+    def raise_for_status(self):
+        pass
+
+    def json(self) -> dict:
+        return { 'jsonrpc': '2.0', 'id': 1, 'result': '0x'+self.__result.hex() }
+
+class FakeSession:
+    def __init__(self, result: bytes) -> None:
+        self.result = result
+        self.requests = []
+
+    def post(self, url: str, json: dict, timeout: float) -> FakeResponse:
+        self.requests.append(json)
+        return FakeResponse(self.result)
+
+class TestEVMRPC(unittest.TestCase):
+    def test_selectors(self):
+        for name, signature in [
+            ('SELECTOR_GET_STATUS', 'getStatus(string)'),
+            ('SELECTOR_GET_LINKS', 'getLinks()'),
+            ('SELECTOR_GET_ROUTES', 'getRoutes()'),
+            ('SELECTOR_GET_FEE', 'getFee(string,bool)'),
+        ]:
+            self.assertEqual(keccak(text=signature)[:4].hex(), getattr(evm_rpc, name))
+
+    def test_encode(self):
+        self.assertEqual(encode(['string'], [LINK]).hex(), evm_rpc.encode_uint(32)+evm_rpc.encode_string(LINK))
+        self.assertEqual(encode(['string', 'bool'], ['0x1.icon', True]).hex(),
+            evm_rpc.encode_uint(64)+evm_rpc.encode_uint(1)+evm_rpc.encode_string('0x1.icon'))
+
+    def test_bmc(self):
+        config = { 'network': '0x2.eth2', 'bmc': '0x2', 'bmcm': '0x3', 'endpoint': 'http://localhost' }
+
+        session = FakeSession(encode(['(uint256,uint256,(uint256,bytes),uint256)'], [(3, 5, (100, b'\x01\x02'), 120)]))
+        status = BMCWithEVMRPC(config, session).get_status(LINK)
+        self.assertEqual((3, 5, 100, b'\x01\x02', 120),
+            (status.rx_seq, status.tx_seq, status.verifier.height, status.verifier.extra, status.current_height))
+        params = session.requests[0]['params'][0]
+        self.assertEqual('0x2', params['to'])
+        self.assertEqual('0x'+evm_rpc.SELECTOR_GET_STATUS+encode(['string'], [LINK]).hex(), params['data'])
+
+        session = FakeSession(encode(['string[]'], [[LINK, 'btp://0x3.icon/cx3']]))
+        self.assertEqual((LINK, 'btp://0x3.icon/cx3'), BMCWithEVMRPC(config, session).get_links())
+        self.assertEqual('0x3', session.requests[0]['params'][0]['to'])
+
+        session = FakeSession(encode(['(string,string)[]'], [[('0x4.icon', LINK), ('0x5.icon', LINK)]]))
+        self.assertEqual({ '0x4.icon': LINK, '0x5.icon': LINK }, BMCWithEVMRPC(config, session).get_routes())
+
+        session = FakeSession(encode(['uint256'], [10**18]))
+        self.assertEqual(10**18, BMCWithEVMRPC(config, session).get_fee('0x1.icon', False))
@@ -0,0 +1,30 @@
+from datetime import datetime
+import gzip
+import json
+import unittest
+from btp2_monitor.export import encode_logs, gzip_stream
+from btp2_monitor.storage import Storage
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.storage = Storage()
+        for i in range(25):
+            self.storage.write_log(datetime.fromtimestamp(1000+i), 'a', 'b', 'tx', { 'count': i })
+
+    def test_iter_logs(self):
+        chunks = list(self.storage.iter_logs(since=1005, until=1020, chunk=4))
+        self.assertEqual([4, 4, 4, 3], list(map(len, chunks)))
+        sns = [ log['sn'] for logs in chunks for log in logs ]
+        self.assertEqual(list(range(6, 21)), sns)
+
+    def test_ndjson(self):
+        data = b''.join(gzip_stream(encode_logs(self.storage.iter_logs(chunk=10), 'ndjson')))
+        lines = gzip.decompress(data).decode().splitlines()
+        self.assertEqual(25, len(lines))
+        self.assertEqual({ 'count': 24 }, json.loads(lines[-1])['extra'])
+
+    def test_csv(self):
+        text = b''.join(encode_logs(self.storage.iter_logs(chunk=10), 'csv')).decode()
+        self.assertEqual(26, len(text.splitlines()))
+        empty = b''.join(encode_logs(self.storage.iter_logs(since=5000), 'csv')).decode()
+        self.assertEqual('sn,ts,src,dst,event,extra', empty.strip())
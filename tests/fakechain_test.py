@@ -0,0 +1,55 @@
+import unittest
+from btp2_monitor.eth_rpc import BMCWithEthereumRPC
+from btp2_monitor.evm_rpc import BMCWithEVMRPC
+from btp2_monitor.fakechain import FEE, FakeChain, FakeChainServer
+from btp2_monitor.icon_rpc import BMCWithICONRPC
+
+class TestFakeChain(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = FakeChain(4, seed=1)
+        self.server = FakeChainServer(self.chain)
+        self.stop = self.server.start()
+
+    def tearDown(self) -> None:
+        self.stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_rpc(self):
+        configs = self.chain.configs(self.server.url)
+        self.assertEqual(['eth', 'eth', 'icon', 'icon'], [c['type'] for c in configs])
+        for _ in range(3):
+            self.chain.step(100)
+        link = self.chain.links[(self.chain.networks[1].address, self.chain.networks[2].address)]
+        self.assertEqual((2, 3), (link.rx_seq, link.tx_seq))
+
+        src, dst = configs[1], configs[2]
+        src_bmcs = [BMCWithEthereumRPC(src), BMCWithEVMRPC(dict(src, type='evm'))]
+        for bmc in src_bmcs:
+            self.assertEqual(2, len(bmc.get_links()))
+            self.assertEqual({}, bmc.get_routes())
+            self.assertEqual(FEE, bmc.get_fee(dst['network'], False))
+            status = bmc.get_status(f'btp://{dst["network"]}/{dst["bmc"]}')
+            self.assertEqual((3, 2003), (status.tx_seq, status.current_height))
+
+        bmc = BMCWithICONRPC(dst)
+        self.assertIn(f'btp://{src["network"]}/{src["bmc"]}', bmc.get_links())
+        self.assertEqual(FEE*2, bmc.get_fee(src['network'], True))
+        status = bmc.get_status(f'btp://{src["network"]}/{src["bmc"]}')
+        self.assertEqual((2, 3), (status.rx_seq, status.current_height-3000))
+
+    def test_stall(self):
+        src, dst = self.chain.networks[0].address, self.chain.networks[1].address
+        self.chain.step(100)
+        self.chain.stall(src, dst, 10, 100)
+        for i in range(5):
+            self.chain.step(101+i)
+        link = self.chain.links[(src, dst)]
+        self.assertEqual((0, 6), (link.rx_seq, link.tx_seq))
+        self.chain.step(110)
+        self.assertEqual(6, link.rx_seq)
+
+    def test_error(self):
+        self.chain.error_rate = 1.0
+        bmc = BMCWithEVMRPC(self.chain.configs(self.server.url)[0])
+        self.assertRaises(Exception, bmc.get_links)
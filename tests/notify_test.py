@@ -0,0 +1,69 @@
+import unittest
+from btp2_monitor.monitor import LinkEvent
+from btp2_monitor.notify import Notifier, Sink, SlackSink, merge_changes
+
+A = 'btp://0x1.icon/cx1'
+B = 'btp://0x2.eth2/0x2'
+
+class FakeLink:
+    def __init__(self, src: str, dst: str) -> None:
+        self.src = src
+        self.dst = dst
+        self.src_name = src[6:14]
+        self.dst_name = dst[6:14]
+        self.pending_duration = FakeDuration()
+
+class FakeDuration:
+    def total_seconds(self) -> float:
+        return 0.0
+
+class FakeResponse:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.headers = {}
+
+class FakeSession:
+    def __init__(self, codes: list[int]) -> None:
+        self.codes = codes
+        self.posts = []
+
+    def post(self, url: str, json: dict, timeout: float) -> FakeResponse:
+        self.posts.append((url, json))
+        return FakeResponse(self.codes.pop(0) if len(self.codes) > 0 else 200)
+
+def change(src: str, dst: str, before: str, after: str) -> dict:
+    return { 'ts': 0.0, 'src': src, 'dst': dst, 'src_name': src, 'dst_name': dst,
+        'before': before, 'after': after, 'delay': 0.0, 'count': 1 }
+
+class TestNotify(unittest.TestCase):
+    def test_merge(self):
+        changes = merge_changes([
+            change(A, B, 'good', 'bad'),
+            change(B, A, 'good', 'bad'),
+            change(A, B, 'bad', 'good'),
+            change(B, A, 'bad', 'broken'),
+        ])
+        self.assertEqual(1, len(changes))
+        self.assertEqual(('good', 'broken', 2), (changes[0]['before'], changes[0]['after'], changes[0]['count']))
+
+    def test_notifier(self):
+        session = FakeSession([500, 429])
+        sinks = [SlackSink('http://slack', '#btp'), Sink('http://hook')]
+        notifier = Notifier(sinks, window=0.05, interval=0.0, retries=3, backoff=0.0, session=session)
+        fw, bw = FakeLink(A, B), FakeLink(B, A)
+        notifier.notify([LinkEvent.StateEvent(fw, 'good', 'bad'), LinkEvent.TXEvent(fw, 1, 1)])
+        notifier.notify([LinkEvent.StateEvent(bw, 'good', 'bad')])
+        notifier.term(5)
+
+        self.assertEqual(['http://slack']*3+['http://hook'], [url for url, _ in session.posts])
+        self.assertEqual('#btp', session.posts[0][1]['channel'])
+        self.assertEqual(2, len(session.posts[0][1]['text'].split('\n')))
+        self.assertEqual([A, B], [c['src'] for c in session.posts[3][1]['changes']])
+
+    def test_give_up(self):
+        session = FakeSession([400, 503, 503])
+        notifier = Notifier([Sink('http://hook')], window=0.0, interval=0.0, retries=1, backoff=0.0, session=session)
+        notifier.notify([LinkEvent.StateEvent(FakeLink(A, B), 'good', 'bad')])
+        notifier.notify([LinkEvent.StateEvent(FakeLink(B, A), 'good', 'bad')])
+        notifier.term(5)
+        self.assertEqual(3, len(session.posts))
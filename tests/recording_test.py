@@ -0,0 +1,112 @@
+from datetime import datetime
+import os
+import tempfile
+import unittest
+from click.testing import CliRunner
+from btp2_monitor.main import main
+from btp2_monitor.monitor import Link, Links, NetworkStatus
+from btp2_monitor.storage import Storage
+from btp2_monitor.recording import StatusRecorder, VirtualClock, read_recording, replay
+from btp2_monitor.types import LinkStatus, VerifierStatus
+
+A = 'btp://0x1.icon/cx1'
+B = 'btp://0x2.eth2/0x2'
+
+def build_status(tx: int, rx: int, height: int) -> NetworkStatus:
+    status = NetworkStatus()
+    status.set_link_statuses(A, [(B, LinkStatus(0, tx, VerifierStatus(height, b'\x01'), height+10))])
+    status.set_link_statuses(B, [(A, LinkStatus(rx, 0, VerifierStatus(height, None), height+20))])
+    return status
+
+def values_of(status: NetworkStatus) -> dict:
+    return { (src, dst): (s.rx_seq, s.tx_seq, s.verifier.height, s.current_height)
+        for src, links in status.items() for dst, s in links.items() }
+
+class TestRecording(unittest.TestCase):
+    def test_round_trip(self):
+        frames = [(100.0, build_status(0, 0, 1000)), (200.0, build_status(3, 0, 1001)), (300.0, build_status(3, 3, 990))]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'status.rec')
+            recorder = StatusRecorder(path)
+            for ts, status in frames[:2]:
+                recorder.write(ts, status)
+            recorder.close()
+            recorder = StatusRecorder(path)
+            recorder.write(*frames[2])
+            recorder.close()
+            with open(path, 'ab') as fd:
+                fd.write(b'\x40\x00')
+
+            records = list(read_recording(path))
+            self.assertEqual([ts for ts, _ in frames], [ts for ts, _ in records])
+            for (_, expected), (_, actual) in zip(frames, records):
+                self.assertEqual(values_of(expected), values_of(actual))
+            self.assertEqual([200.0], [ts for ts, _ in read_recording(path, 150.0, 300.0)])
+
+    def test_restart_after_partial_frame(self):
+        frames = [(100.0, build_status(0, 0, 1000)), (200.0, build_status(3, 0, 1001)), (300.0, build_status(3, 3, 990))]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'status.rec')
+            recorder = StatusRecorder(path)
+            recorder.write(*frames[0])
+            recorder.close()
+            # killed in the middle of a frame
+            with open(path, 'ab') as fd:
+                fd.write(b'\x40\x00\x00')
+            recorder = StatusRecorder(path)
+            for ts, status in frames[1:]:
+                recorder.write(ts, status)
+            recorder.close()
+
+            records = list(read_recording(path))
+            self.assertEqual([ts for ts, _ in frames], [ts for ts, _ in records])
+            for (_, expected), (_, actual) in zip(frames, records):
+                self.assertEqual(values_of(expected), values_of(actual))
+
+    def test_replay(self):
+        clock = VirtualClock()
+        links = Links([], clock=clock)
+        frames = [
+            (1000.0, build_status(0, 0, 1)),
+            (1010.0, build_status(1, 0, 2)),
+            (1100.0, build_status(1, 0, 3)),
+            (1110.0, build_status(1, 1, 4)),
+        ]
+        states = []
+        for ts, _, _ in replay(links, clock, frames):
+            link = links.get_link(A, B)
+            states.append((link.state, link.pending_duration.total_seconds()))
+        self.assertEqual([(Link.GOOD, 0), (Link.GOOD, 0), (Link.BAD, 90), (Link.GOOD, 0)], states)
+
+    def test_restart(self):
+        storage = Storage()
+        clock = VirtualClock()
+        links = Links([], storage, clock=clock)
+        list(replay(links, clock, [(1000.0, build_status(0, 0, 1)), (1010.0, build_status(1, 1, 2))]))
+
+        # restarted after 90 seconds of downtime
+        clock.ts = 1100.0
+        links = Links([], storage, clock=clock)
+        links.load_links()
+        list(replay(links, clock, [(1100.0, build_status(1, 1, 3)), (1110.0, build_status(2, 2, 4))]))
+        uptime = storage.get_link_uptime(links.get_link(A, B).conn_id, 1000.0, 1110.0, datetime.fromtimestamp(1110.0))
+        self.assertEqual({'unknown': 90, 'broken': 0, 'bad': 0, 'good': 20}, uptime['durations'])
+
+    def test_replay_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'status.rec')
+            recorder = StatusRecorder(path)
+            recorder.write(1000.0, build_status(0, 0, 1))
+            recorder.write(1010.0, build_status(1, 0, 2))
+            recorder.close()
+            networks = os.path.join(tmp, 'networks.json')
+            with open(networks, 'wt') as fd:
+                fd.write('[]')
+            db = os.path.join(tmp, 'storage.db')
+
+            result = CliRunner().invoke(main, ['--networks', networks, '--storage_url', db, 'replay', path])
+            self.assertEqual(0, result.exit_code, result.output)
+            self.assertIn('Replayed 2 cycles', result.output)
+            # the monitored storage is left untouched
+            self.assertEqual([], Storage(db).get_connections())
+
@@ -0,0 +1,67 @@
+from datetime import datetime
+import unittest
+import numpy as np
+from btp2_monitor.main import REPORT_FORMATS
+from btp2_monitor.monitor import Links
+from btp2_monitor.report import FORMATTERS, build_report, format_csv, weighted_percentile
+from btp2_monitor.storage import Storage
+
+A = 'btp://0x1.icon/cx1'
+B = 'btp://0x2.eth2/0x2'
+DAY = 24*3600
+BASE = 1_699_920_000
+
+def at(offset: float) -> datetime:
+    return datetime.fromtimestamp(BASE+offset)
+
+class TestReport(unittest.TestCase):
+    def test_report(self):
+        s = Storage()
+        s.write_log(at(-10), A, B, 'state', { 'before': 'unknown', 'after': 'good' })
+        s.write_log(at(0), '', '', 'log', 'START')
+        s.write_log(at(100), A, B, 'tx', { 'seq': 0, 'count': 3 })
+        s.write_log(at(130), A, B, 'rx', { 'seq': 0, 'count': 1, 'delta': 10.0 })
+        s.write_log(at(200), A, B, 'state', { 'before': 'good', 'after': 'bad' })
+        s.write_log(at(260), A, B, 'state', { 'before': 'bad', 'after': 'broken' })
+        s.write_log(at(300), A, B, 'state', { 'before': 'broken', 'after': 'good' })
+        s.write_log(at(310), A, B, 'rx', { 'seq': 1, 'count': 2, 'delta': 40.0 })
+        s.write_log(at(DAY+50), A, B, 'tx', { 'seq': 3, 'count': 5 })
+
+        links = Links([], s)
+        reports = build_report(links, s, at(0), at(2*DAY))
+        self.assertEqual(1, len(reports))
+        r = reports[0]
+        self.assertEqual((A, B), (r['src'], r['dst']))
+        self.assertEqual(8, r['tx'])
+        self.assertEqual(3, r['rx'])
+        self.assertEqual([3, 5], list(map(lambda x: x['tx'], r['daily'])))
+        self.assertEqual([3, 0], list(map(lambda x: x['rx'], r['daily'])))
+        self.assertEqual(3, r['latency']['count'])
+        self.assertEqual(40.0, r['latency']['p50'])
+        self.assertEqual(40.0, r['latency']['max'])
+        self.assertEqual(60.0, r['time_over_limit'])
+        self.assertEqual({ 'start': BASE+200, 'end': BASE+300, 'duration': 100.0 }, r['longest_outage'])
+        self.assertEqual(60, r['time_limit'])
+
+        csv = format_csv(reports)
+        self.assertEqual(4, len(csv.strip().splitlines()))
+
+    def test_unknown_start(self):
+        s = Storage()
+        s.write_log(at(100), A, B, 'state', { 'before': 'unknown', 'after': 'good' })
+        s.write_log(at(200), A, B, 'state', { 'before': 'good', 'after': 'broken' })
+        s.write_log(at(230), A, B, 'state', { 'before': 'broken', 'after': 'good' })
+
+        r = build_report(Links([], s), s, at(0), at(DAY))[0]
+        self.assertEqual({ 'start': BASE+200, 'end': BASE+230, 'duration': 30.0 }, r['longest_outage'])
+
+    def test_weighted_percentile(self):
+        rng = np.random.default_rng(1)
+        values = rng.uniform(0, 100, 50)
+        weights = rng.integers(1, 20, 50)
+        q = [0, 10, 50, 90, 99, 100]
+        expected = np.percentile(np.repeat(values, weights), q)
+        np.testing.assert_allclose(expected, weighted_percentile(values, weights, q))
+
+    def test_formats(self):
+        self.assertEqual(set(FORMATTERS.keys()), set(REPORT_FORMATS))
@@ -0,0 +1,58 @@
+import unittest
+from btp2_monitor.fakechain import FakeChain, FakeChainServer
+from btp2_monitor.monitor import Links
+from btp2_monitor.shard import HashRing, ShardServer, ShardedLinks, decode_status, encode_status, shard_networks
+
+class TestShard(unittest.TestCase):
+    def test_ring(self):
+        keys = [f'0x{i:x}.icon' for i in range(1000)]
+        ring = HashRing(['a', 'b', 'c'])
+        nodes = [ring.node_of(k) for k in keys]
+        for node in ['a', 'b', 'c']:
+            self.assertGreater(nodes.count(node), 200)
+
+        # only the keys taken by the new shard move
+        ring2 = HashRing(['a', 'b', 'c', 'd'])
+        for key, node in zip(keys, nodes):
+            self.assertIn(ring2.node_of(key), (node, 'd'))
+        self.assertRaises(Exception, HashRing, ['a', 'a'])
+
+    def test_sharded_links(self):
+        chain = FakeChain(6, degree=2, seed=1)
+        server = FakeChainServer(chain)
+        stop = server.start()
+        shards = []
+        try:
+            for _ in range(3):
+                chain.step()
+            networks = chain.configs(server.url, 'evm')
+            names = ['s1', 's2']
+            parts = [shard_networks(networks, names, name) for name in names]
+            self.assertEqual(len(networks), sum(len(p) for p in parts))
+            for name, part in zip(names, parts):
+                shard = ShardServer(Links(part), name)
+                shard.start()
+                shards.append(shard)
+
+            links = ShardedLinks(networks, [s.url for s in shards])
+            status = links.query_status(True)
+            expected = Links(networks).query_status(True)
+            self.assertEqual(encode_status(expected), encode_status(status))
+            self.assertEqual(encode_status(status), encode_status(decode_status(encode_status(status))))
+
+            changed, _ = links.apply_status(status)
+            self.assertTrue(changed)
+            self.assertEqual(len(chain.links), len(list(links.get_all_links())))
+            self.assertEqual('ICON6', links.name_of(chain.networks[5].address))
+
+            shards[0].shutdown()
+            shards[0].server_close()
+            self.assertRaises(Exception, links.query_status, True)
+            self.assertEqual(encode_status(shards[1].query_status(True)), encode_status(links.query_status(False)))
+        finally:
+            for shard in shards:
+                shard.shutdown()
+                shard.server_close()
+            stop.set()
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,79 @@
+import random
+import unittest
+from btp2_monitor.stats import LatencyStats, QuantileSketch, RateCounter, ThroughputStats, WindowedSketch
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_quantile(self):
+        sketch = QuantileSketch()
+        values = list(map(lambda x: float(x), range(1, 1001)))
+        random.shuffle(values)
+        for v in values:
+            sketch.add(v)
+        self.assertEqual(1000, sketch.count)
+        self.assertEqual(1000.0, sketch.max)
+        for q, expected in [(0.5, 500), (0.9, 900), (0.99, 990)]:
+            self.assertAlmostEqual(expected, sketch.quantile(q), delta=expected*0.02)
+
+    def test_bounded(self):
+        sketch = QuantileSketch(max_buckets=16)
+        for v in range(1, 10000):
+            sketch.add(float(v))
+        self.assertLessEqual(len(sketch.buckets), 16)
+        self.assertAlmostEqual(9900, sketch.quantile(0.99), delta=9900*0.02)
+
+    def test_serialize(self):
+        sketch = QuantileSketch()
+        sketch.add(0.0, 3)
+        sketch.add(12.5, 2)
+        sketch2 = QuantileSketch()
+        sketch2.load_dict(sketch.to_dict())
+        self.assertEqual(sketch.summary(), sketch2.summary())
+        self.assertEqual(0.0, sketch2.quantile(0.5))
+        self.assertEqual(25.0, sketch2.sum)
+
+class TestWindowedSketch(unittest.TestCase):
+    def test_expire(self):
+        sketch = WindowedSketch(60, 6)
+        sketch.add(1000, 5.0)
+        sketch.add(1030, 10.0)
+        self.assertEqual(2, sketch.get_sketch(1030).count)
+        self.assertEqual(1, sketch.get_sketch(1065).count)
+        self.assertEqual(0, sketch.get_sketch(1100).count)
+
+    def test_latency_stats(self):
+        stats = LatencyStats()
+        stats.add(0, 30.0, 2)
+        stats.add(7200, 60.0)
+        summary = stats.summary(7200)
+        self.assertEqual(1, summary['1h']['count'])
+        self.assertEqual(3, summary['24h']['count'])
+        self.assertEqual(60.0, summary['24h']['max'])
+        self.assertEqual(120.0, summary['24h']['sum'])
+
+        stats2 = LatencyStats()
+        stats2.load_dict(stats.to_dict())
+        self.assertEqual(summary, stats2.summary(7200))
+
+class TestRateCounter(unittest.TestCase):
+    def test_counter(self):
+        counter = RateCounter(60, 6)
+        self.assertIsNone(counter.rate(0))
+        counter.add(0, 3)
+        counter.add(25, 2)
+        self.assertEqual(5, counter.total(30))
+        self.assertAlmostEqual(5/30, counter.rate(30))
+        self.assertEqual(2, counter.total(65))
+        counter.add(125, 4)
+        self.assertEqual(4, counter.total(125))
+        self.assertAlmostEqual(4/60, counter.rate(125))
+
+    def test_drain_time(self):
+        stats = ThroughputStats()
+        stats.start(0)
+        stats.add_tx(10, 10)
+        stats.add_rx(1800, 6)
+        summary = stats.summary(1800, 4)
+        self.assertEqual({'1m': 0, '1h': 10}, summary['tx'])
+        self.assertEqual({'1m': 6, '1h': 6}, summary['rx'])
+        self.assertAlmostEqual(1200.0, summary['drain_time'])
+        self.assertEqual(0.0, stats.summary(1800, 0)['drain_time'])
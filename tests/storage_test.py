@@ -1,4 +1,6 @@
 from datetime import datetime
+import os
+import tempfile
 import unittest
 from btp2_monitor.storage import Storage, ConnectionState
 
@@ -183,4 +185,187 @@ class TestStorageTest(unittest.TestCase):
         logs = s.get_logs(events=['tx', 'rx'])
         self.assertEqual(2, len(logs))
         logs = s.get_logs(events=['state', 'log'])
-        self.assertEqual(2, len(logs))
\ No newline at end of file
+        self.assertEqual(2, len(logs))
+
+    def test_link_history(self):
+        s = Storage()
+        base = datetime.fromtimestamp(1_700_000_000 - 1_700_000_000 % 3600)
+        for i in range(120):
+            ts = datetime.fromtimestamp(base.timestamp() + i*30)
+            s.add_link_sample(1, ts, {
+                'pending_count': i % 4,
+                'height_gap': i,
+                'pending_duration': float(i),
+            })
+
+        now = datetime.fromtimestamp(base.timestamp() + 3600)
+        raw = s.get_link_history(1, base.timestamp(), now.timestamp(), 30, now)
+        self.assertEqual(120, len(raw))
+        self.assertEqual(1, raw[0]['samples'])
+
+        minutes = s.get_link_history(1, base.timestamp(), now.timestamp(), 60, now)
+        self.assertEqual(60, len(minutes))
+        self.assertEqual(2, minutes[1]['samples'])
+        self.assertEqual({'min': 2, 'max': 3, 'avg': 2.5}, minutes[1]['height_gap'])
+
+        hours = s.get_link_history(1, base.timestamp(), now.timestamp(), 3600, now)
+        self.assertEqual(1, len(hours))
+        self.assertEqual(120, hours[0]['samples'])
+        self.assertEqual(0, hours[0]['pending_count']['min'])
+        self.assertEqual(3, hours[0]['pending_count']['max'])
+
+        later = datetime.fromtimestamp(now.timestamp() + 2*24*3600)
+        s.expire_link_samples(later)
+        expired = s.get_link_history(1, base.timestamp(), now.timestamp(), 30, now)
+        self.assertEqual(0, len(expired))
+        kept = s.get_link_history(1, base.timestamp(), now.timestamp(), 60, now)
+        self.assertEqual(60, len(kept))
+
+    def test_link_uptime(self):
+        s = Storage()
+        base = 1_700_000_000
+        def at(offset: float) -> datetime:
+            return datetime.fromtimestamp(base+offset)
+
+        s.add_state_interval(1, 'unknown', at(0))
+        s.add_state_interval(1, 'good', at(10))
+        s.add_state_interval(1, 'good', at(50))
+        s.add_state_interval(1, 'bad', at(110))
+        s.add_state_interval(1, 'good', at(140))
+        s.add_state_interval(2, 'broken', at(0))
+
+        uptime = s.get_link_uptime(1, base, base+200, at(200))
+        self.assertEqual({'unknown': 10, 'broken': 0, 'bad': 30, 'good': 160}, uptime['durations'])
+        self.assertAlmostEqual(0.8, uptime['ratios']['good'])
+
+        uptime = s.get_link_uptime(1, base+100, base+150, at(200))
+        self.assertEqual({'unknown': 0, 'broken': 0, 'bad': 30, 'good': 20}, uptime['durations'])
+
+        uptime = s.get_link_uptime(1, base-100, base, at(200))
+        self.assertIsNone(uptime['ratios']['good'])
+
+        uptime = s.get_link_uptime(2, base, base+300, at(200))
+        self.assertEqual(200, uptime['durations']['broken'])
+
+    def test_log_stats(self):
+        s = Storage()
+        for i in range(10):
+            ts = datetime.fromtimestamp(1000+i*30)
+            s.write_log(ts, "0x7.icon", "0xaa36a7.eth2", "tx", { 'count': 2 })
+            if i % 2 == 0:
+                s.write_log(ts, "0xaa36a7.eth2", "0x7.icon", "rx", { 'count': 1, 'delta': 30.3 })
+        s.write_log(datetime.fromtimestamp(1100), "", "", "log", "yahoo")
+
+        logs = s.get_logs(since=1060, until=1120)
+        self.assertEqual(4, len(logs))
+        logs = s.get_logs(src="0x7.icon", since=1060, until=1120)
+        self.assertEqual(3, len(logs))
+
+        stats = s.get_log_stats(events=['tx', 'rx'])
+        self.assertEqual(2, len(stats))
+        self.assertEqual({'ts': None, 'event': 'rx', 'src': '0xaa36a7.eth2', 'dst': '0x7.icon', 'count': 5, 'messages': 5}, stats[0])
+        self.assertEqual(20, stats[1]['messages'])
+
+        stats = s.get_log_stats(src="0x7.icon", events=['tx'], since=1000, until=1300, bucket=120)
+        self.assertEqual([960, 1080, 1200], list(map(lambda x: x['ts'], stats)))
+        self.assertEqual([3, 4, 3], list(map(lambda x: x['count'], stats)))
+
+        # open ranges are clamped by the logs in the storage
+        s.write_log(datetime.fromtimestamp(1000+10000), "0x7.icon", "0xaa36a7.eth2", "tx", { 'count': 2 })
+        for kwargs, width in [({}, 10), ({ 'since': 1000 }, 10), ({ 'until': 21000 }, 20)]:
+            stats = s.get_log_stats(events=['tx'], bucket=1, **kwargs)
+            self.assertEqual(11, len(stats), kwargs)
+            self.assertEqual(0, stats[1]['ts'] % width, kwargs)
+
+    def test_logs_plan(self):
+        s = Storage()
+        s.write_log(datetime.fromtimestamp(1500), "0x7.icon", "0xaa36a7.eth2", "tx", { 'count': 1 })
+        queries = [
+            ({}, 'rowid'),
+            ({ 'events': ['tx'] }, 'logs_event_sn'),
+            ({ 'events': ['tx', 'rx'] }, 'rowid'),
+            ({ 'src': '0x7.icon', 'dst': '0xaa36a7.eth2' }, 'logs_link_sn'),
+            ({ 'src': '0x7.icon', 'dst': '0xaa36a7.eth2', 'events': ['state'] }, 'logs_link_sn'),
+            ({ 'src': '0x7.icon' }, 'logs_src_sn'),
+            ({ 'dst': '0x7.icon', 'before': 10 }, 'logs_dst_sn'),
+            ({ 'events': ['tx'], 'after': 10 }, 'logs_event_sn'),
+            ({ 'since': 1000, 'until': 2000 }, 'rowid'),
+            ({ 'src': '0x7.icon', 'events': ['tx', 'rx'], 'since': 1000 }, 'logs_src_sn'),
+        ]
+        for kwargs, index in queries:
+            sql, params = s._Storage__logs_query(**kwargs)
+            c = s._Storage__conn.execute('EXPLAIN QUERY PLAN '+sql, params)
+            plan = [item[3] for item in c.fetchall()]
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, kwargs)
+            searches = [p for p in plan if p.startswith('SEARCH') or p.startswith('SCAN')]
+            self.assertTrue(len(searches) > 0 and all(index in p or (index == 'rowid' and p == 'SCAN logs') for p in searches), (kwargs, plan))
+
+    def test_logs_link(self):
+        s = Storage()
+        for i in range(10):
+            ts = datetime.fromtimestamp(1000+i*10)
+            s.write_log(ts, "a", "b", "tx", { 'count': 1 })
+            s.write_log(ts, "b", "a", "tx", { 'count': 1 })
+            s.write_log(ts, "", "", "log", i)
+        logs = s.get_logs(src="a", dst="b", limit=5)
+        self.assertEqual([30, 28, 27, 25, 24], [log['sn'] for log in logs])
+        logs = s.get_logs(src="a", dst="b", after=25, limit=3)
+        self.assertEqual([27, 28, 30], [log['sn'] for log in logs])
+        logs = s.get_logs(dst="a", since=1020, until=1040)
+        self.assertEqual([12, 11, 9, 8], [log['sn'] for log in logs])
+        self.assertEqual([], s.get_logs(since=2000))
+
+    def test_topology(self):
+        s = Storage()
+        self.assertEqual([], s.get_topology())
+
+        topology = {
+            'bmc': 'btp://0x7.icon/cx1',
+            'config': { 'network': '0x7.icon', 'type': 'icon', 'bmc': 'cx1' },
+            'links': ['btp://0xaa36a7.eth2/0x2'],
+            'routes': {},
+            'ts': 1000.0,
+        }
+        s.set_topology(topology)
+        self.assertEqual([topology], s.get_topology())
+
+        topology['links'] = []
+        topology['ts'] = 2000.0
+        s.set_topology(topology)
+        self.assertEqual([topology], s.get_topology())
+
+        s.delete_topology(topology['bmc'])
+        self.assertEqual([], s.get_topology())
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'checkpoint.db')
+            s = Storage(checkpoint=path, checkpoint_interval=3600)
+            s.write_log(datetime.fromtimestamp(1000), "", "", "log", "first")
+            s.checkpoint()
+            s.write_log(datetime.fromtimestamp(1010), "", "", "log", "second")
+
+            s3 = Storage(checkpoint=path, checkpoint_interval=3600)
+            self.assertEqual(['"first"'], list(map(lambda x: x['extra'], s3.get_logs())))
+            self.assertEqual(['checkpoint.db'], os.listdir(tmp))
+            self.assertRaises(Exception, Storage, os.path.join(tmp, 'storage.db'), path)
+            s3.term()
+
+            s.term()
+            s4 = Storage(checkpoint=path, checkpoint_interval=3600)
+            self.assertEqual(['"second"', '"first"'], list(map(lambda x: x['extra'], s4.get_logs())))
+            s4.term()
+
+    def test_lease(self):
+        s = Storage()
+        self.assertTrue(s.acquire_lease('monitor', 'a', 10, 100))
+        self.assertFalse(s.acquire_lease('monitor', 'b', 10, 105))
+        self.assertTrue(s.acquire_lease('monitor', 'a', 10, 105))
+        self.assertEqual(('a', 115), s.get_lease('monitor'))
+
+        self.assertFalse(s.acquire_lease('monitor', 'b', 10, 114))
+        self.assertTrue(s.acquire_lease('monitor', 'b', 10, 115))
+        s.release_lease('monitor', 'a')
+        self.assertEqual(('b', 125), s.get_lease('monitor'))
+        s.release_lease('monitor', 'b')
+        self.assertIsNone(s.get_lease('monitor'))
@@ -0,0 +1,26 @@
+import unittest
+from btp2_monitor.topology import TopologyIndex
+
+A = 'btp://0x1.icon/cx1'
+B = 'btp://0x2.eth2/0x2'
+C = 'btp://0x3.icon/cx3'
+
+class TestTopologyIndex(unittest.TestCase):
+    def test_index(self):
+        index = TopologyIndex([(A, B), (A, C), (B, A)])
+        self.assertEqual(3, len(index))
+        self.assertEqual(0, index.add((A, B)))
+        self.assertIn((B, A), index)
+        self.assertNotIn((C, A), index)
+        self.assertEqual(2, index.reverse_of(0))
+        self.assertEqual(0, index.reverse_of(2))
+        self.assertIsNone(index.reverse_of(1))
+        self.assertEqual([(A, B)], index.connected())
+
+        index.add((C, A))
+        self.assertEqual([(A, B), (A, C)], index.connected())
+        self.assertEqual((C, A), index.key_of(index.reverse_of(index.id_of((A, C)))))
+
+    def test_unique(self):
+        index = TopologyIndex()
+        self.assertEqual([(B, A), (A, C)], index.unique([(B, A), (A, C), (A, B), (C, A), (B, A)]))